@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import queue
+import threading
+from PySide6.QtCore import QObject, QTimer, Signal
+from livro import escrever_atomico
+import instrumentacao
+
+# Tempo sem digitação antes de tirar um instantâneo do documento
+INTERVALO_SILENCIO_MS = 2000
+
+# Acima deste tamanho o diário é compactado, mantendo só o último registro de cada capítulo
+LIMITE_DIARIO = 8 * 1024 * 1024
+
+PASTA_RECUPERACAO = ".autosave"
+
+
+def caminho_diario(pasta, nome):
+    return os.path.join(pasta, PASTA_RECUPERACAO, f"{nome}.diario")
+
+
+def anotar_diario(caminho, instantaneos):
+    """Acrescenta ao diário o HTML atual dos capítulos alterados (arquivo -> HTML)"""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    hora = time.time()
+
+    with open(caminho, "a", encoding="utf-8") as f:
+        for arquivo, html in instantaneos.items():
+            registro = {"hora": hora, "arquivo": arquivo, "html": html}
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+    if os.path.getsize(caminho) > LIMITE_DIARIO:
+        compactar_diario(caminho)
+
+
+def ler_diario(caminho):
+    """Devolve o último registro do diário para cada capítulo"""
+    registros = {}
+    if not os.path.exists(caminho):
+        return registros
+
+    with open(caminho, "r", encoding="utf-8") as f:
+        for linha in f:
+            try:
+                registro = json.loads(linha)
+            except json.JSONDecodeError:
+                # Linha cortada por uma queda no meio da escrita
+                break
+            registros[registro["arquivo"]] = registro
+    return registros
+
+
+def compactar_diario(caminho):
+    registros = ler_diario(caminho)
+    escrever_atomico(caminho, "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in registros.values()))
+
+
+def descartar_diario(caminho):
+    if os.path.exists(caminho):
+        os.remove(caminho)
+
+
+class FalhaGravacao(Exception):
+    """Capítulos (índices) de um livro que não chegaram ao disco"""
+
+    def __init__(self, mensagem, livro, capitulos):
+        super().__init__(mensagem)
+        self.livro = livro
+        self.capitulos = capitulos
+
+
+def gravado_depois(livro, arquivo, hora):
+    caminho = os.path.join(livro.pasta, arquivo)
+    return os.path.exists(caminho) and os.path.getmtime(caminho) >= hora
+
+
+@instrumentacao.medido("gravar_livro", "disco")
+def gravar_livro(livro, conteudos, caminho, instantaneos, ao_gravar=None):
+    """Grava os capítulos; o diário só é apagado quando tudo o que ele guarda já está no disco.
+
+    `ao_gravar` recebe os capítulos que chegaram ao disco (índice -> HTML),
+    mesmo quando a gravação de outro falhou.
+    """
+    gravados = {}
+    try:
+        for indice, html in conteudos.items():
+            livro.salvar_capitulo(indice, html)
+            gravados[indice] = html
+    except Exception as e:
+        # O editor já desmarcou esses capítulos: até ele marcá-los de novo, o diário é a única cópia
+        anotar_diario(caminho, instantaneos)
+        raise FalhaGravacao(str(e), livro.caminho, [i for i in conteudos if i not in gravados]) from e
+    finally:
+        if ao_gravar is not None and gravados:
+            ao_gravar(gravados)
+
+    # Registros de uma gravação anterior que falhou continuam até o capítulo deles ser gravado
+    restantes = [registro for arquivo, registro in ler_diario(caminho).items()
+                 if arquivo not in instantaneos and not gravado_depois(livro, arquivo, registro["hora"])]
+    if restantes:
+        escrever_atomico(caminho, "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in restantes))
+    else:
+        descartar_diario(caminho)
+
+
+class Autosalvamento(QObject):
+    """Salvamento automático em segundo plano com diário de recuperação.
+
+    Cada alteração reinicia um temporizador; depois de um período sem
+    digitação, `coletar` é chamado na thread da interface e devolve o caminho
+    do diário e o HTML dos capítulos alterados. A escrita em disco acontece
+    em uma thread de trabalho, na ordem em que as tarefas foram enfileiradas.
+    """
+
+    # mensagem, livro e capítulos que ficaram sem gravar (vazios quando a falha não foi de um capítulo)
+    erro = Signal(str, str, list)
+
+    def __init__(self, coletar, parent=None):
+        super().__init__(parent)
+        self.coletar = coletar
+
+        self.temporizador = QTimer(self)
+        self.temporizador.setSingleShot(True)
+        self.temporizador.setInterval(INTERVALO_SILENCIO_MS)
+        self.temporizador.timeout.connect(self.registrar_instantaneo)
+
+        self.fila = queue.Queue()
+        self.trabalhador = threading.Thread(target=self._trabalhar, name="autosave", daemon=True)
+        self.trabalhador.start()
+
+    def agendar(self):
+        """Reinicia a contagem do período de silêncio"""
+        self.temporizador.start()
+
+    def registrar_instantaneo(self):
+        caminho, instantaneos = self.coletar()
+        if caminho and instantaneos:
+            self.enfileirar(anotar_diario, caminho, instantaneos)
+
+    def enfileirar(self, funcao, *args):
+        if not self.trabalhador.is_alive():
+            # Depois de encerrado, grava na própria thread para não perder nada
+            funcao(*args)
+            return
+        self.fila.put((funcao, args))
+
+    def aguardar(self):
+        """Bloqueia até que todas as escritas pendentes terminem"""
+        if self.trabalhador.is_alive():
+            self.fila.join()
+
+    def encerrar(self):
+        self.temporizador.stop()
+        if self.trabalhador.is_alive():
+            self.fila.put(None)
+            self.trabalhador.join()
+
+    def _trabalhar(self):
+        while True:
+            tarefa = self.fila.get()
+            try:
+                if tarefa is None:
+                    return
+                funcao, args = tarefa
+                funcao(*args)
+            except FalhaGravacao as e:
+                self.erro.emit(str(e), e.livro, e.capitulos)
+            except Exception as e:
+                self.erro.emit(str(e), "", [])
+            finally:
+                self.fila.task_done()
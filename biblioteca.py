@@ -0,0 +1,247 @@
+import os
+import json
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+# Quantos livros o histórico de recentes guarda no máximo
+LIMITE_HISTORICO = 500
+
+VERSAO_ESQUEMA = 3
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS livros (
+    id INTEGER PRIMARY KEY,
+    caminho TEXT NOT NULL UNIQUE,
+    nome TEXT NOT NULL,
+    pasta TEXT NOT NULL,
+    capa TEXT NOT NULL DEFAULT '',
+    data_criacao TEXT NOT NULL DEFAULT '',
+    acesso INTEGER NOT NULL,
+    mtime INTEGER NOT NULL DEFAULT 0,
+    ausente INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_livros_acesso ON livros (acesso DESC);
+CREATE INDEX IF NOT EXISTS idx_livros_pasta ON livros (pasta);
+CREATE TABLE IF NOT EXISTS progresso (
+    livro TEXT NOT NULL,
+    dia TEXT NOT NULL,
+    palavras_inicio INTEGER NOT NULL,
+    palavras INTEGER NOT NULL,
+    PRIMARY KEY (livro, dia)
+);
+CREATE TABLE IF NOT EXISTS raizes (
+    pasta TEXT PRIMARY KEY,
+    mtime INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Colunas que a versão 3 acrescentou a bancos já existentes
+COLUNAS_V3 = (
+    ("mtime", "INTEGER NOT NULL DEFAULT 0"),
+    ("ausente", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+
+def diretorio_central():
+    return os.path.join(os.path.expanduser("~"), "EditorA5")
+
+
+class Biblioteca:
+    """Lista de livros recentes guardada em SQLite em ~/EditorA5.
+
+    A ordem de "recentes" é um contador de acesso indexado: trazer um livro
+    para o topo é um UPDATE de uma linha. As escritas usam transações
+    imediatas, então duas janelas salvando ao mesmo tempo não se sobrescrevem.
+    """
+
+    def __init__(self, caminho=None):
+        central_dir = diretorio_central()
+        os.makedirs(central_dir, exist_ok=True)
+        self.caminho = caminho or os.path.join(central_dir, "biblioteca.db")
+
+        self.conexao = sqlite3.connect(self.caminho, timeout=10, isolation_level=None)
+        self.conexao.row_factory = sqlite3.Row
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("PRAGMA synchronous=NORMAL")
+        self.preparar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        self.conexao.close()
+
+    @contextmanager
+    def transacao(self):
+        self.conexao.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conexao
+        except BaseException:
+            self.conexao.execute("ROLLBACK")
+            raise
+        self.conexao.execute("COMMIT")
+
+    def preparar(self):
+        """Cria (ou completa) o esquema e, uma única vez, importa o antigo livros_recentes.json"""
+        if self.conexao.execute("PRAGMA user_version").fetchone()[0] >= VERSAO_ESQUEMA:
+            return
+
+        with self.transacao() as conexao:
+            # Outra janela pode ter feito a migração enquanto esperávamos a trava
+            versao = conexao.execute("PRAGMA user_version").fetchone()[0]
+            if versao >= VERSAO_ESQUEMA:
+                return
+            # executescript faria COMMIT no meio da transação; os comandos são todos IF NOT EXISTS
+            for comando in ESQUEMA.split(";"):
+                if comando.strip():
+                    conexao.execute(comando)
+            json_migrado = self._migrar_json(conexao) if versao < 1 else None
+            if versao < 3:
+                self._migrar_raizes(conexao)
+            conexao.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+
+        # Só tira o JSON do caminho depois que a importação foi confirmada
+        if json_migrado:
+            os.replace(json_migrado, json_migrado + ".migrado")
+
+    def _migrar_json(self, conexao):
+        json_path = os.path.join(os.path.dirname(self.caminho), "livros_recentes.json")
+        if not os.path.exists(json_path):
+            return None
+
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                livros = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Erro ao migrar livros recentes: {e}")
+            return None
+
+        # O JSON está do mais recente para o mais antigo
+        for acesso, entrada in enumerate(reversed(livros), start=1):
+            caminho = entrada.get("manifesto") or entrada.get("html")
+            if not caminho:
+                continue
+            conexao.execute(
+                "INSERT OR IGNORE INTO livros (caminho, nome, pasta, capa, data_criacao, acesso) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (caminho, entrada.get("nome", ""), entrada.get("pasta", os.path.dirname(caminho)),
+                 entrada.get("capa", ""), entrada.get("data_criacao", ""), acesso)
+            )
+
+        return json_path
+
+    def _migrar_raizes(self, conexao):
+        """Acrescenta as colunas da varredura e adota como raízes as pastas onde os livros já estão"""
+        colunas = {linha["name"] for linha in conexao.execute("PRAGMA table_info(livros)")}
+        for nome, definicao in COLUNAS_V3:
+            if nome not in colunas:
+                conexao.execute(f"ALTER TABLE livros ADD COLUMN {nome} {definicao}")
+        for (pasta,) in conexao.execute("SELECT DISTINCT pasta FROM livros").fetchall():
+            conexao.execute("INSERT OR IGNORE INTO raizes (pasta) VALUES (?)", (os.path.dirname(pasta),))
+
+    def _proximo_acesso(self, conexao):
+        return conexao.execute("SELECT COALESCE(MAX(acesso), 0) + 1 FROM livros").fetchone()[0]
+
+    def registrar(self, nome, pasta, caminho, capa="", data_criacao=None):
+        """Adiciona (ou atualiza) um livro e o coloca no topo dos recentes"""
+        data_criacao = data_criacao or datetime.now().isoformat()
+        with self.transacao() as conexao:
+            # Um livro recriado na mesma pasta substitui a entrada antiga
+            conexao.execute("DELETE FROM livros WHERE pasta = ? AND caminho != ?", (pasta, caminho))
+            conexao.execute(
+                "INSERT INTO livros (caminho, nome, pasta, capa, data_criacao, acesso) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (caminho) DO UPDATE SET nome = excluded.nome, pasta = excluded.pasta, "
+                "capa = excluded.capa, acesso = excluded.acesso, ausente = 0",
+                (caminho, nome, pasta, capa, data_criacao, self._proximo_acesso(conexao))
+            )
+            self._limitar_historico(conexao)
+
+    def tocar(self, caminho):
+        """Move um livro já conhecido para o topo dos recentes"""
+        with self.transacao() as conexao:
+            conexao.execute("UPDATE livros SET acesso = ?, ausente = 0 WHERE caminho = ?",
+                            (self._proximo_acesso(conexao), caminho))
+
+    def remover(self, caminho):
+        with self.transacao() as conexao:
+            conexao.execute("DELETE FROM livros WHERE caminho = ?", (caminho,))
+
+    def buscar(self, caminho):
+        linha = self.conexao.execute("SELECT * FROM livros WHERE caminho = ?", (caminho,)).fetchone()
+        return dict(linha) if linha else None
+
+    def listar(self, limite=LIMITE_HISTORICO):
+        """Livros do mais recente para o mais antigo"""
+        linhas = self.conexao.execute("SELECT * FROM livros ORDER BY acesso DESC LIMIT ?", (limite,))
+        return [dict(linha) for linha in linhas]
+
+    def registrar_progresso(self, caminho, palavras, dia=None):
+        """Guarda o total de palavras do livro no dia; o primeiro registro do dia marca o ponto de partida"""
+        dia = dia or datetime.now().date().isoformat()
+        with self.transacao() as conexao:
+            anterior = conexao.execute(
+                "SELECT palavras FROM progresso WHERE livro = ? AND dia < ? ORDER BY dia DESC LIMIT 1",
+                (caminho, dia)
+            ).fetchone()
+            conexao.execute(
+                "INSERT INTO progresso (livro, dia, palavras_inicio, palavras) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (livro, dia) DO UPDATE SET palavras = excluded.palavras",
+                (caminho, dia, anterior[0] if anterior else palavras, palavras)
+            )
+
+    def historico_progresso(self, caminho, dias=30):
+        """Os últimos dias com escrita, do mais recente para o mais antigo"""
+        linhas = self.conexao.execute(
+            "SELECT dia, palavras, palavras - palavras_inicio AS escritas FROM progresso "
+            "WHERE livro = ? ORDER BY dia DESC LIMIT ?",
+            (caminho, dias)
+        )
+        return [dict(linha) for linha in linhas]
+
+    def raizes(self):
+        """Pastas vasculhadas em busca de livros, com o mtime visto na última varredura"""
+        return {linha["pasta"]: linha["mtime"] for linha in self.conexao.execute("SELECT * FROM raizes")}
+
+    def adicionar_raiz(self, pasta):
+        with self.transacao() as conexao:
+            conexao.execute("INSERT OR IGNORE INTO raizes (pasta) VALUES (?)", (os.path.normpath(pasta),))
+
+    def remover_raiz(self, pasta):
+        with self.transacao() as conexao:
+            conexao.execute("DELETE FROM raizes WHERE pasta = ?", (pasta,))
+
+    def aplicar_varredura(self, alterados, descobertos, ausentes, removidos, raizes):
+        """Grava de uma vez o resultado de uma varredura.
+
+        Os livros descobertos entram no fim dos recentes (acesso 0): aparecem na
+        lista sem passar à frente dos que foram abertos de fato.
+        """
+        with self.transacao() as conexao:
+            conexao.executemany(
+                "UPDATE livros SET nome = ?, capa = ?, mtime = ?, ausente = 0 WHERE caminho = ?",
+                [(livro["nome"], livro["capa"], livro["mtime"], livro["caminho"]) for livro in alterados]
+            )
+            conexao.executemany(
+                "INSERT OR IGNORE INTO livros (caminho, nome, pasta, capa, data_criacao, acesso, mtime) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?)",
+                [(livro["caminho"], livro["nome"], livro["pasta"], livro["capa"], livro["data_criacao"],
+                  livro["mtime"]) for livro in descobertos]
+            )
+            conexao.executemany("UPDATE livros SET ausente = 1 WHERE caminho = ?",
+                                [(caminho,) for caminho in ausentes])
+            conexao.executemany("DELETE FROM livros WHERE caminho = ?", [(caminho,) for caminho in removidos])
+            conexao.executemany("UPDATE raizes SET mtime = ? WHERE pasta = ?",
+                                [(mtime, pasta) for pasta, mtime in raizes.items()])
+            self._limitar_historico(conexao)
+
+    def _limitar_historico(self, conexao):
+        conexao.execute(
+            "DELETE FROM livros WHERE id IN "
+            "(SELECT id FROM livros ORDER BY acesso DESC LIMIT -1 OFFSET ?)",
+            (LIMITE_HISTORICO,)
+        )
@@ -0,0 +1,260 @@
+import os
+import re
+import sqlite3
+import unicodedata
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from biblioteca import diretorio_central
+import livro
+
+VERSAO_ESQUEMA = 1
+
+ESQUEMA = [
+    """CREATE TABLE IF NOT EXISTS capitulos (
+        id INTEGER PRIMARY KEY,
+        livro TEXT NOT NULL,
+        indice INTEGER NOT NULL,
+        arquivo TEXT NOT NULL,
+        titulo TEXT NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        UNIQUE (livro, arquivo)
+    )""",
+    # remove_diacritics faz "acao" encontrar "ação"
+    """CREATE VIRTUAL TABLE IF NOT EXISTS textos USING fts5 (
+        nome_livro, titulo, texto, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+]
+
+MARCA_INICIO = "«"
+MARCA_FIM = "»"
+
+BLOCOS = {"p", "div", "br", "li", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "blockquote", "pre"}
+IGNORADOS = {"head", "style", "script", "title"}
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos, preservando a posição de cada caractere"""
+    return "".join(unicodedata.normalize("NFD", c)[0].lower()[:1] or c for c in texto)
+
+
+def termos_da_consulta(consulta):
+    return re.findall(r"\w+", consulta, re.UNICODE)
+
+
+def localizar_trecho(texto, consulta, trecho=""):
+    """(início, fim) no texto do capítulo da palavra buscada que está no trecho de um resultado.
+
+    O trecho é procurado palavra a palavra, ignorando acentos e pontuação.
+    Quando ele não está mais no texto (capítulo alterado depois de indexado),
+    vale o primeiro parágrafo com todos os termos, e depois a primeira
+    ocorrência do primeiro termo. Nada encontrado devolve None.
+    """
+    termos = [normalizar(termo) for termo in termos_da_consulta(consulta)]
+    if not termos:
+        return None
+    normalizado = normalizar(texto)
+
+    palavras = [normalizar(palavra) for palavra in termos_da_consulta(trecho)]
+    if palavras:
+        encontrado = re.search(r"\b" + r"\W+".join(f"({re.escape(p)})" for p in palavras), normalizado)
+        if encontrado:
+            for grupo, palavra in enumerate(palavras, 1):
+                if palavra.startswith(tuple(termos)):
+                    return encontrado.span(grupo)
+
+    # O índice busca por prefixo de palavra; aqui também
+    padroes = [re.compile(r"\b" + re.escape(termo) + r"\w*") for termo in termos]
+    inicio = 0
+    for paragrafo in normalizado.split("\n"):
+        if all(padrao.search(paragrafo) for padrao in padroes):
+            encontrado = padroes[0].search(paragrafo)
+            return inicio + encontrado.start(), inicio + encontrado.end()
+        inicio += len(paragrafo) + 1
+    encontrado = padroes[0].search(normalizado)
+    return encontrado.span() if encontrado else None
+
+
+class ExtratorTexto(HTMLParser):
+    """Texto puro de um capítulo, com uma quebra de linha por bloco"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.partes = []
+        self.ignorando = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in IGNORADOS:
+            self.ignorando += 1
+        elif tag in BLOCOS:
+            self.partes.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in IGNORADOS:
+            self.ignorando = max(0, self.ignorando - 1)
+
+    def handle_data(self, data):
+        if not self.ignorando:
+            self.partes.append(data)
+
+    def extrair(self, html):
+        self.feed(html)
+        self.close()
+        return "".join(self.partes).strip()
+
+
+class IndiceBusca:
+    """Índice invertido (SQLite FTS5) com o texto de todos os capítulos da biblioteca.
+
+    Cada capítulo é uma linha; `atualizar_livro` só relê os capítulos cujo
+    arquivo mudou desde a última indexação.
+    """
+
+    def __init__(self, caminho=None):
+        central_dir = diretorio_central()
+        os.makedirs(central_dir, exist_ok=True)
+        self.caminho = caminho or os.path.join(central_dir, "busca.db")
+
+        self.conexao = sqlite3.connect(self.caminho, timeout=10, isolation_level=None)
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("PRAGMA synchronous=NORMAL")
+        self.preparar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        self.conexao.close()
+
+    @contextmanager
+    def transacao(self):
+        self.conexao.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conexao
+        except BaseException:
+            self.conexao.execute("ROLLBACK")
+            raise
+        self.conexao.execute("COMMIT")
+
+    def preparar(self):
+        if self.conexao.execute("PRAGMA user_version").fetchone()[0] >= VERSAO_ESQUEMA:
+            return
+        with self.transacao() as conexao:
+            for comando in ESQUEMA:
+                conexao.execute(comando)
+            conexao.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+
+    def atualizar_livro(self, livro_aberto, conteudos=None):
+        """Reindexa os capítulos alterados de um livro.
+
+        `conteudos` (índice -> HTML) evita reler do disco o que acabou de ser
+        salvo; sem ele, todos os capítulos são conferidos pela data do arquivo.
+        """
+        caminho_livro = livro_aberto.caminho
+        existentes = {
+            arquivo: (id_capitulo, titulo, mtime_ns)
+            for id_capitulo, arquivo, titulo, mtime_ns in self.conexao.execute(
+                "SELECT id, arquivo, titulo, mtime_ns FROM capitulos WHERE livro = ?", (caminho_livro,)
+            )
+        }
+        indices = conteudos.keys() if conteudos is not None else range(len(livro_aberto.capitulos))
+
+        with self.transacao() as conexao:
+            for indice in indices:
+                capitulo = livro_aberto.capitulos[indice]
+                caminho = livro_aberto.caminho_capitulo(indice)
+                if not os.path.exists(caminho):
+                    continue
+                mtime_ns = os.stat(caminho).st_mtime_ns
+                atual = existentes.get(capitulo["arquivo"])
+
+                if conteudos is None and atual and atual[2] == mtime_ns:
+                    if atual[1] != capitulo["titulo"]:
+                        conexao.execute("UPDATE capitulos SET titulo = ? WHERE id = ?", (capitulo["titulo"], atual[0]))
+                        conexao.execute("UPDATE textos SET titulo = ? WHERE rowid = ?", (capitulo["titulo"], atual[0]))
+                    continue
+
+                html = conteudos[indice] if conteudos is not None else livro_aberto.ler_capitulo(indice)
+                texto = ExtratorTexto().extrair(html)
+
+                if atual:
+                    conexao.execute("DELETE FROM textos WHERE rowid = ?", (atual[0],))
+                    conexao.execute("UPDATE capitulos SET indice = ?, titulo = ?, mtime_ns = ? WHERE id = ?",
+                                    (indice, capitulo["titulo"], mtime_ns, atual[0]))
+                    id_capitulo = atual[0]
+                else:
+                    id_capitulo = conexao.execute(
+                        "INSERT INTO capitulos (livro, indice, arquivo, titulo, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+                        (caminho_livro, indice, capitulo["arquivo"], capitulo["titulo"], mtime_ns)
+                    ).lastrowid
+                conexao.execute("INSERT INTO textos (rowid, nome_livro, titulo, texto) VALUES (?, ?, ?, ?)",
+                                (id_capitulo, livro_aberto.nome, capitulo["titulo"], texto))
+
+            if conteudos is None:
+                # Capítulos que saíram do manifesto
+                arquivos = {capitulo["arquivo"] for capitulo in livro_aberto.capitulos}
+                for arquivo, (id_capitulo, _, _) in existentes.items():
+                    if arquivo not in arquivos:
+                        self._remover_capitulo(conexao, id_capitulo)
+
+    def remover_livro(self, caminho_livro):
+        with self.transacao() as conexao:
+            for (id_capitulo,) in conexao.execute("SELECT id FROM capitulos WHERE livro = ?", (caminho_livro,)).fetchall():
+                self._remover_capitulo(conexao, id_capitulo)
+
+    def livros_indexados(self):
+        return {linha[0] for linha in self.conexao.execute("SELECT DISTINCT livro FROM capitulos")}
+
+    def _remover_capitulo(self, conexao, id_capitulo):
+        conexao.execute("DELETE FROM textos WHERE rowid = ?", (id_capitulo,))
+        conexao.execute("DELETE FROM capitulos WHERE id = ?", (id_capitulo,))
+
+    def buscar(self, consulta, limite=50):
+        """Resultados ordenados por relevância (bm25), com trecho destacado"""
+        termos = termos_da_consulta(consulta)
+        if not termos:
+            return []
+
+        # Cada termo entre aspas (nada de sintaxe FTS vinda do usuário) e como prefixo
+        expressao = " ".join('"' + termo.replace('"', '""') + '"*' for termo in termos)
+        linhas = self.conexao.execute(
+            "SELECT c.livro, c.indice, t.nome_livro, t.titulo, "
+            f"snippet(textos, 2, '{MARCA_INICIO}', '{MARCA_FIM}', '…', 12), "
+            "bm25(textos, 2.0, 4.0, 1.0) AS nota "
+            "FROM textos t JOIN capitulos c ON c.id = t.rowid "
+            "WHERE textos MATCH ? ORDER BY nota LIMIT ?",
+            (expressao, limite)
+        )
+        return [
+            {"livro": livro_caminho, "capitulo": indice, "nome_livro": nome_livro, "titulo": titulo, "trecho": trecho}
+            for livro_caminho, indice, nome_livro, titulo, trecho, _ in linhas
+        ]
+
+
+def indexar_livro_salvo(livro_aberto, conteudos):
+    """Atualiza o índice com os capítulos que acabaram de chegar ao disco (roda na thread de gravação)"""
+    try:
+        with IndiceBusca() as indice:
+            indice.atualizar_livro(livro_aberto, conteudos)
+    except Exception as e:
+        # Os capítulos já estão no disco; um índice desatualizado se corrige na próxima sincronização
+        print(f"Erro ao atualizar índice de busca: {e}")
+
+
+def sincronizar_biblioteca(caminhos):
+    """Confere todos os livros da biblioteca, reindexando só os capítulos alterados fora do editor"""
+    with IndiceBusca() as indice:
+        vistos = set()
+        for caminho in caminhos:
+            try:
+                livro_aberto = livro.Livro.abrir(caminho)
+                indice.atualizar_livro(livro_aberto)
+                vistos.add(livro_aberto.caminho)
+            except Exception as e:
+                print(f"Erro ao indexar {caminho}: {e}")
+
+        # Livros que saíram da biblioteca ou não existem mais
+        for caminho in indice.livros_indexados() - vistos:
+            indice.remover_livro(caminho)
@@ -0,0 +1,679 @@
+import os
+import json
+import time
+import zlib
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from PySide6.QtCore import QObject, QEvent, QTimer, Qt, Signal
+from PySide6.QtGui import QKeyEvent, QKeySequence, QTextCursor
+from PySide6.QtWidgets import QApplication, QDialog, QFormLayout, QSpinBox, QCheckBox, QDialogButtonBox, QLabel
+from biblioteca import diretorio_central
+from historico import formatar_tamanho
+from livro import escrever_atomico
+import serializacao
+
+ARQUIVO_CONFIGURACAO = "desfazer.json"
+PASTA_PONTOS = "desfazer"
+
+CONFIGURACAO_PADRAO = {
+    "passos": 300,
+    "memoria_mb": 64,
+    # Guardar em disco os estados anteriores ao limite
+    "disco": True,
+}
+
+# O QTextDocument guarda o texto em UTF-16; cada passo tem ainda o comando e os formatos
+BYTES_CARACTERE = 2
+CUSTO_PASSO = 256
+
+# Digitação sem pausas maiores que isto vira um único passo, de no máximo DURACAO_GRUPO_S
+PAUSA_DIGITACAO_S = 1.5
+DURACAO_GRUPO_S = 20
+
+# O estado de cada nível e a poda esperam uma pausa na edição, quando o documento está no fim do último nível
+ATRASO_PAUSA_MS = 1500
+
+# Na poda, os níveis mais recentes viram um ponto cada; antes deles, há no máximo INTERVALO_PONTOS níveis entre dois pontos
+NIVEIS_INDIVIDUAIS = 10
+INTERVALO_PONTOS = 10
+
+# Pontos guardados por documento; os mais antigos saem primeiro
+LIMITE_PONTOS = 120
+
+# Pastas de pontos deixadas por uma execução que caiu
+IDADE_SOBRAS_S = 24 * 3600
+
+_configuracao = None
+_gravador = None
+
+
+def caminho_configuracao():
+    return os.path.join(diretorio_central(), ARQUIVO_CONFIGURACAO)
+
+
+def configuracao():
+    """Limites do desfazer, lidos de ~/EditorA5/desfazer.json na primeira vez"""
+    global _configuracao
+    if _configuracao is None:
+        _configuracao = dict(CONFIGURACAO_PADRAO)
+        try:
+            with open(caminho_configuracao(), "r", encoding="utf-8") as f:
+                _configuracao.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Erro ao ler a configuração do desfazer: {e}")
+    return _configuracao
+
+
+def salvar_configuracao(nova):
+    global _configuracao
+    _configuracao = dict(CONFIGURACAO_PADRAO, **nova)
+    os.makedirs(diretorio_central(), exist_ok=True)
+    escrever_atomico(caminho_configuracao(), json.dumps(_configuracao, indent=2))
+
+
+def limpar_sobras(pasta):
+    agora = time.time()
+    try:
+        nomes = os.listdir(pasta)
+    except OSError:
+        return
+    for nome in nomes:
+        caminho = os.path.join(pasta, nome)
+        try:
+            if agora - os.path.getmtime(caminho) > IDADE_SOBRAS_S:
+                shutil.rmtree(caminho, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def gravador():
+    """Thread única que compacta e grava os estados, na ordem em que chegam"""
+    global _gravador
+    if _gravador is None:
+        _gravador = ThreadPoolExecutor(1, thread_name_prefix="desfazer")
+    return _gravador
+
+
+def compactar(html, caminho):
+    """Na thread do desfazer: o caminho do arquivo gravado, ou os bytes compactados sem disco"""
+    dados = zlib.compress(html.encode("utf-8"), 1)
+    if caminho is None:
+        return dados
+    try:
+        with open(caminho, "wb") as f:
+            f.write(dados)
+    except OSError as e:
+        print(f"Erro ao guardar o histórico de desfazer em disco: {e}")
+        return dados
+    return caminho
+
+
+def apagar_estado(futuro):
+    try:
+        estado = futuro.result()
+    except Exception:
+        return
+    if isinstance(estado, str):
+        try:
+            os.remove(estado)
+        except OSError:
+            pass
+
+
+def descartar_estado(futuro):
+    if futuro is not None:
+        futuro.add_done_callback(apagar_estado)
+
+
+def e_digitacao(evento):
+    """Teclas que só escrevem ou apagam texto, sem atalhos"""
+    if evento.modifiers() & ~(Qt.ShiftModifier | Qt.KeypadModifier):
+        return False
+    if evento.key() in (Qt.Key_Return, Qt.Key_Enter, Qt.Key_Backspace, Qt.Key_Delete, Qt.Key_Tab):
+        return True
+    texto = evento.text()
+    return bool(texto) and texto.isprintable()
+
+
+class PontosEmDisco:
+    """Estados antigos de um documento, em HTML compactado numa pasta temporária.
+
+    A compactação e a gravação correm na thread do desfazer; cada estado é o
+    Future dela. A pasta só é criada no primeiro estado guardado e some junto
+    com o documento. Com o disco desligado na configuração, os estados ficam
+    compactados na própria memória.
+    """
+
+    _sobras_limpas = False
+
+    def __init__(self):
+        self.pasta = None
+        # Future de cada estado, com o caminho do arquivo ou os bytes compactados dos que estão na memória
+        self.estados = []
+        self.contador = 0
+
+    def __len__(self):
+        return len(self.estados)
+
+    def gravar(self, html, disco=True):
+        """Manda compactar e gravar um estado, sem pô-lo na lista de pontos"""
+        caminho = None
+        if disco:
+            try:
+                if self.pasta is None:
+                    base = os.path.join(diretorio_central(), PASTA_PONTOS)
+                    os.makedirs(base, exist_ok=True)
+                    if not PontosEmDisco._sobras_limpas:
+                        PontosEmDisco._sobras_limpas = True
+                        limpar_sobras(base)
+                    self.pasta = tempfile.mkdtemp(dir=base)
+                self.contador += 1
+                caminho = os.path.join(self.pasta, f"{self.contador}.html.z")
+            except OSError as e:
+                print(f"Erro ao guardar o histórico de desfazer em disco: {e}")
+        return gravador().submit(compactar, html, caminho)
+
+    def acrescentar(self, estado):
+        self.estados.append(estado)
+
+    def ler(self, indice):
+        estado = self.estados[indice].result()
+        if isinstance(estado, bytes):
+            return zlib.decompress(estado).decode("utf-8")
+        with open(estado, "rb") as f:
+            return zlib.decompress(f.read()).decode("utf-8")
+
+    def descartar(self, inicio, fim=None):
+        for estado in self.estados[inicio:fim]:
+            descartar_estado(estado)
+        del self.estados[inicio:fim]
+
+    def tamanho(self):
+        total = 0
+        # Os estados ainda na thread de gravação não entram na conta
+        for futuro in self.estados:
+            if not futuro.done() or futuro.exception() is not None:
+                continue
+            estado = futuro.result()
+            if isinstance(estado, bytes):
+                total += len(estado)
+                continue
+            try:
+                total += os.path.getsize(estado)
+            except OSError:
+                pass
+        return total
+
+    def apagar(self, *_):
+        if self.pasta is not None:
+            try:
+                # Na mesma thread, depois das gravações que ainda estão na fila
+                gravador().submit(shutil.rmtree, self.pasta, True)
+            except RuntimeError:
+                # Fim do programa: a thread já não aceita tarefas
+                shutil.rmtree(self.pasta, ignore_errors=True)
+        self.pasta = None
+        self.estados = []
+
+
+class HistoricoEdicao(QObject):
+    """Custo estimado e limites da pilha de desfazer de um QTextDocument.
+
+    Cada nível de desfazer guarda até onde vai na pilha de comandos do Qt e o
+    custo dos caracteres inseridos e removidos nele, vistos em
+    `contentsChange`, e o estado do documento na pausa da edição que o
+    encerra. O Qt não tem como apagar só os níveis mais antigos, então, acima
+    do limite, a pilha inteira é esvaziada e esses estados viram pontos (em
+    disco, ou compactados na memória): um por nível nos NIVEIS_INDIVIDUAIS
+    mais recentes e, antes deles, no máximo INTERVALO_PONTOS níveis entre dois
+    pontos. Quando a pilha em memória acaba, o desfazer continua por eles.
+    """
+
+    alterado = Signal()
+    restaurado = Signal()
+
+    def __init__(self, documento):
+        super().__init__(documento)
+        self.documento = documento
+        # [comandos na pilha do Qt ao fim do nível, custo em bytes, estado guardado ao fim dele ou None]
+        self.niveis = []
+        self.desfeitos = []
+        self.pendente = 0
+        self.revisao = documento.revision()
+        self.navegando = False
+        self.digitando = False
+        self.juntando = False
+
+        # Digitação em curso: (início, última tecla, comandos na pilha, posição do cursor)
+        self.grupo = None
+
+        # `ponto` é o estado em disco em que a pilha em memória começa (-1: nenhum)
+        self.pontos = PontosEmDisco()
+        self.ponto = -1
+        # Estado em que a pilha em memória começa, enquanto não há ponto
+        self.inicio = None
+
+        documento.contentsChange.connect(self.conteudo_alterado)
+        documento.undoCommandAdded.connect(self.sincronizar)
+        documento.destroyed.connect(self.pontos.apagar)
+
+    @classmethod
+    def do_documento(cls, documento):
+        historico = getattr(documento, "historico_edicao", None)
+        if historico is None:
+            historico = cls(documento)
+            documento.historico_edicao = historico
+        return historico
+
+    @contextmanager
+    def navegacao(self):
+        """Mudanças feitas pelo próprio desfazer não são níveis novos"""
+        self.navegando = True
+        try:
+            yield
+        finally:
+            self.navegando = False
+            self.revisao = self.documento.revision()
+
+    def conteudo_alterado(self, inicio, removidos, adicionados):
+        # O realce ortográfico também emite contentsChange, mas sem mudar a revisão
+        revisao = self.documento.revision()
+        if self.navegando or revisao == self.revisao:
+            return
+        self.revisao = revisao
+        self.pendente += (removidos + adicionados) * BYTES_CARACTERE
+        if not self.digitando:
+            self.grupo = None
+        if not self.juntando:
+            self.sincronizar()
+
+    def sincronizar(self, juntar=False):
+        """Acerta a lista de níveis com a pilha de comandos do documento"""
+        if self.navegando or self.juntando:
+            return
+        comandos = self.documento.availableUndoSteps()
+        if not self.documento.isRedoAvailable():
+            self.descartar_estados(self.desfeitos)
+            self.desfeitos.clear()
+            if comandos == 0:
+                # Pilha esvaziada por setHtml: o começo dela mudou
+                descartar_estado(self.inicio)
+                self.inicio = None
+        # Pilha esvaziada por setHtml, ou desfeita por fora deste histórico
+        while self.niveis and self.niveis[-1][0] > comandos:
+            descartar_estado(self.niveis.pop()[2])
+
+        fim = self.niveis[-1][0] if self.niveis else 0
+        if comandos > fim and not (juntar and self.niveis):
+            self.niveis.append([comandos, self.pendente, None])
+        elif self.niveis:
+            # Letras seguidas que o Qt juntou no último comando, ou digitação unida ao nível anterior
+            self.niveis[-1][0] = comandos
+            self.niveis[-1][1] += self.pendente
+            if self.pendente:
+                # O estado guardado na pausa já não é o do fim do nível
+                descartar_estado(self.niveis[-1][2])
+                self.niveis[-1][2] = None
+        else:
+            return
+        self.pendente = 0
+
+        # Editar depois de voltar a um ponto antigo descarta os pontos seguintes
+        if 0 <= self.ponto < len(self.pontos) - 1:
+            self.pontos.descartar(self.ponto + 1)
+        self.alterado.emit()
+
+    def passos(self):
+        return len(self.niveis) + len(self.desfeitos)
+
+    def memoria(self):
+        custo = sum(nivel[1] for nivel in self.niveis) + sum(nivel[1] for nivel in self.desfeitos)
+        return custo + self.pendente + CUSTO_PASSO * self.passos()
+
+    def excedido(self):
+        limites = configuracao()
+        return self.passos() > limites["passos"] or self.memoria() > limites["memoria_mb"] * 1024 * 1024
+
+    def pode_desfazer(self):
+        return self.documento.isUndoAvailable() or self.ponto > 0
+
+    def pode_refazer(self):
+        return self.documento.isRedoAvailable() or 0 <= self.ponto < len(self.pontos) - 1
+
+    def desfazer(self, editor):
+        self.grupo = None
+        if self.documento.isUndoAvailable():
+            with self.navegacao():
+                editor.undo()
+            comandos = self.documento.availableUndoSteps()
+            while self.niveis and self.niveis[-1][0] > comandos:
+                self.desfeitos.append(self.niveis.pop())
+            self.alterado.emit()
+        elif self.ponto > 0:
+            if self.documento.isRedoAvailable():
+                # Os níveis desfeitos só existem na pilha do Qt, que o ponto anterior vai substituir
+                if self.desfeitos and self.desfeitos[0][2] is None:
+                    # Sem pausa depois do último nível, o estado dele só está no fim da pilha de refazer
+                    with self.navegacao():
+                        while self.documento.isRedoAvailable():
+                            self.documento.redo()
+                        self.desfeitos[0][2] = self.estado_atual()
+                self.guardar_niveis()
+            self.restaurar_ponto(self.ponto - 1, editor)
+
+    def refazer(self, editor):
+        self.grupo = None
+        if self.documento.isRedoAvailable():
+            with self.navegacao():
+                editor.redo()
+            comandos = self.documento.availableUndoSteps()
+            while self.desfeitos and self.desfeitos[-1][0] <= comandos:
+                self.niveis.append(self.desfeitos.pop())
+            self.alterado.emit()
+        elif 0 <= self.ponto < len(self.pontos) - 1:
+            self.restaurar_ponto(self.ponto + 1, editor)
+
+    def descartar_estados(self, niveis):
+        for nivel in niveis:
+            descartar_estado(nivel[2])
+            nivel[2] = None
+
+    def limpar_niveis(self):
+        self.descartar_estados(self.niveis)
+        self.descartar_estados(self.desfeitos)
+        descartar_estado(self.inicio)
+        self.inicio = None
+        self.niveis.clear()
+        self.desfeitos.clear()
+        self.pendente = 0
+        self.grupo = None
+
+    def restaurar_ponto(self, indice, editor):
+        try:
+            html = self.pontos.ler(indice)
+        except (OSError, zlib.error) as e:
+            print(f"Erro ao ler o histórico de desfazer: {e}")
+            return
+        posicao = editor.textCursor().position()
+        with self.navegacao():
+            serializacao.carregar_html(self.documento, html)
+            self.documento.setModified(True)
+        self.ponto = indice
+        self.limpar_niveis()
+
+        cursor = editor.textCursor()
+        cursor.setPosition(min(posicao, self.documento.characterCount() - 1))
+        editor.setTextCursor(cursor)
+        editor.ensureCursorVisible()
+        self.restaurado.emit()
+        self.alterado.emit()
+
+    def estado_atual(self):
+        return self.pontos.gravar(serializacao.para_html(self.documento), configuracao()["disco"])
+
+    @contextmanager
+    def percurso(self, editor):
+        """Anda pela pilha sem criar níveis, devolvendo ao fim o cursor e a rolagem do editor"""
+        cursor = editor.textCursor()
+        ancora, posicao = cursor.anchor(), cursor.position()
+        rolagem = editor.verticalScrollBar().value()
+        with self.navegacao():
+            yield
+        cursor.setPosition(ancora)
+        cursor.setPosition(posicao, QTextCursor.KeepAnchor)
+        editor.setTextCursor(cursor)
+        editor.verticalScrollBar().setValue(rolagem)
+
+    def guardar_estado(self, editor):
+        """Na pausa da edição, guarda o estado atual como o do fim do último nível.
+
+        Enquanto não há ponto, guarda também o começo da pilha, desfazendo os
+        poucos níveis feitos até a primeira pausa.
+        """
+        if self.navegando or self.juntando or self.pendente:
+            return
+        if (self.ponto < 0 and self.inicio is None and not self.documento.isRedoAvailable()
+                and len(self.niveis) <= NIVEIS_INDIVIDUAIS):
+            with self.percurso(editor):
+                while self.documento.isUndoAvailable():
+                    self.documento.undo()
+                self.inicio = self.estado_atual()
+                while self.documento.isRedoAvailable():
+                    self.documento.redo()
+        if self.niveis and self.niveis[-1][2] is None and self.niveis[-1][0] == self.documento.availableUndoSteps():
+            self.niveis[-1][2] = self.estado_atual()
+            self.rarear(self.niveis)
+
+    def rarear(self, niveis):
+        """Descarta estados de níveis antigos, deixando no máximo INTERVALO_PONTOS níveis entre dois guardados"""
+        recentes = len(niveis) - NIVEIS_INDIVIDUAIS
+        guardados = [i for i, nivel in enumerate(niveis) if nivel[2] is not None]
+        # -1 é o começo da pilha
+        anterior = -1
+        for i, proximo in zip(guardados, guardados[1:]):
+            if i >= recentes:
+                break
+            if proximo - anterior <= INTERVALO_PONTOS:
+                descartar_estado(niveis[i][2])
+                niveis[i][2] = None
+            else:
+                anterior = i
+
+    def guardar_niveis(self):
+        """Passa os estados guardados da pilha para os pontos, depois do ponto em que ela começa"""
+        niveis = self.niveis + self.desfeitos[::-1]
+        self.rarear(niveis)
+        self.pontos.descartar(self.ponto + 1)
+        if self.ponto < 0 and self.inicio is not None:
+            self.pontos.acrescentar(self.inicio)
+        self.inicio = None
+        # O documento está no fim do último nível feito, ou no começo da pilha se todos foram desfeitos
+        atual = len(self.pontos) - 1
+        for i, nivel in enumerate(niveis):
+            if nivel[2] is None:
+                continue
+            self.pontos.acrescentar(nivel[2])
+            nivel[2] = None
+            if i < len(self.niveis):
+                atual = len(self.pontos) - 1
+        self.ponto = atual
+        excesso = len(self.pontos) - LIMITE_PONTOS
+        if excesso > 0:
+            self.pontos.descartar(0, excesso)
+            self.ponto -= excesso
+
+    def podar(self, editor):
+        """Esvazia a pilha do documento, passando antes para os pontos os estados guardados dos níveis"""
+        if self.documento.isRedoAvailable():
+            # Só poda no estado mais recente; desfazer não faz a memória crescer
+            return
+        self.guardar_estado(editor)
+        if self.niveis and self.niveis[-1][2] is None:
+            self.niveis[-1][2] = self.estado_atual()
+        self.guardar_niveis()
+
+        # Desligar o desfazer apaga a pilha e deixa o documento descartar o texto que só ela usava
+        self.documento.setUndoRedoEnabled(False)
+        self.documento.setUndoRedoEnabled(True)
+        self.limpar_niveis()
+        self.alterado.emit()
+
+    def iniciar_digitacao(self, posicao):
+        """Diz se a tecla deve entrar no mesmo nível da digitação anterior"""
+        self.digitando = True
+        juntar = False
+        if self.grupo is not None:
+            inicio, ultima, comandos, posicao_grupo = self.grupo
+            agora = time.monotonic()
+            juntar = (posicao == posicao_grupo and comandos == self.documento.availableUndoSteps()
+                      and agora - ultima < PAUSA_DIGITACAO_S and agora - inicio < DURACAO_GRUPO_S)
+        self.juntando = juntar
+        return juntar
+
+    def concluir_digitacao(self, posicao, juntou):
+        self.digitando = False
+        self.juntando = False
+        self.sincronizar(juntar=juntou)
+        agora = time.monotonic()
+        inicio = self.grupo[0] if juntou and self.grupo else agora
+        self.grupo = (inicio, agora, self.documento.availableUndoSteps(), posicao)
+
+    def resumo(self):
+        texto = f"Desfazer: {self.passos()} passos · {formatar_tamanho(self.memoria())}"
+        if len(self.pontos):
+            texto += f" · {len(self.pontos)} anteriores ({formatar_tamanho(self.pontos.tamanho())})"
+        return texto
+
+
+class ControleDesfazer(QObject):
+    """Faz todo desfazer/refazer do editor passar pelo histórico do documento aberto.
+
+    Os atalhos são interceptados antes do QTextEdit, e as teclas de digitação
+    são reenviadas dentro de um bloco de edição unido ao anterior quando
+    continuam a digitação, o que junta uma sequência de digitação num passo.
+    """
+
+    alterado = Signal()
+    restaurado = Signal()
+
+    def __init__(self, editor, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.historico = None
+        self.reenviando = False
+        editor.installEventFilter(self)
+        editor.controle_desfazer = self
+
+        self.temporizador_pausa = QTimer(self)
+        self.temporizador_pausa.setSingleShot(True)
+        self.temporizador_pausa.setInterval(ATRASO_PAUSA_MS)
+        self.temporizador_pausa.timeout.connect(self.pausa)
+
+    @classmethod
+    def do_editor(cls, editor):
+        return getattr(editor, "controle_desfazer", None)
+
+    def acompanhar(self, documento):
+        if self.historico is not None:
+            self.historico.alterado.disconnect(self.historico_alterado)
+            self.historico.restaurado.disconnect(self.restaurado)
+        self.historico = HistoricoEdicao.do_documento(documento)
+        self.historico.alterado.connect(self.historico_alterado)
+        self.historico.restaurado.connect(self.restaurado)
+        self.historico_alterado()
+
+    def historico_alterado(self):
+        self.alterado.emit()
+        if self.historico.niveis:
+            self.temporizador_pausa.start()
+
+    def pausa(self):
+        """Guarda o estado do último nível e poda a pilha se ela passou do limite"""
+        if self.historico is None:
+            return
+        self.historico.guardar_estado(self.editor)
+        if self.historico.excedido():
+            self.historico.podar(self.editor)
+
+    def desfazer(self):
+        if self.historico is not None:
+            self.historico.desfazer(self.editor)
+
+    def refazer(self):
+        if self.historico is not None:
+            self.historico.refazer(self.editor)
+
+    def resumo(self):
+        return self.historico.resumo() if self.historico is not None else ""
+
+    def ajustar_menu(self, menu):
+        """Troca as ações padrão do menu de contexto pelas do histórico"""
+        for nome, metodo, disponivel in (("edit-undo", self.desfazer, self.historico.pode_desfazer),
+                                         ("edit-redo", self.refazer, self.historico.pode_refazer)):
+            for acao in menu.actions():
+                if acao.objectName() == nome:
+                    acao.triggered.disconnect()
+                    acao.triggered.connect(metodo)
+                    acao.setEnabled(disponivel())
+
+    def eventFilter(self, objeto, evento):
+        if evento.type() != QEvent.KeyPress or self.reenviando or self.historico is None:
+            return False
+        if evento.matches(QKeySequence.Undo):
+            self.desfazer()
+            return True
+        if evento.matches(QKeySequence.Redo):
+            self.refazer()
+            return True
+        if self.editor.isReadOnly() or not e_digitacao(evento):
+            return False
+
+        # O temporizador guardaria o estado e podaria no meio da digitação
+        self.temporizador_pausa.stop()
+        historico = self.historico
+        juntar = historico.iniciar_digitacao(self.editor.textCursor().position())
+        cursor = self.editor.textCursor()
+        if juntar:
+            cursor.joinPreviousEditBlock()
+        self.reenviando = True
+        try:
+            copia = QKeyEvent(evento.type(), evento.key(), evento.modifiers(), evento.text(),
+                              evento.isAutoRepeat(), evento.count())
+            QApplication.sendEvent(self.editor, copia)
+        finally:
+            self.reenviando = False
+            if juntar:
+                cursor.endEditBlock()
+            historico.concluir_digitacao(self.editor.textCursor().position(), juntar)
+        self.temporizador_pausa.start()
+        return True
+
+
+class DialogoDesfazer(QDialog):
+    """Limites do desfazer, valendo para todos os documentos"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Desfazer")
+        atual = configuracao()
+
+        layout = QFormLayout(self)
+        self.passos = QSpinBox()
+        self.passos.setRange(10, 100000)
+        self.passos.setValue(atual["passos"])
+        layout.addRow("Passos em memória", self.passos)
+
+        self.memoria = QSpinBox()
+        self.memoria.setRange(1, 4096)
+        self.memoria.setSuffix(" MB")
+        self.memoria.setValue(atual["memoria_mb"])
+        layout.addRow("Memória máxima", self.memoria)
+
+        self.disco = QCheckBox("Guardar em disco o histórico além do limite")
+        self.disco.setToolTip("Desligado, o histórico além do limite fica compactado na memória")
+        self.disco.setChecked(atual["disco"])
+        layout.addRow(self.disco)
+
+        explicacao = QLabel(
+            f"Acima do limite, o histórico em memória é esvaziado e guardado em pontos, tirados nas pausas "
+            f"da edição: o desfazer volta um passo por vez nos {NIVEIS_INDIVIDUAIS} mais recentes e até "
+            f"{INTERVALO_PONTOS} passos de uma vez antes deles."
+        )
+        explicacao.setWordWrap(True)
+        layout.addRow(explicacao)
+
+        botoes = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        botoes.accepted.connect(self.accept)
+        botoes.rejected.connect(self.reject)
+        layout.addRow(botoes)
+
+    def configuracao(self):
+        return {
+            "passos": self.passos.value(),
+            "memoria_mb": self.memoria.value(),
+            "disco": self.disco.isChecked(),
+        }
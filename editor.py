@@ -1,14 +1,35 @@
 import os
+import functools
 import sys
+from collections import OrderedDict
+from datetime import datetime
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QTextEdit, QFileDialog, QMessageBox,
-    QFontComboBox, QComboBox, QWidget, QInputDialog,
-    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QCheckBox, QGridLayout
+    QFontComboBox, QComboBox, QWidget, QInputDialog, QListWidget,
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QCheckBox, QGridLayout,
+    QProgressBar, QProgressDialog, QToolButton
 )
-from PySide6.QtGui import QFont, QTextCursor, QTextListFormat, QAction, QIcon, QTextCharFormat, QTextBlockFormat, QImage, QPixmap
-from PySide6.QtCore import QFile, Qt, QUrl
-from PySide6.QtUiTools import QUiLoader
-import json
+from PySide6.QtGui import QFont, QTextCursor, QTextListFormat, QAction, QIcon, QTextCharFormat, QTextBlockFormat, QImage, QPixmap, QTextImageFormat, QImageReader
+from PySide6.QtCore import Qt, QUrl, QSize, QTimer, QSignalBlocker
+import formularios
+import janelas
+import livro
+import autosave
+import imagens
+import estrutura
+import estatisticas
+import ortografia
+import instrumentacao
+import serializacao
+import desfazer
+import vigilancia
+import estilos
+
+# Quantos capítulos não alterados podem ficar carregados ao mesmo tempo
+LIMITE_CAPITULOS_EM_MEMORIA = 3
+
+# Área da pré-visualização no diálogo de redimensionamento
+TAMANHO_PREVIA = QSize(320, 240)
 
 
 class RedimensionarImagemDialog(QDialog):
@@ -16,19 +37,38 @@ class RedimensionarImagemDialog(QDialog):
         super().__init__(parent)
         self.setWindowTitle("Redimensionar Imagem")
         self.caminho_imagem = caminho_imagem
-        self.imagem = QImage(caminho_imagem)
+        self.imagem = QImage()
 
-        if self.imagem.isNull():
+        # Só o cabeçalho é lido aqui; a imagem inteira nunca é decodificada na thread da interface
+        self.tamanho_original = QImageReader(caminho_imagem).size()
+        if not self.tamanho_original.isValid():
             QMessageBox.warning(self, "Erro", "Não foi possível carregar a imagem.")
             return
 
+        try:
+            self.previa = imagens.ler_reduzida(
+                caminho_imagem, self.tamanho_original.scaled(TAMANHO_PREVIA, Qt.KeepAspectRatio), suave=False
+            )
+        except ValueError:
+            QMessageBox.warning(self, "Erro", "Não foi possível carregar a imagem.")
+            return
+
+        self.redimensionador = imagens.Redimensionador()
+        self.redimensionador.concluida.connect(self.redimensionamento_concluido)
+        self.redimensionador.falhou.connect(self.redimensionamento_falhou)
+
         # Layouts
         layout = QVBoxLayout()
         form_layout = QHBoxLayout()
 
+        # Pré-visualização em baixa resolução
+        self.previa_label = QLabel()
+        self.previa_label.setFixedSize(TAMANHO_PREVIA)
+        self.previa_label.setAlignment(Qt.AlignCenter)
+
         # Largura e Altura
-        self.largura_input = QLineEdit(str(self.imagem.width()))
-        self.altura_input = QLineEdit(str(self.imagem.height()))
+        self.largura_input = QLineEdit(str(self.tamanho_original.width()))
+        self.altura_input = QLineEdit(str(self.tamanho_original.height()))
 
         form_layout.addWidget(QLabel("Largura:"))
         form_layout.addWidget(self.largura_input)
@@ -39,12 +79,19 @@ class RedimensionarImagemDialog(QDialog):
         self.manter_proporcao_check = QCheckBox("Manter a proporção")
         self.manter_proporcao_check.setChecked(True)  # Marcar por padrão
 
+        # Progresso da reamostragem final
+        self.progresso = QProgressBar()
+        self.progresso.setRange(0, 0)
+        self.progresso.hide()
+
         # Botões de ação
         self.botao_ok = QPushButton("Aplicar")
         self.botao_cancelar = QPushButton("Cancelar")
 
+        layout.addWidget(self.previa_label)
         layout.addLayout(form_layout)
         layout.addWidget(self.manter_proporcao_check)
+        layout.addWidget(self.progresso)
         layout.addWidget(self.botao_ok)
         layout.addWidget(self.botao_cancelar)
 
@@ -54,28 +101,70 @@ class RedimensionarImagemDialog(QDialog):
         self.botao_ok.clicked.connect(self.aplicar_redimensionamento)
         self.botao_cancelar.clicked.connect(self.reject)
 
-    def aplicar_redimensionamento(self):
-        largura = int(self.largura_input.text())
-        altura = int(self.altura_input.text())
+        self.largura_input.textChanged.connect(self.atualizar_previa)
+        self.altura_input.textChanged.connect(self.atualizar_previa)
+        self.manter_proporcao_check.toggled.connect(self.atualizar_previa)
+        self.atualizar_previa()
+
+    def tamanho_final(self):
+        try:
+            largura = int(self.largura_input.text())
+            altura = int(self.altura_input.text())
+        except ValueError:
+            return None
+        if largura <= 0 or altura <= 0:
+            return None
 
         if self.manter_proporcao_check.isChecked():
             # Redimensionar mantendo a proporção
-            self.imagem = self.imagem.scaled(largura, altura, Qt.KeepAspectRatio)
-        else:
-            # Redimensionar sem manter a proporção
-            self.imagem = self.imagem.scaled(largura, altura, Qt.IgnoreAspectRatio)
+            return self.tamanho_original.scaled(largura, altura, Qt.KeepAspectRatio)
+        # Redimensionar sem manter a proporção
+        return QSize(largura, altura)
+
+    def atualizar_previa(self):
+        """Mostra o resultado usando só a cópia reduzida já decodificada"""
+        tamanho = self.tamanho_final()
+        self.botao_ok.setEnabled(tamanho is not None)
+        if tamanho is None:
+            return
+
+        area = tamanho.scaled(TAMANHO_PREVIA, Qt.KeepAspectRatio)
+        if tamanho.width() <= area.width() and tamanho.height() <= area.height():
+            area = tamanho
+        previa = self.previa.scaled(area, Qt.IgnoreAspectRatio, Qt.FastTransformation)
+        self.previa_label.setPixmap(QPixmap.fromImage(previa))
 
+    def aplicar_redimensionamento(self):
+        tamanho = self.tamanho_final()
+        if tamanho is None:
+            return
+
+        self.botao_ok.setEnabled(False)
+        self.largura_input.setEnabled(False)
+        self.altura_input.setEnabled(False)
+        self.manter_proporcao_check.setEnabled(False)
+        self.progresso.show()
+        self.redimensionador.iniciar(self.caminho_imagem, tamanho)
+
+    def redimensionamento_concluido(self, imagem):
+        if not self.isVisible():
+            return
+        self.imagem = imagem
         self.accept()
 
+    def redimensionamento_falhou(self, mensagem):
+        self.progresso.hide()
+        self.botao_ok.setEnabled(True)
+        self.largura_input.setEnabled(True)
+        self.altura_input.setEnabled(True)
+        self.manter_proporcao_check.setEnabled(True)
+        QMessageBox.warning(self, "Erro", f"Não foi possível redimensionar a imagem: {mensagem}")
+
 class EditorWindow(QMainWindow):
     def __init__(self, html_path=None):
         super().__init__()
 
-        loader = QUiLoader()
-        ui_file = QFile("editor.ui")
-        ui_file.open(QFile.ReadOnly)
-        self.ui = loader.load(ui_file)
-        ui_file.close()
+        self.ui = formularios.carregar_formulario("editor")
 
         self.setCentralWidget(self.ui)
         self.setWindowTitle("Editor A5")
@@ -89,12 +178,24 @@ class EditorWindow(QMainWindow):
         self.current_file_path = html_path
         self.arquivo_alterado = False
 
+        self.livro = None
+        self.capitulo_atual = -1
+        self.documentos = OrderedDict()
+        self.revisoes_diario = {}
+        self.importacao = None
+        self.cache_imagens = imagens.CacheImagens()
+        self.estilos = estilos.estilos_do_livro(None)
+
+        self.autosalvamento = autosave.Autosalvamento(self.coletar_instantaneos, self)
+        self.autosalvamento.erro.connect(self.falha_ao_salvar)
+
         self.setup_ui()
         self.conectar_sinais()
 
         if html_path and os.path.exists(html_path):
             self.carregar_arquivo(html_path)
-            self.setWindowTitle(f"Editor A5 - {os.path.basename(html_path)}")
+        else:
+            self.verificar_recuperacao()
 
         action_inicio = self.ui.findChild(QAction, "actionInicio")
         if action_inicio:
@@ -105,9 +206,65 @@ class EditorWindow(QMainWindow):
     def setup_ui(self):
         self.editor = self.ui.findChild(QTextEdit, "textEdit")
         self.editor.setAcceptRichText(True)
-        self.definir_formatacao_padrao()
         self.editor.textChanged.connect(self.marcar_como_alterado)
 
+        self.lista_capitulos = self.ui.findChild(QListWidget, "listaCapitulos")
+        self.lista_capitulos.currentRowChanged.connect(self.abrir_capitulo)
+        self.lista_capitulos.itemDoubleClicked.connect(self.renomear_capitulo)
+
+        self.navegador = estrutura.NavegadorEstrutura(self.ui.findChild(QListWidget, "listaEstrutura"), self.editor, self)
+
+        # Modo de páginas A5: outra vista do mesmo documento, criada na primeira vez que é ligada
+        self.modo_paginas = False
+        self.vista_paginas = None
+
+        # Verificação ortográfica em segundo plano, com sugestões no menu de contexto
+        self.verificador = ortografia.Verificador(self)
+        self.realce_ortografico = ortografia.RealceOrtografico(self.editor, self.verificador)
+        self.editor.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.editor.customContextMenuRequested.connect(self.menu_contexto)
+
+        # Contagem do capítulo aberto; o texto da barra é refeito uma vez por volta do laço de eventos
+        self.estatisticas = None
+        self.rotulo_estatisticas = QLabel()
+        self.ui.statusBar().addPermanentWidget(self.rotulo_estatisticas)
+        self.temporizador_estatisticas = QTimer(self)
+        self.temporizador_estatisticas.setSingleShot(True)
+        self.temporizador_estatisticas.setInterval(0)
+        self.temporizador_estatisticas.timeout.connect(self.atualizar_estatisticas)
+
+        # Desfazer com limites de passos e de memória; a barra mostra quanto a pilha ocupa
+        self.controle_desfazer = desfazer.ControleDesfazer(self.editor, self)
+        self.controle_desfazer.restaurado.connect(self.marcar_como_alterado)
+        self.botao_desfazer = QToolButton()
+        self.botao_desfazer.setAutoRaise(True)
+        self.botao_desfazer.setToolTip("Limites do desfazer")
+        self.botao_desfazer.clicked.connect(self.configurar_desfazer)
+        self.ui.statusBar().addPermanentWidget(self.botao_desfazer)
+        self.temporizador_desfazer = QTimer(self)
+        self.temporizador_desfazer.setSingleShot(True)
+        self.temporizador_desfazer.setInterval(0)
+        self.temporizador_desfazer.timeout.connect(self.atualizar_desfazer)
+        self.controle_desfazer.alterado.connect(self.temporizador_desfazer.start)
+
+        # Arquivos do livro alterados por outro programa (sincronização, outro editor)
+        self.vigia = vigilancia.VigiaLivro(self)
+        self.vigia.capitulo_alterado.connect(self.alteracao_externa)
+        self.vigia.imagem_alterada.connect(self.imagem_externa)
+        self.vigia.manifesto_alterado.connect(self.manifesto_externo)
+
+        # Medida do layout quando o diagnóstico foi ligado pela variável de ambiente
+        instrumentacao.instalar_medidor_pintura()
+
+        # Estilos de parágrafo da folha do livro; a lista é refeita sempre que a folha muda
+        self.combo_estilo = self.ui.findChild(QComboBox, "comboEstilo")
+        self.combo_estilo.activated.connect(self.escolher_estilo)
+
+        # Barra de localizar/substituir, criada no primeiro uso
+        self.barra_localizar = None
+
+        self.iniciar_documento_vazio()
+
         self.combo_fonte = self.ui.findChild(QFontComboBox, "comboFonte")
         if not self.combo_fonte:
             self.combo_fonte = QFontComboBox(self)
@@ -120,12 +277,32 @@ class EditorWindow(QMainWindow):
         self.combo_tamanho.setCurrentText("12")
         self.combo_tamanho.currentTextChanged.connect(self.aplicar_tamanho)
 
+        # Vários sinais de cursor na mesma volta do laço de eventos viram uma única atualização
+        self.estado_formatacao = None
+        self.temporizador_formatacao = QTimer(self)
+        self.temporizador_formatacao.setSingleShot(True)
+        self.temporizador_formatacao.setInterval(0)
+        self.temporizador_formatacao.timeout.connect(self.atualizar_estado_formatacao)
+        self.editor.cursorPositionChanged.connect(self.temporizador_formatacao.start)
+        self.editor.currentCharFormatChanged.connect(self.temporizador_formatacao.start)
+
         self.definir_icones_fallback()
 
     def definir_formatacao_padrao(self):
-        formato = QTextCharFormat()
-        formato.setFont(QFont("Times New Roman", 12))
-        self.editor.mergeCurrentCharFormat(formato)
+        self.editor.mergeCurrentCharFormat(estilos.formato_caractere(self.estilos[estilos.CORPO]))
+
+    def definir_estilos_do_livro(self):
+        self.estilos = estilos.estilos_do_livro(self.livro)
+        self.preencher_estilos()
+
+    def preencher_estilos(self):
+        bloqueio = QSignalBlocker(self.combo_estilo)
+        self.combo_estilo.clear()
+        for identificador, estilo in self.estilos.items():
+            self.combo_estilo.addItem(estilo.get("nome") or identificador, identificador)
+        del bloqueio
+        # A barra volta a mostrar o estilo sob o cursor na próxima atualização
+        self.estado_formatacao = None
 
     def definir_icones_fallback(self):
         actions_icons = {
@@ -156,8 +333,8 @@ class EditorWindow(QMainWindow):
         self.ui.findChild(QAction, "actionAbrir").triggered.connect(self.abrir_arquivo)
         self.ui.findChild(QAction, "actionSalvar").triggered.connect(self.salvar_arquivo)
 
-        self.ui.findChild(QAction, "actionDesfazer").triggered.connect(self.editor.undo)
-        self.ui.findChild(QAction, "actionRefazer").triggered.connect(self.editor.redo)
+        self.ui.findChild(QAction, "actionDesfazer").triggered.connect(self.controle_desfazer.desfazer)
+        self.ui.findChild(QAction, "actionRefazer").triggered.connect(self.controle_desfazer.refazer)
 
         self.ui.findChild(QAction, "actionNegrito").triggered.connect(self.toggle_negrito)
         self.ui.findChild(QAction, "actionItalico").triggered.connect(self.toggle_italico)
@@ -174,8 +351,19 @@ class EditorWindow(QMainWindow):
         self.ui.findChild(QAction, "actionTitulo").triggered.connect(self.formatar_titulo)
         self.ui.findChild(QAction, "actionSubtitulo").triggered.connect(self.formatar_subtitulo)
         self.ui.findChild(QAction, "actionTexto").triggered.connect(self.formatar_texto)
+        self.ui.findChild(QAction, "actionEstilos").triggered.connect(self.editar_estilos)
 
         self.ui.findChild(QAction, "actionImagem").triggered.connect(self.adicionar_imagem)
+        self.ui.findChild(QAction, "actionNovoCapitulo").triggered.connect(self.novo_capitulo)
+        self.ui.findChild(QAction, "actionLocalizar").triggered.connect(self.abrir_localizar)
+        self.ui.findChild(QAction, "actionEstatisticas").triggered.connect(self.mostrar_estatisticas)
+        self.ui.findChild(QAction, "actionHistorico").triggered.connect(self.mostrar_historico)
+        self.ui.findChild(QAction, "actionPaginas").toggled.connect(self.alternar_paginas)
+        self.ui.findChild(QAction, "actionConfigurarPagina").triggered.connect(self.configurar_pagina)
+
+        action_diagnostico = self.ui.findChild(QAction, "actionDiagnostico")
+        action_diagnostico.setChecked(instrumentacao.ativo())
+        action_diagnostico.triggered.connect(self.alternar_diagnostico)
 
     def adicionar_imagem(self):
             # Abrir o diálogo para escolher a imagem
@@ -189,42 +377,75 @@ class EditorWindow(QMainWindow):
                     # Obter a imagem redimensionada
                     imagem_redimensionada = dialogo.imagem
 
-                    # Criar um QTextImageFormat com a imagem redimensionada
+                    # As imagens ficam na pasta do livro, então ele precisa existir em disco
+                    if self.livro is None:
+                        self.salvar_arquivo()
+                        if self.livro is None:
+                            return
+
+                    try:
+                        with instrumentacao.medir("armazenar_imagem", "disco"):
+                            caminho = imagens.armazenar_imagem(self.livro.pasta, imagem_redimensionada, caminho_imagem)
+                    except Exception as e:
+                        QMessageBox.critical(self, "Erro", f"Não foi possível guardar a imagem: {str(e)}")
+                        return
+                    self.cache_imagens.guardar(caminho, imagem_redimensionada)
+
+                    # Criar um QTextImageFormat que referencia o arquivo pelo caminho relativo
+                    documento = self.documentos[self.capitulo_atual]
                     image_format = QTextImageFormat()
+                    image_format.setName(os.path.relpath(caminho, documento.diretorio).replace(os.sep, "/"))
                     image_format.setWidth(imagem_redimensionada.width())
                     image_format.setHeight(imagem_redimensionada.height())
 
                     # Inserir a imagem redimensionada no QTextEdit
                     cursor = self.ui.textEdit.textCursor()
-                    cursor.insertImage(image_format)
+                    with instrumentacao.medir("inserir_imagem", largura=imagem_redimensionada.width(),
+                                              altura=imagem_redimensionada.height()):
+                        cursor.insertImage(image_format)
 
     def formatar_titulo(self):
-        cursor = self.ui.textEdit.textCursor()
-        format = QTextCharFormat()
-        format.setFontFamily("Times New Roman")
-        format.setFontPointSize(24)
-        format.setFontWeight(QFont.Bold)
-        cursor.mergeCharFormat(format)
+        self.aplicar_estilo(estilos.TITULO)
 
     def formatar_subtitulo(self):
-        cursor = self.ui.textEdit.textCursor()
-        format = QTextCharFormat()
-        format.setFontFamily("Times New Roman")
-        format.setFontPointSize(18)
-        format.setFontWeight(QFont.Bold)
-        cursor.mergeCharFormat(format)
+        self.aplicar_estilo(estilos.SUBTITULO)
 
     def formatar_texto(self):
+        self.aplicar_estilo(estilos.CORPO)
+
+    def aplicar_estilo(self, identificador):
+        """Põe os parágrafos da seleção no estilo da folha do livro (o nível de título vem junto)"""
         cursor = self.ui.textEdit.textCursor()
-        format = QTextCharFormat()
-        format.setFontFamily("Times New Roman")
-        format.setFontPointSize(12)
-        format.setFontWeight(QFont.Normal)
-        format.setFontItalic(False)
-        cursor.mergeCharFormat(format)
+        estilos.aplicar_estilo(cursor, identificador, self.estilos)
+        self.editor.setTextCursor(cursor)
+
+    def escolher_estilo(self, indice):
+        self.aplicar_estilo(self.combo_estilo.itemData(indice))
+        self.editor.setFocus()
+
+    def editar_estilos(self):
+        dialogo = estilos.DialogoEstilos(self.estilos, self)
+        if dialogo.exec() != QDialog.Accepted:
+            return
+        folha = dialogo.folha()
+        # Os capítulos carregados mudam agora, cada um num passo de desfazer; os outros, quando forem abertos
+        with instrumentacao.medir("reestilizar", capitulos=len(self.documentos)):
+            for documento in self.documentos.values():
+                estilos.reestilizar(documento, self.estilos, folha)
+                documento.estilos = folha
+        self.estilos = folha
+        self.preencher_estilos()
+        self.temporizador_formatacao.start()
+        if self.livro is None:
+            return
+        self.alterar_manifesto("estilos", folha)
 
     def marcar_como_alterado(self):
+        # O realce ortográfico também emite textChanged, sem alterar o texto
+        if not self.editor.document().isModified():
+            return
         self.arquivo_alterado = True
+        self.autosalvamento.agendar()
 
     def aplicar_fonte(self, fonte):
         fmt = QTextCharFormat()
@@ -257,68 +478,680 @@ class EditorWindow(QMainWindow):
             resp = QMessageBox.question(self, "Salvar alterações?", "Deseja salvar antes de criar um novo documento?")
             if resp == QMessageBox.Yes:
                 self.salvar_arquivo()
-        self.editor.clear()
+        self.iniciar_documento_vazio()
         self.current_file_path = None
         self.arquivo_alterado = False
 
     def abrir_arquivo(self):
-        path, _ = QFileDialog.getOpenFileName(self, "Abrir arquivo", "", "HTML (*.html)")
-        if path:
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Abrir arquivo", "", "Livros (livro.json *.html);;Manuscritos (*.txt *.md *.markdown)"
+        )
+        if not path:
+            return
+        import importar
+        if path.lower().endswith(importar.EXTENSOES):
+            self.importar_manuscrito(path)
+            return
+        if self.livro is not None:
+            # Cada livro na sua janela; este continua aberto
+            janelas.gerenciador().abrir_livro(path)
+        else:
             self.carregar_arquivo(path)
 
+    def importar_manuscrito(self, caminho):
+        """Cria um livro novo com o conteúdo de um .txt ou .md"""
+        destino = QFileDialog.getExistingDirectory(self, "Onde criar o livro importado")
+        if not destino:
+            return
+        nome = os.path.splitext(os.path.basename(caminho))[0]
+        pasta_livro = os.path.join(destino, nome)
+        if os.path.exists(os.path.join(pasta_livro, livro.MANIFESTO)):
+            QMessageBox.warning(self, "Importar", f"Já existe um livro em {pasta_livro}.")
+            return
+
+        janela = self
+        if self.livro is not None or self.arquivo_alterado:
+            # Cada livro na sua janela; o que está aberto aqui continua
+            janela = janelas.gerenciador().abrir_livro()
+        janela.iniciar_importacao(caminho, pasta_livro, nome)
+
+    def iniciar_importacao(self, caminho, pasta_livro, nome):
+        import importar
+        documento = imagens.DocumentoLivro(None, self.cache_imagens, self)
+        documento.setUndoRedoEnabled(False)
+        try:
+            importador = importar.Importador(caminho, documento, self)
+        except Exception as e:
+            documento.deleteLater()
+            QMessageBox.critical(self, "Erro ao Importar", f"Não foi possível ler o arquivo: {str(e)}")
+            return
+
+        progresso = QProgressDialog(f"Importando {os.path.basename(caminho)}...", "Cancelar",
+                                    0, importar.ESCALA_PROGRESSO, self)
+        progresso.setWindowTitle("Importar")
+        progresso.setWindowModality(Qt.WindowModal)
+        progresso.setMinimumDuration(300)
+        progresso.setValue(0)
+
+        self.importacao = (importador, documento, progresso, pasta_livro, nome)
+        importador.progresso.connect(progresso.setValue)
+        importador.concluido.connect(self.concluir_importacao)
+        importador.falhou.connect(self.falha_ao_importar)
+        progresso.canceled.connect(self.cancelar_importacao)
+        importador.iniciar()
+
+    def encerrar_importacao(self):
+        importador, documento, progresso, _, _ = self.importacao
+        self.importacao = None
+        progresso.canceled.disconnect(self.cancelar_importacao)
+        progresso.close()
+        progresso.deleteLater()
+        importador.deleteLater()
+        return documento
+
+    def cancelar_importacao(self):
+        self.importacao[0].cancelar()
+        self.encerrar_importacao().deleteLater()
+
+    def falha_ao_importar(self, mensagem):
+        self.encerrar_importacao().deleteLater()
+        QMessageBox.critical(self, "Erro ao Importar", f"Não foi possível importar o arquivo: {mensagem}")
+
+    def concluir_importacao(self):
+        _, _, _, pasta_livro, nome = self.importacao
+        documento = self.encerrar_importacao()
+        import biblioteca
+        try:
+            novo = livro.Livro.criar(pasta_livro, nome)
+            with biblioteca.Biblioteca() as livros:
+                livros.registrar(nome, pasta_livro, novo.caminho_manifesto, "", datetime.now().isoformat())
+                livros.adicionar_raiz(os.path.dirname(pasta_livro))
+        except Exception as e:
+            documento.deleteLater()
+            QMessageBox.critical(self, "Erro ao Importar", f"Não foi possível criar o livro: {str(e)}")
+            return
+
+        # O documento montado vira o primeiro capítulo, sem passar de novo pelo HTML
+        documento.setUndoRedoEnabled(True)
+        documento.diretorio = novo.diretorio_capitulo(0)
+        self.liberar_capitulos()
+        self.livro = novo
+        self.vigia.vigiar(novo)
+        self.definir_estilos_do_livro()
+        documento.estilos = self.estilos
+        self.current_file_path = novo.caminho_manifesto
+        self.capitulo_atual = 0
+        self.documentos[0] = documento
+        self.verificador.palavras_livro = frozenset()
+        self.atualizar_lista_capitulos()
+        self.abrir_capitulo(0)
+        self.setWindowTitle(f"Editor A5 - {novo.nome}")
+
+        documento.setModified(True)
+        self.salvar_arquivo()
+
+    @instrumentacao.medido("carregar_livro")
     def carregar_arquivo(self, path):
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    conteudo = f.read()
-                self.editor.setHtml(conteudo)
+                novo_livro = livro.Livro.abrir(path)
+
+                self.liberar_capitulos()
+                self.livro = novo_livro
+                self.vigia.vigiar(novo_livro)
+                self.definir_estilos_do_livro()
                 self.current_file_path = path
+                self.verificador.palavras_livro = frozenset(ortografia.ler_palavras_livro(self.livro.pasta))
+                self.configurar_vista_paginas()
+                self.atualizar_lista_capitulos()
+                self.abrir_capitulo(0)
                 self.arquivo_alterado = False
+                self.setWindowTitle(f"Editor A5 - {self.livro.nome}")
 
-                self.atualizar_json_central(path)
+                self.atualizar_biblioteca(path)
+                self.verificar_recuperacao()
             except Exception as e:
                 QMessageBox.critical(self, "Erro ao Abrir", f"Não foi possível abrir o arquivo: {str(e)}")
 
+    def iniciar_documento_vazio(self):
+        """Troca o conteúdo do editor por um documento novo, ainda sem livro associado"""
+        self.liberar_capitulos()
+        self.livro = None
+        self.vigia.parar()
+        self.capitulo_atual = 0
+        self.definir_estilos_do_livro()
+
+        documento = imagens.DocumentoLivro(None, self.cache_imagens, self)
+        documento.estilos = self.estilos
+        self.documentos[0] = documento
+        self.editor.setDocument(documento)
+        self.navegador.definir_documento(documento)
+        self.acompanhar_estatisticas(documento)
+        self.realce_ortografico.acompanhar(documento)
+        self.controle_desfazer.acompanhar(documento)
+        if self.barra_localizar is not None:
+            self.barra_localizar.acompanhar(documento)
+        self.verificador.palavras_livro = frozenset()
+        self.configurar_vista_paginas()
+        self.acompanhar_paginas(documento)
+        self.definir_formatacao_padrao()
+        self.atualizar_lista_capitulos()
+
+    def abrir_capitulo(self, indice):
+        """Mostra um capítulo no editor, lendo-o do disco só quando ainda não está em memória"""
+        if self.livro is None or not 0 <= indice < len(self.livro.capitulos):
+            return
+
+        documento = self.documento_do_capitulo(indice)
+        self.documentos.move_to_end(indice)
+
+        # Trocar de documento não é uma alteração do livro
+        alterado = self.arquivo_alterado
+        self.capitulo_atual = indice
+        with instrumentacao.medir("setDocument", "layout", capitulo=indice):
+            self.editor.setDocument(documento)
+        self.navegador.definir_documento(documento)
+        self.acompanhar_estatisticas(documento)
+        self.realce_ortografico.acompanhar(documento)
+        self.controle_desfazer.acompanhar(documento)
+        if self.barra_localizar is not None:
+            self.barra_localizar.acompanhar(documento)
+        self.acompanhar_paginas(documento)
+        self.arquivo_alterado = alterado
+
+        self.lista_capitulos.blockSignals(True)
+        self.lista_capitulos.setCurrentRow(indice)
+        self.lista_capitulos.blockSignals(False)
+
+        self.descarregar_capitulos()
+
+    def documento_do_capitulo(self, indice):
+        documento = self.documentos.get(indice)
+        if documento is None:
+            # Uma gravação deste capítulo ainda pode estar na fila
+            self.autosalvamento.aguardar()
+            documento = imagens.DocumentoLivro(self.livro.diretorio_capitulo(indice), self.cache_imagens, self)
+            html = self.livro.ler_capitulo(indice)
+            with instrumentacao.medir("carregar_html", capitulo=indice, tamanho=len(html)):
+                serializacao.carregar_html(documento, html)
+                self.acertar_estilos(documento)
+            self.documentos[indice] = documento
+            self.vigia.conhecer(self.livro.caminho_capitulo(indice), html)
+        return documento
+
+    def acertar_estilos(self, documento):
+        """Leva à folha do livro um capítulo gravado com outra (a folha mudou com ele fechado)"""
+        gravada = documento.estilos
+        if self.livro is not None and self.livro.legado and "estilos" not in self.livro.dados and gravada:
+            # Sem manifesto, a folha de um livro de um HTML só fica guardada no próprio capítulo
+            self.livro.dados["estilos"] = gravada
+            self.definir_estilos_do_livro()
+        documento.estilos = self.estilos
+        # Não é uma alteração do texto: o capítulo gravado e a folha dele continuam combinando
+        alterado = documento.isModified()
+        estilos.reestilizar(documento, estilos.completar(gravada), self.estilos, desfazer=False)
+        documento.setModified(alterado)
+
+    def indice_do_caminho(self, caminho):
+        """Capítulo carregado gravado em `caminho`, ou None"""
+        for indice in self.documentos:
+            if self.livro is not None and self.livro.caminho_capitulo(indice) == caminho:
+                return indice
+        return None
+
+    def alteracao_externa(self, caminho, html):
+        """Um capítulo carregado mudou no disco: recarregar, mesclar ou manter o daqui"""
+        indice = self.indice_do_caminho(caminho)
+        if indice is None:
+            return
+        documento = self.documentos[indice]
+        dialogo = vigilancia.DialogoAlteracaoExterna(self.livro.capitulos[indice]["titulo"], documento,
+                                                     html, self.vigia.base(caminho), self)
+        if dialogo.regioes != []:
+            dialogo.exec()
+        # Com regioes vazias o arquivo foi regravado, mas o conteúdo é o mesmo
+        dialogo.deleteLater()
+
+        alterado = self.arquivo_alterado
+        if dialogo.resultado == "recarregar":
+            documento.setModified(False)
+            alterado = alterado and any(outro.isModified() for outro in self.documentos.values())
+        elif dialogo.resultado in ("aplicar", "manter"):
+            # O disco ficou diferente do editor: a próxima gravação o sobrescreve
+            documento.setModified(True)
+            alterado = True
+        self.arquivo_alterado = alterado
+        # Dali em diante, esta é a versão do disco que a mesclagem toma como base
+        self.vigia.conhecer(caminho, html)
+
+    def imagem_externa(self, caminho):
+        """Uma imagem do livro foi trocada no disco; as vistas a pedem de novo ao cache"""
+        self.cache_imagens.descartar(caminho)
+        for documento in self.documentos.values():
+            documento.markContentsDirty(0, documento.characterCount())
+        self.editor.viewport().update()
+
+    def manifesto_externo(self):
+        resposta = QMessageBox.question(
+            self, "Livro Alterado",
+            "O nome ou os capítulos do livro foram alterados por outro programa. Deseja recarregar o livro?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
+        )
+        if resposta == QMessageBox.Yes and self.verificar_alteracoes():
+            self.carregar_arquivo(self.livro.caminho)
+
+    def abrir_localizar(self):
+        if self.barra_localizar is None:
+            import localizar
+            self.barra_localizar = localizar.BarraLocalizar(self.editor, self.ui)
+            self.ui.centralWidget().layout().addWidget(self.barra_localizar)
+            self.barra_localizar.acompanhar(self.editor.document())
+        self.barra_localizar.abrir()
+
+    def ir_para_trecho(self, indice, consulta, trecho=""):
+        """Abre o capítulo e seleciona a ocorrência da busca que está no trecho do resultado"""
+        import busca
+        self.abrir_capitulo(indice)
+        encontrado = busca.localizar_trecho(self.editor.document().toPlainText(), consulta, trecho)
+        if encontrado is None:
+            return
+
+        cursor = self.editor.textCursor()
+        cursor.setPosition(encontrado[0])
+        cursor.setPosition(encontrado[1], QTextCursor.KeepAnchor)
+        self.editor.setTextCursor(cursor)
+        self.editor.ensureCursorVisible()
+
+    def acompanhar_estatisticas(self, documento):
+        if self.estatisticas is not None:
+            self.estatisticas.alteradas.disconnect(self.temporizador_estatisticas.start)
+        self.estatisticas = estatisticas.EstatisticasDocumento.do_documento(documento)
+        self.estatisticas.alteradas.connect(self.temporizador_estatisticas.start)
+        self.atualizar_estatisticas()
+
+    def atualizar_estatisticas(self):
+        palavras = self.estatisticas.palavras
+        self.rotulo_estatisticas.setText(
+            f"{estatisticas.formatar_numero(palavras)} palavras · "
+            f"{estatisticas.formatar_numero(self.estatisticas.caracteres)} caracteres · "
+            f"{estatisticas.minutos_leitura(palavras)} min de leitura · "
+            f"~{estatisticas.paginas_a5(palavras)} páginas A5"
+        )
+
+    def atualizar_desfazer(self):
+        self.botao_desfazer.setText(self.controle_desfazer.resumo())
+
+    def configurar_desfazer(self):
+        dialogo = desfazer.DialogoDesfazer(self)
+        if dialogo.exec() != QDialog.Accepted:
+            return
+        try:
+            desfazer.salvar_configuracao(dialogo.configuracao())
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Não foi possível salvar os limites do desfazer: {str(e)}")
+        self.controle_desfazer.historico_alterado()
+
+    def mostrar_estatisticas(self):
+        if self.livro is None:
+            QMessageBox.information(self, "Estatísticas", "Salve o livro para ver as estatísticas por capítulo.")
+            return
+        self.autosalvamento.aguardar()
+        estatisticas.DialogoEstatisticas(self.livro, self.documentos, self).exec()
+
+    def titulos_paginas(self):
+        """Nome do livro e título do capítulo aberto, para o cabeçalho das páginas"""
+        if self.livro is None or not 0 <= self.capitulo_atual < len(self.livro.capitulos):
+            return "", ""
+        return self.livro.nome, self.livro.capitulos[self.capitulo_atual]["titulo"]
+
+    def acompanhar_paginas(self, documento):
+        if self.modo_paginas:
+            self.vista_paginas.definir_documento(documento, *self.titulos_paginas())
+
+    def vista_de_paginas(self):
+        """A vista de páginas A5, criada na primeira vez que é pedida"""
+        if self.vista_paginas is None:
+            import paginacao
+            self.vista_paginas = paginacao.VisualizacaoPaginas(self.editor, self)
+            self.editor.parentWidget().layout().addWidget(self.vista_paginas)
+            self.vista_paginas.hide()
+            self.vista_paginas.configurar(paginacao.configuracao_do_livro(self.livro))
+        return self.vista_paginas
+
+    def configurar_vista_paginas(self):
+        """Leva a configuração de página do livro aberto à vista de páginas, se ela já existe"""
+        if self.vista_paginas is not None:
+            import paginacao
+            self.vista_paginas.configurar(paginacao.configuracao_do_livro(self.livro))
+
+    def alternar_paginas(self, ligado):
+        self.modo_paginas = ligado
+        if ligado:
+            self.vista_de_paginas().ativar(*self.titulos_paginas())
+        elif self.vista_paginas is not None:
+            self.vista_paginas.desativar()
+
+    def configurar_pagina(self):
+        import paginacao
+        vista = self.vista_de_paginas()
+        dialogo = paginacao.DialogoPagina(vista.configuracao, self)
+        if dialogo.exec() != QDialog.Accepted:
+            return
+        configuracao = dialogo.configuracao()
+        vista.configurar(configuracao)
+        if self.livro is None or self.livro.legado:
+            return
+        self.alterar_manifesto("pagina", configuracao)
+
+    def alterar_manifesto(self, chave, valor):
+        """Troca um campo dos dados do livro e grava o manifesto na thread de gravação.
+
+        Os dados ganham um dicionário novo em vez de serem alterados: uma
+        gravação do manifesto ainda na fila pode estar lendo o anterior.
+        """
+        self.livro.dados = {**self.livro.dados, chave: valor}
+        self.gravar_manifesto()
+
+    def gravar_manifesto(self):
+        """Toda gravação do manifesto passa pela fila, na ordem das alterações; as falhas chegam a `falha_ao_salvar`"""
+        if not self.livro.legado:
+            self.autosalvamento.enfileirar(self.livro.salvar_manifesto)
+
+    def mostrar_historico(self):
+        if self.livro is None:
+            QMessageBox.information(self, "Versões", "Salve o livro para começar a guardar versões.")
+            return
+        if self.arquivo_alterado:
+            self.salvar_arquivo()
+        self.autosalvamento.aguardar()
+
+        import historico
+        dialogo = historico.DialogoVersoes(self.livro, self.autosalvamento, self)
+        dialogo.exec()
+        if dialogo.restaurada:
+            self.carregar_arquivo(self.livro.caminho)
+
+    def alternar_diagnostico(self, ligado):
+        """Liga a gravação das medidas; ao desligar, oferece exportar o trace"""
+        if ligado:
+            instrumentacao.limpar()
+            instrumentacao.ativar()
+            self.ui.statusBar().showMessage("Gravando medidas de desempenho...", 3000)
+            return
+
+        instrumentacao.desativar()
+        caminho, _ = QFileDialog.getSaveFileName(self, "Exportar diagnóstico", "editora5-trace.json", "Trace (*.json)")
+        if not caminho:
+            return
+        try:
+            total = instrumentacao.exportar(caminho)
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Não foi possível exportar o diagnóstico: {str(e)}")
+            return
+        self.ui.statusBar().showMessage(f"{total} eventos exportados para {caminho}", 5000)
+
+    def menu_contexto(self, posicao):
+        menu = self.editor.createStandardContextMenu(posicao)
+        self.controle_desfazer.ajustar_menu(menu)
+
+        erro = self.realce_ortografico.palavra_em(posicao)
+        if erro:
+            selecao, palavra = erro
+            primeira = menu.actions()[0] if menu.actions() else None
+            acoes = []
+            for sugestao in self.verificador.sugestoes(palavra):
+                acao = QAction(sugestao, menu)
+                acao.triggered.connect(lambda _=False, s=sugestao: selecao.insertText(s))
+                acoes.append(acao)
+            if not acoes:
+                acao = QAction("(sem sugestões)", menu)
+                acao.setEnabled(False)
+                acoes.append(acao)
+
+            adicionar = QAction(f"Adicionar \"{palavra}\" ao dicionário do livro", menu)
+            adicionar.triggered.connect(lambda: self.adicionar_palavra(palavra))
+            ignorar = QAction("Ignorar nesta sessão", menu)
+            ignorar.triggered.connect(lambda: self.ignorar_palavra(palavra))
+
+            menu.insertActions(primeira, acoes + [adicionar, ignorar])
+            menu.insertSeparator(primeira)
+
+        menu.exec(self.editor.viewport().mapToGlobal(posicao))
+        menu.deleteLater()
+
+    def adicionar_palavra(self, palavra):
+        """Aceita a palavra em todo o livro (palavras.txt na pasta dele)"""
+        if self.livro is None:
+            self.ignorar_palavra(palavra)
+            return
+        palavras = set(self.verificador.palavras_livro) | {palavra}
+        try:
+            ortografia.salvar_palavras_livro(self.livro.pasta, palavras)
+        except OSError as e:
+            QMessageBox.warning(self, "Erro", f"Não foi possível salvar a lista de palavras: {str(e)}")
+            return
+        self.verificador.palavras_livro = frozenset(palavras)
+        self.realce_ortografico.invalidar()
+
+    def ignorar_palavra(self, palavra):
+        self.verificador.ignoradas.add(palavra)
+        self.realce_ortografico.invalidar()
+
+    def descarregar_capitulos(self):
+        """Libera os capítulos menos usados que não têm alterações pendentes"""
+        for indice in list(self.documentos):
+            if len(self.documentos) <= LIMITE_CAPITULOS_EM_MEMORIA:
+                break
+            documento = self.documentos[indice]
+            if indice == self.capitulo_atual or documento.isModified():
+                continue
+            del self.documentos[indice]
+            self.revisoes_diario.pop(indice, None)
+            self.vigia.esquecer(self.livro.caminho_capitulo(indice))
+            documento.deleteLater()
+
+    def liberar_capitulos(self):
+        for documento in self.documentos.values():
+            documento.deleteLater()
+        self.documentos.clear()
+        self.revisoes_diario.clear()
+        self.cache_imagens.limpar()
+
+    def atualizar_lista_capitulos(self):
+        self.lista_capitulos.blockSignals(True)
+        self.lista_capitulos.clear()
+        if self.livro:
+            self.lista_capitulos.addItems([capitulo["titulo"] for capitulo in self.livro.capitulos])
+            self.lista_capitulos.setCurrentRow(self.capitulo_atual)
+        self.lista_capitulos.blockSignals(False)
+
+    def novo_capitulo(self):
+        if self.livro is None:
+            self.salvar_arquivo()
+            if self.livro is None:
+                return
+
+        titulo, ok = QInputDialog.getText(self, "Novo Capítulo", "Título do capítulo:")
+        titulo = titulo.strip()
+        if not ok or not titulo:
+            return
+
+        try:
+            indice = self.livro.adicionar_capitulo(titulo)
+            self.gravar_manifesto()
+            self.current_file_path = self.livro.caminho_manifesto
+            self.atualizar_lista_capitulos()
+            self.abrir_capitulo(indice)
+        except Exception as e:
+            QMessageBox.critical(self, "Erro ao Criar Capítulo", f"Não foi possível criar o capítulo: {str(e)}")
+
+    def renomear_capitulo(self, item):
+        indice = self.lista_capitulos.row(item)
+        titulo, ok = QInputDialog.getText(self, "Renomear Capítulo", "Título do capítulo:", text=item.text())
+        titulo = titulo.strip()
+        if ok and titulo:
+            self.livro.renomear_capitulo(indice, titulo)
+            self.gravar_manifesto()
+            item.setText(titulo)
+
+    @instrumentacao.medido("salvar_capitulos")
+    def salvar_capitulos(self, diario=None):
+        """Envia para a thread de gravação apenas os capítulos carregados que foram alterados"""
+        diario = diario or self.caminho_diario()
+        # Uma alteração de fora ainda não conferida seria sobrescrita sem aviso
+        self.vigia.verificar()
+        conteudos = {}
+        instantaneos = {}
+        for indice, documento in self.documentos.items():
+            if documento.isModified():
+                with instrumentacao.medir("serializar_html", capitulo=indice):
+                    html = serializacao.para_html(documento)
+                conteudos[indice] = html
+                self.vigia.conhecer(self.livro.caminho_capitulo(indice), html)
+                instantaneos[self.chave_capitulo(indice)] = html
+                documento.setModified(False)
+
+        self.autosalvamento.temporizador.stop()
+        indexar = None
+        if conteudos:
+            import busca
+            # Só o que chegou ao disco vai para o índice, com a data do arquivo já gravado
+            indexar = functools.partial(busca.indexar_livro_salvo, self.livro)
+        self.autosalvamento.enfileirar(autosave.gravar_livro, self.livro, conteudos, diario, instantaneos, indexar)
+        if conteudos:
+            import historico
+            palavras = {indice: estatisticas.EstatisticasDocumento.do_documento(documento).palavras
+                        for indice, documento in self.documentos.items()}
+            self.autosalvamento.enfileirar(estatisticas.registrar_progresso, self.livro, palavras)
+            self.autosalvamento.enfileirar(historico.registrar_versao, self.livro)
+        self.descarregar_capitulos()
+
+    def falha_ao_salvar(self, mensagem, caminho_livro, capitulos):
+        self.arquivo_alterado = True
+        if self.livro is not None and self.livro.caminho == caminho_livro:
+            self.remarcar_capitulos(capitulos)
+        aviso = f"Não foi possível salvar o arquivo: {mensagem}"
+        if capitulos:
+            aviso += "\nAs alterações foram mantidas no diário de recuperação."
+        QMessageBox.critical(self, "Erro ao Salvar", aviso)
+
+    def remarcar_capitulos(self, capitulos):
+        """Capítulos que não chegaram ao disco voltam a contar como alterados, para a próxima gravação"""
+        registros = None
+        for indice in capitulos:
+            documento = self.documentos.get(indice)
+            if documento is None:
+                # Já foi descarregado: o texto não gravado está no diário
+                if registros is None:
+                    registros = autosave.ler_diario(self.caminho_diario())
+                registro = registros.get(self.chave_capitulo(indice))
+                if registro is None:
+                    continue
+                documento = self.documento_do_capitulo(indice)
+                serializacao.carregar_html(documento, registro["html"])
+                self.acertar_estilos(documento)
+            documento.setModified(True)
+
+    def caminho_diario(self):
+        if self.livro is None:
+            central_dir = os.path.join(os.path.expanduser("~"), "EditorA5")
+            return autosave.caminho_diario(central_dir, "sem_titulo")
+        return autosave.caminho_diario(self.livro.pasta, self.livro.nome)
+
+    def chave_capitulo(self, indice):
+        if self.livro is None:
+            return "documento.html"
+        return self.livro.capitulos[indice]["arquivo"]
+
+    def coletar_instantaneos(self):
+        """Chamado pelo salvamento automático depois de um período sem digitação"""
+        instantaneos = {}
+        for indice, documento in self.documentos.items():
+            if documento.isModified() and self.revisoes_diario.get(indice) != documento.revision():
+                with instrumentacao.medir("serializar_html", capitulo=indice, instantaneo=True):
+                    instantaneos[self.chave_capitulo(indice)] = serializacao.para_html(documento)
+                self.revisoes_diario[indice] = documento.revision()
+        return self.caminho_diario(), instantaneos
+
+    def verificar_recuperacao(self):
+        """Oferece restaurar o que ficou no diário de recuperação depois de uma queda"""
+        diario = self.caminho_diario()
+        try:
+            registros = autosave.ler_diario(diario)
+        except Exception as e:
+            print(f"Erro ao ler diário de recuperação: {e}")
+            return
+
+        pendentes = {}
+        for indice in range(len(self.livro.capitulos) if self.livro else 1):
+            registro = registros.get(self.chave_capitulo(indice))
+            if registro is None:
+                continue
+            if self.livro is not None:
+                caminho = self.livro.caminho_capitulo(indice)
+                if os.path.exists(caminho) and os.path.getmtime(caminho) >= registro["hora"]:
+                    continue
+            pendentes[indice] = registro["html"]
+
+        if not pendentes:
+            return
+
+        resposta = QMessageBox.question(
+            self, "Recuperar Alterações",
+            "Foram encontradas alterações não salvas deste livro. Deseja recuperá-las?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
+        )
+        if resposta != QMessageBox.Yes:
+            self.autosalvamento.enfileirar(autosave.descartar_diario, diario)
+            return
+
+        for indice, html in pendentes.items():
+            documento = self.documentos[indice] if self.livro is None else self.documento_do_capitulo(indice)
+            serializacao.carregar_html(documento, html)
+            self.acertar_estilos(documento)
+            documento.setModified(True)
+        self.arquivo_alterado = True
+
+    def adotar_arquivo_html(self, file_path):
+        """Associa o documento sem livro (ou um livro legado) a um arquivo HTML único"""
+        self.livro = livro.Livro.de_html(file_path)
+        self.livro.dados["estilos"] = self.estilos
+        self.vigia.vigiar(self.livro)
+        documento = self.documentos[self.capitulo_atual]
+        documento.diretorio = self.livro.diretorio_capitulo(0)
+        documento.setModified(True)
+        self.atualizar_lista_capitulos()
+
     def salvar_arquivo(self):
         if not self.current_file_path:
             self.current_file_path, _ = QFileDialog.getSaveFileName(self, "Salvar como", "", "HTML (*.html)")
         if self.current_file_path:
-            with open(self.current_file_path, 'w', encoding='utf-8') as f:
-                f.write(self.editor.toHtml())
+            diario = self.caminho_diario()
+            if self.livro is None:
+                self.adotar_arquivo_html(self.current_file_path)
+            self.salvar_capitulos(diario)
             self.arquivo_alterado = False
 
     def salvar_em_arquivo(self, file_path):
         try:
-            html_content = self.editor.toHtml()
-            with open(file_path, "w", encoding="utf-8") as file:
-                file.write(html_content)
-            self.current_file_path = file_path
+            diario = self.caminho_diario()
+            if self.livro is None or self.livro.legado:
+                self.adotar_arquivo_html(file_path)
+            self.salvar_capitulos(diario)
+            self.current_file_path = self.livro.caminho_manifesto or file_path
             self.arquivo_alterado = False
-            self.setWindowTitle(f"Editor A5 - {os.path.basename(file_path)}")
+            self.setWindowTitle(f"Editor A5 - {self.livro.nome}")
 
-            self.atualizar_json_central(file_path)
+            self.atualizar_biblioteca(file_path)
         except Exception as e:
             QMessageBox.critical(self, "Erro ao Salvar", f"Não foi possível salvar o arquivo: {str(e)}")
 
-    def atualizar_json_central(self, file_path):
+    def atualizar_biblioteca(self, file_path):
+        import biblioteca
         try:
-            home_dir = os.path.expanduser("~")
-            central_dir = os.path.join(home_dir, "EditorA5")
-            json_path = os.path.join(central_dir, "livros_recentes.json")
-
-            if os.path.exists(json_path):
-                with open(json_path, "r", encoding="utf-8") as f:
-                    livros = json.load(f)
-
-                for livro in livros:
-                    if livro.get("html") == file_path:
-                        livros.remove(livro)
-                        livros.insert(0, livro)
-                        break
-
-                with open(json_path, "w", encoding="utf-8") as f:
-                    json.dump(livros, f, ensure_ascii=False, indent=4)
+            with biblioteca.Biblioteca() as livros:
+                livros.tocar(file_path)
         except Exception as e:
-            print(f"Erro ao atualizar JSON central: {e}")
+            print(f"Erro ao atualizar biblioteca: {e}")
 
     def verificar_alteracoes(self):
         if self.arquivo_alterado:
@@ -334,6 +1167,7 @@ class EditorWindow(QMainWindow):
                 return True
             elif resposta == QMessageBox.Cancel:
                 return False
+            self.autosalvamento.enfileirar(autosave.descartar_diario, self.caminho_diario())
         return True
 
     def aplicar_negrito(self, checked):
@@ -396,7 +1230,23 @@ class EditorWindow(QMainWindow):
         self.editor.setCurrentCharFormat(fmt)
 
     def atualizar_estado_formatacao(self):
+        """Reflete na barra a formatação sob o cursor, sem devolver nada ao documento"""
         fmt = self.editor.currentCharFormat()
+        alinhamento = self.editor.alignment()
+        estilo = estilos.estilo_do_bloco(self.editor.textCursor().blockFormat())
+
+        estado = (fmt.fontWeight(), fmt.fontItalic(), fmt.fontUnderline(),
+                  fmt.font().family(), fmt.fontPointSize(), alinhamento, estilo)
+        if estado == self.estado_formatacao:
+            return
+        self.estado_formatacao = estado
+
+        # Com os sinais bloqueados, os combos não chamam aplicar_fonte/aplicar_tamanho
+        bloqueios = [QSignalBlocker(widget) for widget in (
+            self.combo_estilo, self.combo_fonte, self.combo_tamanho, self.ui.actionNegrito, self.ui.actionItalico,
+            self.ui.actionSublinhado, self.ui.actionAlinharEsquerda, self.ui.actionCentralizar,
+            self.ui.actionAlinharDireita, self.ui.actionJustificar
+        )]
 
         self.ui.actionNegrito.setChecked(fmt.fontWeight() == QFont.Bold)
 
@@ -404,33 +1254,53 @@ class EditorWindow(QMainWindow):
 
         self.ui.actionSublinhado.setChecked(fmt.fontUnderline())
 
-        self.combo_fonte.setCurrentFont(fmt.font())
+        self.ui.actionAlinharEsquerda.setChecked(bool(alinhamento & Qt.AlignLeft))
+        self.ui.actionCentralizar.setChecked(bool(alinhamento & Qt.AlignHCenter))
+        self.ui.actionAlinharDireita.setChecked(bool(alinhamento & Qt.AlignRight))
+        self.ui.actionJustificar.setChecked(bool(alinhamento & Qt.AlignJustify))
+
+        if self.combo_fonte.currentFont().family() != fmt.font().family():
+            self.combo_fonte.setCurrentFont(fmt.font())
 
         if fmt.fontPointSize() > 0:
             self.combo_tamanho.setCurrentText(str(int(fmt.fontPointSize())))
 
+        self.combo_estilo.setCurrentIndex(self.combo_estilo.findData(estilo))
+
+        del bloqueios
+
+    def liberar_livro(self):
+        """Devolve a memória do livro aberto; a janela fica vazia, pronta para outro livro"""
+        self.autosalvamento.temporizador.stop()
+        self.autosalvamento.aguardar()
+        if self.barra_localizar is not None:
+            self.barra_localizar.fechar()
+        self.iniciar_documento_vazio()
+        self.current_file_path = None
+        self.arquivo_alterado = False
+        self.estado_formatacao = None
+        self.setWindowTitle("Editor A5")
+
     def voltar_ao_inicio(self):
-        if self.verificar_alteracoes():
-            self.hide()
-            import welcome
-            self.welcome_window = welcome.WelcomeWindow()
-            self.close()
+        if self.close():
+            janelas.gerenciador().mostrar_inicio()
 
     def closeEvent(self, event):
         if self.verificar_alteracoes():
             event.accept()
+            janelas.gerenciador().editor_fechado(self)
         else:
             event.ignore()
 
 def abrir_editor(html_path=None):
-    return EditorWindow(html_path)
+    return janelas.gerenciador().abrir_livro(html_path)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
 
     if len(sys.argv) > 1 and os.path.exists(sys.argv[1]):
-        editor = EditorWindow(sys.argv[1])
+        editor = abrir_editor(sys.argv[1])
     else:
-        editor = EditorWindow()
+        editor = abrir_editor()
 
     sys.exit(app.exec())
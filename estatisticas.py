@@ -0,0 +1,216 @@
+import os
+import re
+import math
+import threading
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QLabel, QTableWidget, QTableWidgetItem, QDialogButtonBox, QHeaderView
+import biblioteca
+
+PALAVRAS_POR_MINUTO = 230
+
+# Média de um miolo A5 com fonte 12 e margens de 15 mm
+PALAVRAS_POR_PAGINA_A5 = 250
+
+PADRAO_PALAVRA = re.compile(r"\w+(?:['’-]\w+)*")
+
+# Caractere que o QTextDocument usa no lugar de cada imagem
+OBJETO = "￼"
+
+
+def contar_texto(texto):
+    """(palavras, caracteres) de um trecho de texto puro"""
+    return len(PADRAO_PALAVRA.findall(texto)), len(texto) - texto.count(OBJETO)
+
+
+def paginas_a5(palavras):
+    return math.ceil(palavras / PALAVRAS_POR_PAGINA_A5) if palavras else 0
+
+
+def minutos_leitura(palavras):
+    return math.ceil(palavras / PALAVRAS_POR_MINUTO) if palavras else 0
+
+
+def formatar_numero(numero):
+    return f"{numero:,}".replace(",", ".")
+
+
+class EstatisticasDocumento(QObject):
+    """Palavras e caracteres de um QTextDocument, guardados por bloco.
+
+    A cada `contentsChange`, só os blocos tocados são recontados: os blocos
+    antes do trecho alterado não mudam de número, e os depois dele só se
+    deslocam, então a lista por bloco é atualizada com uma troca de fatia.
+    """
+
+    alteradas = Signal()
+
+    def __init__(self, documento):
+        super().__init__(documento)
+        self.documento = documento
+        self.palavras_blocos = []
+        self.caracteres_blocos = []
+        self.palavras = 0
+        self.caracteres = 0
+
+        documento.contentsChange.connect(self.conteudo_alterado)
+        self.recontar()
+
+    @classmethod
+    def do_documento(cls, documento):
+        estatisticas = getattr(documento, "estatisticas", None)
+        if estatisticas is None:
+            estatisticas = cls(documento)
+            documento.estatisticas = estatisticas
+        return estatisticas
+
+    def recontar(self):
+        self.palavras_blocos = []
+        self.caracteres_blocos = []
+        bloco = self.documento.firstBlock()
+        while bloco.isValid():
+            palavras, caracteres = contar_texto(bloco.text())
+            self.palavras_blocos.append(palavras)
+            self.caracteres_blocos.append(caracteres)
+            bloco = bloco.next()
+        self.palavras = sum(self.palavras_blocos)
+        self.caracteres = sum(self.caracteres_blocos)
+
+    def conteudo_alterado(self, inicio, removidos, adicionados):
+        documento = self.documento
+        primeiro = documento.findBlock(inicio)
+        ultimo = documento.findBlock(inicio + adicionados)
+        if not primeiro.isValid():
+            primeiro = documento.firstBlock()
+        if not ultimo.isValid():
+            ultimo = documento.lastBlock()
+
+        de = primeiro.blockNumber()
+        ate = ultimo.blockNumber() + 1
+        # Blocos que sumiram (ou surgiram) saem da conta antiga
+        ate_antigo = ate - (documento.blockCount() - len(self.palavras_blocos))
+        if not 0 <= de <= ate_antigo <= len(self.palavras_blocos):
+            self.recontar()
+            self.alteradas.emit()
+            return
+
+        palavras_novas = []
+        caracteres_novos = []
+        bloco = primeiro
+        while bloco.isValid():
+            palavras, caracteres = contar_texto(bloco.text())
+            palavras_novas.append(palavras)
+            caracteres_novos.append(caracteres)
+            if bloco == ultimo:
+                break
+            bloco = bloco.next()
+
+        self.palavras += sum(palavras_novas) - sum(self.palavras_blocos[de:ate_antigo])
+        self.caracteres += sum(caracteres_novos) - sum(self.caracteres_blocos[de:ate_antigo])
+        self.palavras_blocos[de:ate_antigo] = palavras_novas
+        self.caracteres_blocos[de:ate_antigo] = caracteres_novos
+        self.alteradas.emit()
+
+
+# Contagens dos capítulos que não estão abertos, por (arquivo, mtime_ns)
+_contagens_em_disco = {}
+_trava_contagens = threading.Lock()
+
+
+def contar_capitulo_em_disco(livro_aberto, indice):
+    caminho = livro_aberto.caminho_capitulo(indice)
+    try:
+        chave = (caminho, os.stat(caminho).st_mtime_ns)
+    except OSError:
+        return 0, 0
+
+    with _trava_contagens:
+        contagem = _contagens_em_disco.get(chave)
+    if contagem is None:
+        from busca import ExtratorTexto
+        contagem = contar_texto(ExtratorTexto().extrair(livro_aberto.ler_capitulo(indice)))
+        with _trava_contagens:
+            _contagens_em_disco[chave] = contagem
+    return contagem
+
+
+def contagens_do_livro(livro_aberto, documentos):
+    """(título, palavras, caracteres) por capítulo; os abertos vêm da memória, os outros do disco"""
+    resultado = []
+    for indice, capitulo in enumerate(livro_aberto.capitulos):
+        documento = documentos.get(indice)
+        if documento is not None:
+            estatisticas = EstatisticasDocumento.do_documento(documento)
+            palavras, caracteres = estatisticas.palavras, estatisticas.caracteres
+        else:
+            palavras, caracteres = contar_capitulo_em_disco(livro_aberto, indice)
+        resultado.append((capitulo["titulo"], palavras, caracteres))
+    return resultado
+
+
+def registrar_progresso(livro_aberto, palavras_abertos):
+    """Anota o total de palavras do livro no histórico diário (roda na thread de gravação).
+
+    `palavras_abertos` (índice -> palavras) traz os capítulos em memória;
+    os demais são contados do disco, com cache pela data do arquivo.
+    """
+    try:
+        total = sum(
+            palavras_abertos[indice] if indice in palavras_abertos else contar_capitulo_em_disco(livro_aberto, indice)[0]
+            for indice in range(len(livro_aberto.capitulos))
+        )
+        with biblioteca.Biblioteca() as livros:
+            livros.registrar_progresso(livro_aberto.caminho, total)
+    except Exception as e:
+        print(f"Erro ao registrar progresso: {e}")
+
+
+class DialogoEstatisticas(QDialog):
+    """Totais do livro, contagem por capítulo e palavras escritas nos últimos dias"""
+
+    def __init__(self, livro_aberto, documentos, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Estatísticas")
+        self.resize(520, 560)
+
+        contagens = contagens_do_livro(livro_aberto, documentos)
+        palavras = sum(c[1] for c in contagens)
+        caracteres = sum(c[2] for c in contagens)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(
+            f"<b>{livro_aberto.nome}</b><br>"
+            f"{formatar_numero(palavras)} palavras · {formatar_numero(caracteres)} caracteres<br>"
+            f"cerca de {paginas_a5(palavras)} páginas A5 · {minutos_leitura(palavras)} min de leitura"
+        ))
+
+        tabela = QTableWidget(len(contagens), 4)
+        tabela.setHorizontalHeaderLabels(["Capítulo", "Palavras", "Caracteres", "Páginas"])
+        for linha, (titulo, palavras_capitulo, caracteres_capitulo) in enumerate(contagens):
+            tabela.setItem(linha, 0, QTableWidgetItem(titulo))
+            tabela.setItem(linha, 1, QTableWidgetItem(formatar_numero(palavras_capitulo)))
+            tabela.setItem(linha, 2, QTableWidgetItem(formatar_numero(caracteres_capitulo)))
+            tabela.setItem(linha, 3, QTableWidgetItem(str(paginas_a5(palavras_capitulo))))
+        tabela.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        tabela.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(tabela)
+
+        layout.addWidget(QLabel("Palavras escritas por dia"))
+        try:
+            with biblioteca.Biblioteca() as livros:
+                historico = livros.historico_progresso(livro_aberto.caminho, dias=14)
+        except Exception as e:
+            print(f"Erro ao ler progresso: {e}")
+            historico = []
+
+        tabela_dias = QTableWidget(len(historico), 2)
+        tabela_dias.setHorizontalHeaderLabels(["Dia", "Escritas"])
+        for linha, dia in enumerate(historico):
+            tabela_dias.setItem(linha, 0, QTableWidgetItem(dia["dia"]))
+            tabela_dias.setItem(linha, 1, QTableWidgetItem(f"{dia['escritas']:+}"))
+        tabela_dias.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        tabela_dias.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(tabela_dias)
+
+        botoes = QDialogButtonBox(QDialogButtonBox.Close)
+        botoes.rejected.connect(self.reject)
+        layout.addWidget(botoes)
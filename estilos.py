@@ -0,0 +1,420 @@
+import copy
+import unicodedata
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QFont, QTextBlockFormat, QTextCharFormat, QTextCursor, QTextFormat
+from PySide6.QtWidgets import (
+    QDialog, QHBoxLayout, QVBoxLayout, QFormLayout, QListWidget, QListWidgetItem, QPushButton, QFontComboBox,
+    QDoubleSpinBox, QSpinBox, QCheckBox, QComboBox, QDialogButtonBox, QInputDialog, QLineEdit
+)
+
+# Nome do estilo a que o parágrafo pertence, guardado no formato do próprio parágrafo
+PROPRIEDADE_ESTILO = QTextFormat.UserProperty + 1
+
+FONTE_PADRAO = "Times New Roman"
+
+TITULO = "titulo"
+SUBTITULO = "subtitulo"
+CORPO = "corpo"
+CITACAO = "citacao"
+
+# A folha de estilos de um livro que nunca teve a sua: a aparência que o editor sempre usou
+ESTILOS_PADRAO = {
+    TITULO: {"nome": "Título", "nivel": 1, "fonte": FONTE_PADRAO, "tamanho": 24, "negrito": True},
+    SUBTITULO: {"nome": "Subtítulo", "nivel": 2, "fonte": FONTE_PADRAO, "tamanho": 18, "negrito": True},
+    CORPO: {"nome": "Corpo", "nivel": 0, "fonte": FONTE_PADRAO, "tamanho": 12, "negrito": False, "italico": False},
+    CITACAO: {"nome": "Citação", "nivel": 0, "fonte": FONTE_PADRAO, "tamanho": 12, "negrito": False,
+              "italico": False, "recuo": 1},
+}
+
+ALINHAMENTOS = {
+    "left": Qt.AlignLeft,
+    "center": Qt.AlignHCenter,
+    "right": Qt.AlignRight,
+    "justify": Qt.AlignJustify,
+}
+NOMES_ALINHAMENTO = {"left": "Esquerda", "center": "Centro", "right": "Direita", "justify": "Justificado"}
+
+
+def ler_fonte(formato):
+    familias = formato.fontFamilies()
+    return familias[0] if familias else formato.fontFamily() or None
+
+
+def ler_alinhamento(formato):
+    horizontal = formato.alignment() & Qt.AlignHorizontal_Mask
+    for nome, valor in ALINHAMENTOS.items():
+        if horizontal == valor:
+            return nome
+    return "left"
+
+
+# Campo do estilo -> (se é de caractere, propriedades do Qt, leitura, escrita)
+CAMPOS = {
+    "fonte": (True, (QTextFormat.FontFamilies, QTextFormat.FontFamily), ler_fonte,
+              lambda formato, valor: formato.setFontFamilies([valor])),
+    "tamanho": (True, (QTextFormat.FontPointSize,), QTextCharFormat.fontPointSize,
+                QTextCharFormat.setFontPointSize),
+    "negrito": (True, (QTextFormat.FontWeight,), lambda formato: formato.fontWeight() >= QFont.DemiBold,
+                lambda formato, valor: formato.setFontWeight(QFont.Bold if valor else QFont.Normal)),
+    "italico": (True, (QTextFormat.FontItalic,), QTextCharFormat.fontItalic, QTextCharFormat.setFontItalic),
+    "nivel": (False, (QTextFormat.HeadingLevel,), QTextBlockFormat.headingLevel, QTextBlockFormat.setHeadingLevel),
+    "alinhamento": (False, (QTextFormat.BlockAlignment,), ler_alinhamento,
+                    lambda formato, valor: formato.setAlignment(ALINHAMENTOS[valor])),
+    "recuo": (False, (QTextFormat.BlockIndent,), QTextBlockFormat.indent, QTextBlockFormat.setIndent),
+    "espaco_depois": (False, (QTextFormat.BlockBottomMargin,), QTextBlockFormat.bottomMargin,
+                      QTextBlockFormat.setBottomMargin),
+}
+
+# Valor de um campo quando o formato não o define
+NEUTROS = {"negrito": False, "italico": False, "nivel": 0, "alinhamento": "left", "recuo": 0, "espaco_depois": 0}
+
+
+def completar(folha):
+    """A folha do livro com os estilos padrão que faltarem"""
+    completa = copy.deepcopy(ESTILOS_PADRAO)
+    for identificador, estilo in (folha or {}).items():
+        completa.setdefault(identificador, {}).update(estilo)
+    return completa
+
+
+def completar_campos(estilo):
+    """O estilo com todos os campos, para quem precisa mostrar cada um"""
+    return {"fonte": FONTE_PADRAO, "tamanho": ESTILOS_PADRAO[CORPO]["tamanho"], **NEUTROS,
+            **{campo: valor for campo, valor in estilo.items() if valor is not None}}
+
+
+def estilos_do_livro(livro_aberto):
+    """Folha de estilos do livro, com os estilos padrão no que faltar"""
+    return completar(livro_aberto.dados.get("estilos") if livro_aberto is not None else None)
+
+
+def estilo_do_bloco(formato):
+    """Estilo do parágrafo: o nome gravado nele ou, em textos anteriores aos estilos, o do nível de título"""
+    if formato.hasProperty(PROPRIEDADE_ESTILO):
+        return formato.stringProperty(PROPRIEDADE_ESTILO)
+    return estilo_implicito(formato.headingLevel())
+
+
+def estilo_implicito(nivel):
+    if nivel == 1:
+        return TITULO
+    return SUBTITULO if nivel >= 2 else CORPO
+
+
+def definido(formato, campo):
+    return any(formato.hasProperty(propriedade) for propriedade in CAMPOS[campo][1])
+
+
+def formato_caractere(estilo, anterior=None):
+    """Aparência do texto no estilo; o que só o estilo `anterior` definia volta ao neutro"""
+    formato = QTextCharFormat()
+    preencher(formato, True, estilo, anterior)
+    return formato
+
+
+def formato_bloco(identificador, estilo, anterior=None):
+    formato = QTextBlockFormat()
+    formato.setProperty(PROPRIEDADE_ESTILO, identificador)
+    preencher(formato, False, estilo, anterior)
+    return formato
+
+
+def preencher(formato, caractere, estilo, anterior):
+    for campo, (de_caractere, _, _, escrever) in CAMPOS.items():
+        if de_caractere != caractere:
+            continue
+        if estilo.get(campo) is not None:
+            escrever(formato, estilo[campo])
+        elif anterior and anterior.get(campo) is not None and campo in NEUTROS:
+            escrever(formato, NEUTROS[campo])
+
+
+def aplicar_estilo(cursor, identificador, folha):
+    """Põe os parágrafos da seleção no estilo, num único passo de desfazer"""
+    documento = cursor.document()
+    inicio = documento.findBlock(cursor.selectionStart())
+    fim = documento.findBlock(cursor.selectionEnd())
+    estilo = folha[identificador]
+
+    paragrafos = QTextCursor(documento)
+    cursor.beginEditBlock()
+    bloco = inicio
+    while bloco.isValid():
+        anterior = folha.get(estilo_do_bloco(bloco.blockFormat()))
+        paragrafos.setPosition(bloco.position())
+        paragrafos.mergeBlockFormat(formato_bloco(identificador, estilo, anterior))
+        # O estilo vale para o parágrafo inteiro, então a fonte também
+        paragrafos.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
+        caractere = formato_caractere(estilo, anterior)
+        paragrafos.mergeCharFormat(caractere)
+        paragrafos.mergeBlockCharFormat(caractere)
+        if bloco == fim:
+            break
+        bloco = bloco.next()
+    cursor.mergeCharFormat(formato_caractere(estilo))
+    cursor.endEditBlock()
+
+
+def mudancas(antiga, nova):
+    """Para cada estilo alterado, [(campo, valor antigo, valor novo)] dos campos que mudaram"""
+    resultado = {}
+    for identificador, estilo in nova.items():
+        velho = antiga.get(identificador, {})
+        # Um campo que passa a ser definido com o valor neutro não muda nada
+        campos = [(campo, velho.get(campo), estilo[campo]) for campo in CAMPOS
+                  if estilo.get(campo) is not None and velho.get(campo, NEUTROS.get(campo)) != estilo[campo]]
+        if campos:
+            resultado[identificador] = campos
+    return resultado
+
+
+def diferenca(formato, campos, caractere):
+    """(chave, formato) do que muda num formato: só onde ele ainda segue o estilo antigo.
+
+    Uma palavra em negrito num parágrafo Corpo (formatação direta) continua
+    em negrito quando o negrito do Corpo muda; o que não foi definido no
+    texto segue o estilo.
+    """
+    alteracao = QTextCharFormat() if caractere else QTextBlockFormat()
+    chave = []
+    for campo, velho, novo in campos:
+        de_caractere, _, ler, escrever = CAMPOS[campo]
+        if de_caractere != caractere:
+            continue
+        if definido(formato, campo):
+            atual = ler(formato)
+            if atual == novo or atual != (velho if velho is not None else NEUTROS.get(campo)):
+                continue
+        escrever(alteracao, novo)
+        chave.append((campo, novo))
+    return tuple(chave), alteracao
+
+
+def reestilizar(documento, antiga, nova, desfazer=True):
+    """Leva os parágrafos do documento da folha `antiga` para a `nova` numa só edição.
+
+    Percorre o documento uma vez, guarda por índice de formato o que muda em
+    cada um e junta os trechos vizinhos com a mesma mudança; o documento é
+    alterado em poucos merges dentro de um único bloco de edição, então o
+    layout é refeito uma vez e o desfazer ganha um único passo. Devolve o
+    número de parágrafos alterados.
+    """
+    alteracoes = mudancas(antiga, nova)
+    if not alteracoes:
+        return 0
+
+    estilos_formato = {}
+    blocos_formato = {}
+    caracteres_formato = {}
+    trechos = []
+    paragrafos = []
+    alterados = 0
+
+    bloco = documento.firstBlock()
+    while bloco.isValid():
+        indice_bloco = bloco.blockFormatIndex()
+        identificador = estilos_formato.get(indice_bloco)
+        if identificador is None:
+            identificador = estilos_formato[indice_bloco] = estilo_do_bloco(bloco.blockFormat())
+        campos = alteracoes.get(identificador)
+        if campos is None:
+            bloco = bloco.next()
+            continue
+
+        tocado = False
+        resultado = blocos_formato.get((identificador, indice_bloco))
+        if resultado is None:
+            resultado = blocos_formato[(identificador, indice_bloco)] = diferenca(bloco.blockFormat(), campos, False)
+        chave, formato = resultado
+        if chave:
+            tocado = True
+            numero = bloco.blockNumber()
+            if paragrafos and paragrafos[-1][2] == chave and paragrafos[-1][1] == numero - 1:
+                paragrafos[-1][1] = numero
+            else:
+                paragrafos.append([numero, numero, chave, formato, bloco.position()])
+
+        # O formato de caractere do parágrafo (o do texto digitado num parágrafo vazio) fica no separador
+        # que o precede; no primeiro parágrafo não há separador e ele é alterado à parte
+        posicao = bloco.position()
+        segmentos = [(max(posicao - 1, 0), posicao, bloco.charFormatIndex(), bloco.charFormat)]
+        iterador = bloco.begin()
+        while not iterador.atEnd():
+            fragmento = iterador.fragment()
+            segmentos.append((fragmento.position(), fragmento.position() + fragmento.length(),
+                              fragmento.charFormatIndex(), fragmento.charFormat))
+            iterador += 1
+        for inicio, fim, indice, ler_formato in segmentos:
+            resultado = caracteres_formato.get((identificador, indice))
+            if resultado is None:
+                resultado = caracteres_formato[(identificador, indice)] = diferenca(ler_formato(), campos, True)
+            chave, formato = resultado
+            if not chave:
+                continue
+            tocado = True
+            if trechos and trechos[-1][2] == chave and inicio <= trechos[-1][1]:
+                trechos[-1][1] = fim
+            else:
+                trechos.append([inicio, fim, chave, formato])
+        alterados += tocado
+        bloco = bloco.next()
+
+    if not trechos and not paragrafos:
+        return 0
+
+    cursor = QTextCursor(documento)
+    if not desfazer:
+        documento.setUndoRedoEnabled(False)
+    cursor.beginEditBlock()
+    try:
+        for primeiro, ultimo, _, formato, posicao in paragrafos:
+            cursor.setPosition(posicao)
+            if ultimo > primeiro:
+                cursor.setPosition(documento.findBlockByNumber(ultimo).position(), QTextCursor.KeepAnchor)
+            cursor.mergeBlockFormat(formato)
+        for inicio, fim, _, formato in trechos:
+            cursor.setPosition(inicio)
+            if fim > inicio:
+                cursor.setPosition(fim, QTextCursor.KeepAnchor)
+                cursor.mergeCharFormat(formato)
+            else:
+                cursor.mergeBlockCharFormat(formato)
+    finally:
+        cursor.endEditBlock()
+        if not desfazer:
+            documento.setUndoRedoEnabled(True)
+    return alterados
+
+
+def identificador_livre(nome, folha):
+    """Identificador de um estilo novo, tirado do nome: "Epígrafe" vira "epigrafe" """
+    base = unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode("ascii")
+    base = "".join(letra if letra.isalnum() else "_" for letra in base.lower()).strip("_") or "estilo"
+    identificador = base
+    numero = 2
+    while identificador in folha:
+        identificador = f"{base}_{numero}"
+        numero += 1
+    return identificador
+
+
+class DialogoEstilos(QDialog):
+    """Folha de estilos do livro: a aparência de cada estilo de parágrafo"""
+
+    def __init__(self, folha, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Estilos")
+        self.estilos = copy.deepcopy(folha)
+        self.atual = None
+
+        layout = QHBoxLayout(self)
+        coluna = QVBoxLayout()
+        self.lista = QListWidget()
+        coluna.addWidget(self.lista)
+        novo = QPushButton("Novo Estilo...")
+        novo.clicked.connect(self.novo_estilo)
+        coluna.addWidget(novo)
+        layout.addLayout(coluna)
+
+        formulario = QFormLayout()
+        self.nome = QLineEdit()
+        formulario.addRow("Nome", self.nome)
+        self.fonte = QFontComboBox()
+        formulario.addRow("Fonte", self.fonte)
+        self.tamanho = QDoubleSpinBox()
+        self.tamanho.setRange(4, 96)
+        self.tamanho.setDecimals(1)
+        self.tamanho.setSuffix(" pt")
+        formulario.addRow("Tamanho", self.tamanho)
+        self.negrito = QCheckBox("Negrito")
+        formulario.addRow(self.negrito)
+        self.italico = QCheckBox("Itálico")
+        formulario.addRow(self.italico)
+        self.alinhamento = QComboBox()
+        for nome, rotulo in NOMES_ALINHAMENTO.items():
+            self.alinhamento.addItem(rotulo, nome)
+        formulario.addRow("Alinhamento", self.alinhamento)
+        self.recuo = QSpinBox()
+        self.recuo.setRange(0, 10)
+        formulario.addRow("Recuo", self.recuo)
+        self.espaco_depois = QSpinBox()
+        self.espaco_depois.setRange(0, 100)
+        self.espaco_depois.setSuffix(" px")
+        formulario.addRow("Espaço depois", self.espaco_depois)
+        self.nivel = QComboBox()
+        self.nivel.addItems(["Texto", "Título", "Subtítulo"])
+        self.nivel.setToolTip("Como os parágrafos do estilo aparecem na estrutura do capítulo")
+        formulario.addRow("Na estrutura", self.nivel)
+
+        botoes = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        botoes.accepted.connect(self.accept)
+        botoes.rejected.connect(self.reject)
+        formulario.addRow(botoes)
+        layout.addLayout(formulario)
+
+        for identificador, estilo in self.estilos.items():
+            item = QListWidgetItem(estilo.get("nome") or identificador)
+            item.setData(Qt.UserRole, identificador)
+            self.lista.addItem(item)
+        self.lista.currentItemChanged.connect(self.mostrar_estilo)
+        self.lista.setCurrentRow(0)
+
+    def mostrar_estilo(self, item, anterior=None):
+        if self.atual is not None:
+            self.guardar_estilo()
+        self.atual = item.data(Qt.UserRole) if item is not None else None
+        if self.atual is None:
+            return
+        estilo = completar_campos(self.estilos[self.atual])
+        self.nome.setText(estilo.get("nome") or self.atual)
+        self.fonte.setCurrentFont(QFont(estilo["fonte"]))
+        self.tamanho.setValue(estilo["tamanho"])
+        self.negrito.setChecked(estilo["negrito"])
+        self.italico.setChecked(estilo["italico"])
+        self.alinhamento.setCurrentIndex(self.alinhamento.findData(estilo["alinhamento"]))
+        self.recuo.setValue(estilo["recuo"])
+        self.espaco_depois.setValue(int(estilo["espaco_depois"]))
+        self.nivel.setCurrentIndex(min(estilo["nivel"], 2))
+
+    def guardar_estilo(self):
+        estilo = self.estilos[self.atual]
+        nome = self.nome.text().strip()
+        if nome:
+            estilo["nome"] = nome
+            item = self.item_do_estilo(self.atual)
+            if item is not None:
+                item.setText(nome)
+        estilo.update({
+            "fonte": self.fonte.currentFont().family(),
+            "tamanho": self.tamanho.value(),
+            "negrito": self.negrito.isChecked(),
+            "italico": self.italico.isChecked(),
+            "alinhamento": self.alinhamento.currentData(),
+            "recuo": self.recuo.value(),
+            "espaco_depois": self.espaco_depois.value(),
+            "nivel": self.nivel.currentIndex(),
+        })
+
+    def item_do_estilo(self, identificador):
+        for linha in range(self.lista.count()):
+            if self.lista.item(linha).data(Qt.UserRole) == identificador:
+                return self.lista.item(linha)
+        return None
+
+    def novo_estilo(self):
+        nome, ok = QInputDialog.getText(self, "Novo Estilo", "Nome do estilo:")
+        nome = nome.strip()
+        if not ok or not nome:
+            return
+        identificador = identificador_livre(nome, self.estilos)
+        # O estilo novo parte do Corpo
+        self.estilos[identificador] = dict(self.estilos[CORPO], nome=nome)
+        item = QListWidgetItem(nome)
+        item.setData(Qt.UserRole, identificador)
+        self.lista.addItem(item)
+        self.lista.setCurrentItem(item)
+
+    def folha(self):
+        if self.atual is not None:
+            self.guardar_estilo()
+        return self.estilos
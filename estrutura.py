@@ -0,0 +1,134 @@
+from bisect import bisect_left
+from PySide6.QtCore import QObject, Qt, Signal
+from PySide6.QtGui import QFont, QTextCursor
+from PySide6.QtWidgets import QListWidgetItem
+
+NIVEL_TITULO = 1
+NIVEL_SUBTITULO = 2
+
+# Recuo, na lista, de cada nível abaixo do título
+RECUO_NIVEL = "    "
+
+
+def posicao(cursor):
+    return cursor.position()
+
+
+class EstruturaDocumento(QObject):
+    """Os títulos (blocos com headingLevel) de um QTextDocument, sempre em dia.
+
+    Cada título é guardado como um QTextCursor no seu bloco; o próprio
+    documento desloca esses cursores a cada edição, então uma alteração só
+    exige reexaminar os blocos que ela tocou (`contentsChange`), nunca o
+    documento inteiro.
+    """
+
+    # primeira entrada afetada, quantas saíram, as entradas novas [(nível, texto)]
+    alterada = Signal(int, int, list)
+
+    def __init__(self, documento):
+        super().__init__(documento)
+        self.documento = documento
+        self.cursores = []
+        self.entradas = []
+
+        documento.contentsChange.connect(self.conteudo_alterado)
+        self.conteudo_alterado(0, 0, documento.characterCount())
+
+    @classmethod
+    def do_documento(cls, documento):
+        """A estrutura do documento, criada (com uma única varredura) no primeiro uso"""
+        estrutura = getattr(documento, "estrutura", None)
+        if estrutura is None:
+            estrutura = cls(documento)
+            documento.estrutura = estrutura
+        return estrutura
+
+    def conteudo_alterado(self, inicio, removidos, adicionados):
+        documento = self.documento
+        primeiro = documento.findBlock(inicio)
+        ultimo = documento.findBlock(inicio + adicionados)
+        if not primeiro.isValid():
+            primeiro = documento.firstBlock()
+        if not ultimo.isValid():
+            ultimo = documento.lastBlock()
+
+        # Títulos cujo bloco está no trecho alterado (os de texto apagado vieram parar aqui também)
+        de = bisect_left(self.cursores, primeiro.position(), key=posicao)
+        ate = bisect_left(self.cursores, ultimo.position() + ultimo.length(), key=posicao)
+
+        cursores = []
+        entradas = []
+        bloco = primeiro
+        while bloco.isValid():
+            nivel = bloco.blockFormat().headingLevel()
+            if nivel:
+                cursores.append(QTextCursor(bloco))
+                entradas.append((nivel, bloco.text()))
+            if bloco == ultimo:
+                break
+            bloco = bloco.next()
+
+        if entradas == self.entradas[de:ate]:
+            # Nada mudou na lista; só os cursores são renovados
+            self.cursores[de:ate] = cursores
+            return
+
+        self.cursores[de:ate] = cursores
+        self.entradas[de:ate] = entradas
+        self.alterada.emit(de, ate - de, entradas)
+
+    def bloco(self, indice):
+        return self.cursores[indice].block()
+
+
+class NavegadorEstrutura(QObject):
+    """Liga uma QListWidget à estrutura do documento aberto no editor.
+
+    A lista é montada inteira só ao trocar de documento; depois, cada
+    alteração substitui apenas as linhas afetadas.
+    """
+
+    def __init__(self, lista, editor, parent=None):
+        super().__init__(parent)
+        self.lista = lista
+        self.editor = editor
+        self.estrutura = None
+        self.lista.itemActivated.connect(self.ir_para)
+        self.lista.itemClicked.connect(self.ir_para)
+
+    def definir_documento(self, documento):
+        if self.estrutura is not None:
+            self.estrutura.alterada.disconnect(self.aplicar_alteracao)
+
+        self.estrutura = EstruturaDocumento.do_documento(documento)
+        self.estrutura.alterada.connect(self.aplicar_alteracao)
+
+        self.lista.setUpdatesEnabled(False)
+        self.lista.clear()
+        for nivel, texto in self.estrutura.entradas:
+            self.lista.addItem(self.criar_item(nivel, texto))
+        self.lista.setUpdatesEnabled(True)
+
+    def criar_item(self, nivel, texto):
+        item = QListWidgetItem(RECUO_NIVEL * (nivel - 1) + (texto.strip() or "(sem título)"))
+        if nivel == NIVEL_TITULO:
+            fonte = QFont(self.lista.font())
+            fonte.setBold(True)
+            item.setFont(fonte)
+        return item
+
+    def aplicar_alteracao(self, de, removidos, entradas):
+        for _ in range(removidos):
+            self.lista.takeItem(de)
+        for deslocamento, (nivel, texto) in enumerate(entradas):
+            self.lista.insertItem(de + deslocamento, self.criar_item(nivel, texto))
+
+    def ir_para(self, item):
+        linha = self.lista.row(item)
+        if self.estrutura is None or not 0 <= linha < len(self.estrutura.cursores):
+            return
+        cursor = QTextCursor(self.estrutura.bloco(linha))
+        self.editor.setTextCursor(cursor)
+        self.editor.ensureCursorVisible()
+        self.editor.setFocus(Qt.OtherFocusReason)
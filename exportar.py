@@ -0,0 +1,372 @@
+"""Exportação em lote de livros para EPUB e PDF A5, sem interface gráfica.
+
+Uso:
+    python exportar.py PASTA_DO_LIVRO [PASTA_DO_LIVRO ...] [--formatos epub pdf]
+                       [--saida PASTA] [--processos N]
+
+Cada livro é exportado em um processo separado; a falha de um livro não
+interrompe os demais.
+"""
+import os
+import re
+import sys
+import time
+import uuid
+import zipfile
+import argparse
+from html import escape
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+
+import livro
+
+MARGEM_PDF_MM = 15
+FONTE_PADRAO = "Times New Roman"
+
+# Quantas vezes um livro pode derrubar o processo que o exporta antes de ser dado como falho
+LIMITE_TENTATIVAS = 3
+
+ELEMENTOS_VAZIOS = {"br", "hr", "img", "meta", "link", "col", "area", "base", "input", "wbr"}
+ELEMENTOS_IGNORADOS = {"script", "style", "head", "title"}
+
+CONTAINER_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+
+MODELO_XHTML = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<head>
+  <meta charset="UTF-8"/>
+  <title>{titulo}</title>{estilo}
+</head>
+<body>
+{corpo}
+</body>
+</html>
+"""
+
+TIPOS_IMAGEM = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".bmp": "image/bmp",
+}
+
+
+def corpo_html(html):
+    """Conteúdo do <body> de um capítulo"""
+    encontrado = re.search(r"<body[^>]*>(.*)</body>", html, re.S | re.I)
+    return encontrado.group(1) if encontrado else html
+
+
+def estilos_html(html):
+    """Regras CSS do <head> de um capítulo (as classes do HTML compacto)"""
+    return "".join(re.findall(r"<style[^>]*>(.*?)</style>", html, re.S | re.I))
+
+
+def imagens_absolutas(html, diretorio):
+    """Reescreve o src das imagens como URLs de arquivo absolutas"""
+    from PySide6.QtCore import QUrl
+
+    def trocar(encontrado):
+        src = encontrado.group(2)
+        if re.match(r"^[a-z]+:", src, re.I):
+            return encontrado.group(0)
+        caminho = os.path.normpath(os.path.join(diretorio, src))
+        return f'{encontrado.group(1)}"{QUrl.fromLocalFile(caminho).toString()}"'
+
+    return re.sub(r'(<img[^>]*?\ssrc=)"([^"]*)"', trocar, html, flags=re.I)
+
+
+class ConversorXhtml(HTMLParser):
+    """Converte o HTML dos capítulos em XHTML bem formado para o EPUB.
+
+    As imagens encontradas são anotadas em `imagens` (caminho no disco ->
+    nome dentro do EPUB) e o src é reescrito para a pasta images/ do pacote.
+    """
+
+    def __init__(self, diretorio, imagens):
+        super().__init__(convert_charrefs=True)
+        self.diretorio = diretorio
+        self.imagens = imagens
+        self.saida = []
+        self.abertos = []
+        self.ignorando = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ELEMENTOS_IGNORADOS:
+            self.ignorando += 1
+            return
+        if self.ignorando or tag in ("html", "body"):
+            return
+
+        atributos = []
+        for nome, valor in attrs:
+            valor = valor or ""
+            if tag == "img" and nome == "src":
+                valor = self.registrar_imagem(valor)
+            atributos.append(f' {nome}="{escape(valor, quote=True)}"')
+        if tag == "img" and "alt" not in dict(attrs):
+            atributos.append(' alt=""')
+
+        if tag in ELEMENTOS_VAZIOS:
+            self.saida.append(f"<{tag}{''.join(atributos)}/>")
+        else:
+            self.saida.append(f"<{tag}{''.join(atributos)}>")
+            self.abertos.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in ELEMENTOS_VAZIOS and self.abertos and self.abertos[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in ELEMENTOS_IGNORADOS:
+            self.ignorando = max(0, self.ignorando - 1)
+            return
+        if self.ignorando or tag not in self.abertos:
+            return
+        # Fecha também o que ficou aberto dentro da tag (HTML permite, XHTML não)
+        while self.abertos:
+            aberta = self.abertos.pop()
+            self.saida.append(f"</{aberta}>")
+            if aberta == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.ignorando:
+            self.saida.append(escape(data, quote=False))
+
+    def registrar_imagem(self, src):
+        if re.match(r"^[a-z]+:", src, re.I):
+            return src
+        caminho = os.path.normpath(os.path.join(self.diretorio, src))
+        if caminho not in self.imagens:
+            self.imagens[caminho] = f"images/{len(self.imagens) + 1:04d}{os.path.splitext(caminho)[1].lower()}"
+        return self.imagens[caminho]
+
+    def converter(self, html):
+        self.feed(html)
+        self.close()
+        while self.abertos:
+            self.saida.append(f"</{self.abertos.pop()}>")
+        return "".join(self.saida)
+
+
+def exportar_epub(livro_aberto, destino):
+    imagens = {}
+    capitulos = []
+    for indice, capitulo in enumerate(livro_aberto.capitulos):
+        conversor = ConversorXhtml(livro_aberto.diretorio_capitulo(indice), imagens)
+        html = livro_aberto.ler_capitulo(indice)
+        corpo = conversor.converter(html)
+        estilo = estilos_html(html).strip()
+        if estilo:
+            estilo = f"\n  <style>\n{escape(estilo, quote=False)}\n  </style>"
+        capitulos.append((f"capitulo{indice + 1:03d}.xhtml", capitulo["titulo"], corpo, estilo))
+
+    identificador = f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, os.path.abspath(livro_aberto.pasta))}"
+    titulo = escape(livro_aberto.nome)
+
+    manifesto = ['<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>']
+    espinha = []
+    for numero, (arquivo, _, _, _) in enumerate(capitulos, start=1):
+        manifesto.append(f'<item id="c{numero}" href="{arquivo}" media-type="application/xhtml+xml"/>')
+        espinha.append(f'<itemref idref="c{numero}"/>')
+    for numero, (caminho, nome) in enumerate(imagens.items(), start=1):
+        if os.path.exists(caminho):
+            tipo = TIPOS_IMAGEM.get(os.path.splitext(nome)[1], "application/octet-stream")
+            manifesto.append(f'<item id="img{numero}" href="{nome}" media-type="{tipo}"/>')
+
+    separador = "\n    "
+    opf = f"""<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:identifier id="id">{identificador}</dc:identifier>
+    <dc:title>{titulo}</dc:title>
+    <dc:language>pt-BR</dc:language>
+    <meta property="dcterms:modified">{time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}</meta>
+  </metadata>
+  <manifest>
+    {separador.join(manifesto)}
+  </manifest>
+  <spine>
+    {separador.join(espinha)}
+  </spine>
+</package>
+"""
+
+    indice_nav = "\n".join(
+        f'      <li><a href="{arquivo}">{escape(nome)}</a></li>' for arquivo, nome, _, _ in capitulos
+    )
+    nav = MODELO_XHTML.format(
+        titulo=titulo,
+        estilo="",
+        corpo=f'<nav epub:type="toc">\n  <h1>{titulo}</h1>\n  <ol>\n{indice_nav}\n  </ol>\n</nav>'
+    )
+
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(temporario, "w") as epub:
+        # O mimetype precisa ser o primeiro arquivo, sem compressão
+        epub.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        epub.writestr("META-INF/container.xml", CONTAINER_XML, compress_type=zipfile.ZIP_DEFLATED)
+        epub.writestr("OEBPS/content.opf", opf, compress_type=zipfile.ZIP_DEFLATED)
+        epub.writestr("OEBPS/nav.xhtml", nav, compress_type=zipfile.ZIP_DEFLATED)
+        for arquivo, nome, corpo, estilo in capitulos:
+            epub.writestr(f"OEBPS/{arquivo}", MODELO_XHTML.format(titulo=escape(nome), estilo=estilo, corpo=corpo),
+                          compress_type=zipfile.ZIP_DEFLATED)
+        for caminho, nome in imagens.items():
+            if os.path.exists(caminho):
+                epub.write(caminho, f"OEBPS/{nome}", compress_type=zipfile.ZIP_STORED)
+    os.replace(temporario, destino)
+
+
+def exportar_pdf(livro_aberto, destino):
+    from PySide6.QtCore import QMarginsF
+    from PySide6.QtGui import QFont, QPageLayout, QPageSize, QPdfWriter, QTextDocument
+
+    partes = []
+    # As classes têm o nome tirado do próprio CSS, então as regras dos capítulos não conflitam
+    regras = {}
+    for indice in range(len(livro_aberto.capitulos)):
+        html = livro_aberto.ler_capitulo(indice)
+        for regra in estilos_html(html).splitlines():
+            regras.setdefault(regra.strip(), None)
+        corpo = imagens_absolutas(corpo_html(html), livro_aberto.diretorio_capitulo(indice))
+        # Cada capítulo começa em uma página nova
+        estilo = ' style="page-break-before: always"' if indice else ""
+        partes.append(f"<div{estilo}>{corpo}</div>")
+
+    documento = QTextDocument()
+    documento.setDefaultFont(QFont(FONTE_PADRAO, 12))
+    estilo = "\n".join(regra for regra in regras if regra)
+    documento.setHtml(f"<html><head><style>{estilo}</style></head><body>{''.join(partes)}</body></html>")
+
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    escritor = QPdfWriter(temporario)
+    escritor.setTitle(livro_aberto.nome)
+    escritor.setCreator("Editor A5")
+    escritor.setPageSize(QPageSize(QPageSize.A5))
+    escritor.setPageMargins(QMarginsF(MARGEM_PDF_MM, MARGEM_PDF_MM, MARGEM_PDF_MM, MARGEM_PDF_MM),
+                            QPageLayout.Millimeter)
+    documento.print_(escritor)
+    # O PDF só é finalizado quando o escritor é destruído
+    del escritor
+    os.replace(temporario, destino)
+
+
+EXPORTADORES = {
+    "epub": exportar_epub,
+    "pdf": exportar_pdf,
+}
+
+
+def iniciar_processo():
+    """Prepara cada processo do pool para usar o Qt sem tela"""
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    from PySide6.QtGui import QGuiApplication
+    global _aplicacao
+    _aplicacao = QGuiApplication.instance() or QGuiApplication([sys.argv[0]])
+
+
+def exportar_livro(caminho, formatos, saida=None):
+    """Exporta um livro nos formatos pedidos e devolve o relatório com os tempos"""
+    relatorio = {"livro": caminho, "arquivos": {}, "tempos": {}, "erro": None}
+    inicio = time.perf_counter()
+    try:
+        livro_aberto = livro.Livro.abrir(caminho)
+        pasta_saida = saida or livro_aberto.pasta
+        os.makedirs(pasta_saida, exist_ok=True)
+
+        for formato in formatos:
+            comeco = time.perf_counter()
+            destino = os.path.join(pasta_saida, f"{livro_aberto.nome}.{formato}")
+            EXPORTADORES[formato](livro_aberto, destino)
+            relatorio["arquivos"][formato] = destino
+            relatorio["tempos"][formato] = time.perf_counter() - comeco
+    except Exception as e:
+        relatorio["erro"] = f"{type(e).__name__}: {e}"
+    relatorio["tempos"]["total"] = time.perf_counter() - inicio
+    return relatorio
+
+
+def exportar_lote(caminhos, formatos, saida=None, processos=None):
+    """Distribui os livros por um pool de processos; devolve um relatório por livro.
+
+    Um processo que morre (ex.: falha dentro do Qt) quebra o pool inteiro.
+    Os livros que não chegaram ao fim voltam para um pool novo, de um
+    processo só: assim o livro que estava sendo exportado quando ele
+    morreu é o culpado, e só ele gasta tentativas.
+    """
+    relatorios = []
+    tentativas = {}
+    pendentes = list(caminhos)
+    contexto = multiprocessing.get_context("spawn")
+    while pendentes:
+        with ProcessPoolExecutor(max_workers=processos, mp_context=contexto, initializer=iniciar_processo) as pool:
+            futuros = {pool.submit(exportar_livro, caminho, formatos, saida): caminho for caminho in pendentes}
+            for futuro in as_completed(futuros):
+                if isinstance(futuro.exception(), BrokenProcessPool):
+                    continue
+                relatorio = futuro.result()
+                relatorios.append(relatorio)
+                imprimir_relatorio(relatorio)
+
+        # Na ordem em que foram enviados: num pool de um processo, o primeiro era o que estava rodando
+        interrompidos = [(futuro, caminho) for futuro, caminho in futuros.items()
+                         if isinstance(futuro.exception(), BrokenProcessPool)]
+        pendentes = [caminho for _, caminho in interrompidos]
+        if not pendentes:
+            break
+        print(f"Processo interrompido; {len(pendentes)} livros voltam para a fila", flush=True)
+        if processos != 1:
+            # Daqui em diante, um livro por vez
+            processos = 1
+            continue
+
+        futuro, culpado = interrompidos[0]
+        tentativas[culpado] = tentativas.get(culpado, 0) + 1
+        if tentativas[culpado] >= LIMITE_TENTATIVAS:
+            relatorio = {"livro": culpado, "arquivos": {}, "tempos": {},
+                         "erro": f"processo interrompido {tentativas[culpado]} vezes: {futuro.exception()}"}
+            relatorios.append(relatorio)
+            imprimir_relatorio(relatorio)
+            pendentes.pop(0)
+    return relatorios
+
+
+def imprimir_relatorio(relatorio):
+    tempos = ", ".join(f"{nome} {segundos:.2f}s" for nome, segundos in relatorio["tempos"].items())
+    if relatorio["erro"]:
+        print(f"FALHOU  {relatorio['livro']}: {relatorio['erro']} ({tempos})", flush=True)
+    else:
+        print(f"OK      {relatorio['livro']} ({tempos})", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta livros do Editor A5 para EPUB e PDF A5.")
+    parser.add_argument("livros", nargs="+", help="pastas dos livros (ou livro.json / HTML)")
+    parser.add_argument("--formatos", nargs="+", choices=sorted(EXPORTADORES), default=["epub", "pdf"])
+    parser.add_argument("--saida", help="pasta de destino (padrão: a pasta de cada livro)")
+    parser.add_argument("--processos", type=int, default=None, help="número de processos (padrão: CPUs)")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    relatorios = exportar_lote(args.livros, args.formatos, args.saida, args.processos)
+    falhas = [r for r in relatorios if r["erro"]]
+
+    print(f"\n{len(relatorios) - len(falhas)} de {len(relatorios)} livros exportados "
+          f"em {time.perf_counter() - inicio:.2f}s")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
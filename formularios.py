@@ -0,0 +1,154 @@
+"""Carrega as telas (.ui) a partir de formulários Python compilados com o uic.
+
+Interpretar o XML com o QUiLoader a cada janela aberta custa caro na
+inicialização; aqui cada .ui é convertido uma vez para Python (em
+__pycache__, ao lado dos .ui) e recompilado sozinho quando o .ui muda.
+Se o uic não estiver disponível, cai de volta no QUiLoader.
+
+Para compilar tudo de antemão (por exemplo, ao empacotar):
+
+    python formularios.py
+"""
+
+import os
+import sys
+import shutil
+import importlib.util
+
+DIRETORIO_UI = os.path.dirname(os.path.abspath(__file__))
+DIRETORIO_COMPILADOS = os.path.join(DIRETORIO_UI, "__pycache__")
+
+FORMULARIOS = ("welcome", "editor", "newBook")
+
+# Com EDITORA5_UI_LOADER=1 as telas são sempre interpretadas pelo QUiLoader
+USAR_QUILOADER = os.environ.get("EDITORA5_UI_LOADER") == "1"
+
+
+def caminho_ui(nome):
+    return os.path.join(DIRETORIO_UI, f"{nome}.ui")
+
+
+def caminho_compilado(nome):
+    return os.path.join(DIRETORIO_COMPILADOS, f"ui_{nome}.py")
+
+
+def comando_uic():
+    """O pyside6-uic do PATH ou, na falta dele, o uic que vem dentro do PySide6"""
+    uic = shutil.which("pyside6-uic")
+    if uic:
+        return [uic]
+
+    import PySide6
+    pasta = os.path.dirname(PySide6.__file__)
+    for candidato in (os.path.join(pasta, "Qt", "libexec", "uic"), os.path.join(pasta, "uic"),
+                      os.path.join(pasta, "uic.exe")):
+        if os.path.exists(candidato):
+            return [candidato, "-g", "python"]
+    return None
+
+
+def desatualizado(nome):
+    compilado = caminho_compilado(nome)
+    if not os.path.exists(compilado):
+        return True
+    return os.stat(caminho_ui(nome)).st_mtime_ns > os.stat(compilado).st_mtime_ns
+
+
+def compilar(nome):
+    """Gera o formulário Python de um .ui; o arquivo só aparece inteiro (troca atômica)"""
+    comando = comando_uic()
+    if comando is None:
+        raise RuntimeError("uic não encontrado")
+
+    os.makedirs(DIRETORIO_COMPILADOS, exist_ok=True)
+    destino = caminho_compilado(nome)
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    # Só preciso quando o .ui mudou: fora da abertura normal do programa
+    import subprocess
+    resultado = subprocess.run(comando + [caminho_ui(nome), "-o", temporario],
+                               capture_output=True, text=True)
+    if resultado.returncode != 0:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise RuntimeError(resultado.stderr.strip() or f"uic falhou ao compilar {nome}.ui")
+
+    # O uic não registra a classe do widget raiz; ela fica anotada no fim do módulo
+    with open(temporario, "a", encoding="utf-8") as f:
+        f.write(f"\nCLASSE_RAIZ = {classe_do_ui(nome)!r}\n")
+    os.replace(temporario, destino)
+    return destino
+
+
+def importar_compilado(nome):
+    if desatualizado(nome):
+        compilar(nome)
+
+    spec = importlib.util.spec_from_file_location(f"ui_{nome}", caminho_compilado(nome))
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def classe_do_ui(nome):
+    """Classe Qt do widget raiz do .ui (QMainWindow, QDialog, QWidget...)"""
+    import xml.etree.ElementTree as ET
+    return ET.parse(caminho_ui(nome)).getroot().find("widget").get("class")
+
+
+def classe_raiz(modulo):
+    """A classe Ui_<Nome> gerada pelo uic e a classe Qt do widget raiz do formulário"""
+    from PySide6 import QtWidgets
+    for nome_classe, valor in vars(modulo).items():
+        if nome_classe.startswith("Ui_") and isinstance(valor, type):
+            return valor, getattr(QtWidgets, modulo.CLASSE_RAIZ)
+    raise RuntimeError("formulário compilado sem classe Ui_")
+
+
+def carregar_formulario(nome, parent=None):
+    """Cria o widget raiz do formulário `nome` (sem extensão).
+
+    Os widgets filhos ficam acessíveis como atributos do objeto devolvido,
+    do mesmo jeito que no QUiLoader.
+    """
+    if not USAR_QUILOADER:
+        try:
+            modulo = importar_compilado(nome)
+            classe_ui, classe_widget = classe_raiz(modulo)
+            widget = classe_widget(parent)
+            formulario = classe_ui()
+            formulario.setupUi(widget)
+            for atributo, valor in vars(formulario).items():
+                setattr(widget, atributo, valor)
+            return widget
+        except Exception as e:
+            print(f"Erro ao usar o formulário compilado de {nome}.ui, interpretando o XML: {e}")
+
+    return carregar_com_quiloader(nome, parent)
+
+
+def carregar_com_quiloader(nome, parent=None):
+    from PySide6.QtCore import QFile
+    from PySide6.QtUiTools import QUiLoader
+
+    ui_file = QFile(caminho_ui(nome))
+    if not ui_file.open(QFile.ReadOnly):
+        raise RuntimeError(f"Erro ao abrir o arquivo {nome}.ui: {ui_file.errorString()}")
+    try:
+        return QUiLoader().load(ui_file, parent)
+    finally:
+        ui_file.close()
+
+
+def compilar_todos():
+    for nome in FORMULARIOS:
+        if desatualizado(nome):
+            print(f"Compilando {nome}.ui -> {caminho_compilado(nome)}")
+            compilar(nome)
+
+
+if __name__ == "__main__":
+    try:
+        compilar_todos()
+    except Exception as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        sys.exit(1)
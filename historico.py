@@ -0,0 +1,485 @@
+import os
+import time
+import zlib
+import hashlib
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from html import escape
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem, QTextBrowser, QComboBox,
+    QPushButton, QLabel, QInputDialog, QMessageBox, QSplitter, QWidget
+)
+import livro
+
+PASTA_VERSOES = ".versoes"
+
+VERSAO_ESQUEMA = 1
+
+ESQUEMA = [
+    """CREATE TABLE IF NOT EXISTS versoes (
+        id INTEGER PRIMARY KEY,
+        data REAL NOT NULL,
+        descricao TEXT NOT NULL DEFAULT '',
+        manual INTEGER NOT NULL DEFAULT 0,
+        tamanho INTEGER NOT NULL,
+        tamanho_novo INTEGER NOT NULL
+    )""",
+    # pedacos: hashes separados por vírgula, na ordem do arquivo
+    """CREATE TABLE IF NOT EXISTS arquivos (
+        versao INTEGER NOT NULL,
+        caminho TEXT NOT NULL,
+        pedacos TEXT NOT NULL,
+        tamanho INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        PRIMARY KEY (versao, caminho)
+    )""",
+    """CREATE TABLE IF NOT EXISTS pedacos (
+        hash TEXT PRIMARY KEY,
+        dados BLOB NOT NULL
+    )""",
+]
+
+# Limites de cada pedaço; entre eles, o corte é decidido pelo conteúdo
+TAMANHO_MINIMO_PEDACO = 2 * 1024
+TAMANHO_MAXIMO_PEDACO = 64 * 1024
+
+# Uma linha encerra o pedaço quando os bits baixos do seu CRC são zero (1 em 32 linhas)
+MASCARA_CORTE = (1 << 5) - 1
+
+# Versões automáticas mais próximas que isto são fundidas na mais recente
+INTERVALO_VERSOES_S = 10 * 60
+
+# Retenção: tudo do último dia, uma por dia até 30 dias, depois uma por semana
+RETENCAO_COMPLETA_S = 24 * 3600
+RETENCAO_DIARIA_S = 30 * 24 * 3600
+LIMITE_VERSOES = 300
+
+
+def dividir(dados):
+    """Corta os bytes em pedaços definidos pelo conteúdo.
+
+    O HTML dos capítulos tem um parágrafo por linha, então a linha é a
+    unidade: um pedaço termina depois de uma linha cujo CRC cai na máscara.
+    Como o corte depende só das linhas, inserir ou apagar um parágrafo muda
+    apenas o pedaço onde ele está; os demais continuam com o mesmo hash.
+    """
+    pedacos = []
+    atual = []
+    tamanho = 0
+    for linha in dados.splitlines(keepends=True):
+        if len(linha) > TAMANHO_MAXIMO_PEDACO:
+            if atual:
+                pedacos.append(b"".join(atual))
+                atual, tamanho = [], 0
+            pedacos.extend(linha[i:i + TAMANHO_MAXIMO_PEDACO] for i in range(0, len(linha), TAMANHO_MAXIMO_PEDACO))
+            continue
+        atual.append(linha)
+        tamanho += len(linha)
+        if tamanho >= TAMANHO_MAXIMO_PEDACO or (
+                tamanho >= TAMANHO_MINIMO_PEDACO and not zlib.crc32(linha) & MASCARA_CORTE):
+            pedacos.append(b"".join(atual))
+            atual, tamanho = [], 0
+    if atual:
+        pedacos.append(b"".join(atual))
+    return pedacos
+
+
+def arquivos_do_livro(livro_aberto):
+    """Caminhos (relativos à pasta do livro) que entram em uma versão"""
+    import ortografia
+
+    caminhos = [capitulo["arquivo"] for capitulo in livro_aberto.capitulos]
+    if livro_aberto.caminho_manifesto:
+        caminhos.insert(0, livro.MANIFESTO)
+    if os.path.exists(os.path.join(livro_aberto.pasta, ortografia.ARQUIVO_PALAVRAS_LIVRO)):
+        caminhos.append(ortografia.ARQUIVO_PALAVRAS_LIVRO)
+    return [caminho.replace(os.sep, "/") for caminho in caminhos]
+
+
+def versoes_a_remover(versoes, agora):
+    """Ids que a política de retenção descarta; `versoes` é [(id, data, manual)], da mais nova à mais antiga"""
+    remover = []
+    periodos = set()
+    automaticas = 0
+    for identificador, data, manual in versoes:
+        if manual:
+            continue
+        idade = agora - data
+        if idade <= RETENCAO_COMPLETA_S:
+            periodo = None
+        elif idade <= RETENCAO_DIARIA_S:
+            periodo = time.strftime("%Y-%m-%d", time.localtime(data))
+        else:
+            periodo = time.strftime("%G-W%V", time.localtime(data))
+        if periodo is not None:
+            if periodo in periodos:
+                remover.append(identificador)
+                continue
+            periodos.add(periodo)
+        automaticas += 1
+        if automaticas > LIMITE_VERSOES:
+            remover.append(identificador)
+    return remover
+
+
+class HistoricoVersoes:
+    """Versões de um livro em <pasta>/.versoes/historico.db, sem conteúdo repetido.
+
+    Cada arquivo do livro é dividido em pedaços (ver `dividir`) guardados
+    comprimidos pelo hash; uma versão é só a lista de hashes de cada
+    arquivo. Uma versão de um livro quase igual ao anterior custa os poucos
+    pedaços que mudaram. Arquivos com o mesmo tamanho e data da versão
+    anterior nem são lidos.
+    """
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        diretorio = os.path.join(pasta, PASTA_VERSOES)
+        os.makedirs(diretorio, exist_ok=True)
+        self.caminho = os.path.join(diretorio, "historico.db")
+
+        self.conexao = sqlite3.connect(self.caminho, timeout=10, isolation_level=None)
+        self.conexao.row_factory = sqlite3.Row
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("PRAGMA synchronous=NORMAL")
+        self.preparar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        self.conexao.close()
+
+    @contextmanager
+    def transacao(self):
+        self.conexao.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conexao
+        except BaseException:
+            self.conexao.execute("ROLLBACK")
+            raise
+        self.conexao.execute("COMMIT")
+
+    def preparar(self):
+        if self.conexao.execute("PRAGMA user_version").fetchone()[0] >= VERSAO_ESQUEMA:
+            return
+        with self.transacao() as conexao:
+            for comando in ESQUEMA:
+                conexao.execute(comando)
+            conexao.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+
+    def listar(self):
+        """Versões da mais nova para a mais antiga"""
+        linhas = self.conexao.execute("SELECT * FROM versoes ORDER BY data DESC, id DESC")
+        return [dict(linha) for linha in linhas]
+
+    def arquivos(self, versao):
+        """caminho -> (lista de hashes, tamanho, mtime_ns) de uma versão"""
+        linhas = self.conexao.execute(
+            "SELECT caminho, pedacos, tamanho, mtime_ns FROM arquivos WHERE versao = ?", (versao,)
+        )
+        return {linha["caminho"]: (linha["pedacos"].split(",") if linha["pedacos"] else [],
+                                   linha["tamanho"], linha["mtime_ns"]) for linha in linhas}
+
+    def registrar(self, livro_aberto, descricao="", manual=False, agora=None):
+        """Tira uma versão dos arquivos do livro em disco; devolve o id, ou None se nada mudou"""
+        agora = agora or time.time()
+        versoes = self.listar()
+        ultima = versoes[0] if versoes else None
+        anteriores = self.arquivos(ultima["id"]) if ultima else {}
+
+        arquivos = {}
+        novos = {}
+        tamanho_total = 0
+        for caminho in arquivos_do_livro(livro_aberto):
+            completo = os.path.join(self.pasta, caminho)
+            try:
+                estado = os.stat(completo)
+            except OSError:
+                continue
+            anterior = anteriores.get(caminho)
+            if anterior and anterior[1] == estado.st_size and anterior[2] == estado.st_mtime_ns:
+                hashes = anterior[0]
+            else:
+                with open(completo, "rb") as f:
+                    dados = f.read()
+                hashes = []
+                for pedaco in dividir(dados):
+                    resumo = hashlib.sha256(pedaco).hexdigest()
+                    hashes.append(resumo)
+                    novos.setdefault(resumo, pedaco)
+            arquivos[caminho] = (hashes, estado.st_size, estado.st_mtime_ns)
+            tamanho_total += estado.st_size
+
+        if not manual and ultima and {c: a[0] for c, a in arquivos.items()} == {c: a[0] for c, a in anteriores.items()}:
+            return None
+
+        with self.transacao() as conexao:
+            if novos:
+                existentes = set()
+                lista = list(novos)
+                for inicio in range(0, len(lista), 500):
+                    grupo = lista[inicio:inicio + 500]
+                    existentes.update(linha[0] for linha in conexao.execute(
+                        f"SELECT hash FROM pedacos WHERE hash IN ({','.join('?' * len(grupo))})", grupo))
+                comprimidos = [(resumo, zlib.compress(pedaco)) for resumo, pedaco in novos.items()
+                               if resumo not in existentes]
+                conexao.executemany("INSERT INTO pedacos (hash, dados) VALUES (?, ?)", comprimidos)
+                tamanho_novo = sum(len(dados) for _, dados in comprimidos)
+            else:
+                tamanho_novo = 0
+
+            # Salvamentos seguidos viram uma única versão automática
+            if not manual and ultima and not ultima["manual"] and agora - ultima["data"] < INTERVALO_VERSOES_S:
+                self._remover(conexao, [ultima["id"]])
+                tamanho_novo += ultima["tamanho_novo"]
+
+            cursor = conexao.execute(
+                "INSERT INTO versoes (data, descricao, manual, tamanho, tamanho_novo) VALUES (?, ?, ?, ?, ?)",
+                (agora, descricao, int(manual), tamanho_total, tamanho_novo)
+            )
+            versao = cursor.lastrowid
+            conexao.executemany(
+                "INSERT INTO arquivos (versao, caminho, pedacos, tamanho, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+                [(versao, caminho, ",".join(hashes), tamanho, mtime)
+                 for caminho, (hashes, tamanho, mtime) in arquivos.items()]
+            )
+            self._podar(conexao, agora)
+        return versao
+
+    def _remover(self, conexao, ids):
+        conexao.executemany("DELETE FROM arquivos WHERE versao = ?", [(i,) for i in ids])
+        conexao.executemany("DELETE FROM versoes WHERE id = ?", [(i,) for i in ids])
+
+    def _podar(self, conexao, agora):
+        """Aplica a retenção e apaga os pedaços que nenhuma versão usa mais"""
+        versoes = conexao.execute("SELECT id, data, manual FROM versoes ORDER BY data DESC, id DESC").fetchall()
+        remover = versoes_a_remover([tuple(v) for v in versoes], agora)
+        if remover:
+            self._remover(conexao, remover)
+
+        usados = set()
+        for (pedacos,) in conexao.execute("SELECT pedacos FROM arquivos"):
+            if pedacos:
+                usados.update(pedacos.split(","))
+        orfaos = [(resumo,) for (resumo,) in conexao.execute("SELECT hash FROM pedacos") if resumo not in usados]
+        conexao.executemany("DELETE FROM pedacos WHERE hash = ?", orfaos)
+
+    def ler(self, versao):
+        """caminho -> bytes de cada arquivo da versão"""
+        arquivos = self.arquivos(versao)
+        necessarios = {resumo for hashes, _, _ in arquivos.values() for resumo in hashes}
+        dados = {}
+        lista = list(necessarios)
+        for inicio in range(0, len(lista), 500):
+            grupo = lista[inicio:inicio + 500]
+            for resumo, comprimido in self.conexao.execute(
+                    f"SELECT hash, dados FROM pedacos WHERE hash IN ({','.join('?' * len(grupo))})", grupo):
+                dados[resumo] = zlib.decompress(comprimido)
+        return {caminho: b"".join(dados[resumo] for resumo in hashes) for caminho, (hashes, _, _) in arquivos.items()}
+
+    def restaurar(self, versao):
+        """Regrava na pasta do livro os arquivos da versão"""
+        raiz = os.path.realpath(self.pasta)
+        for caminho, dados in self.ler(versao).items():
+            destino = os.path.realpath(os.path.join(raiz, caminho))
+            if os.path.commonpath([raiz, destino]) != raiz:
+                continue
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            livro.escrever_atomico(destino, dados.decode("utf-8"))
+
+
+def registrar_versao(livro_aberto, descricao="", manual=False):
+    """Tira uma versão do livro (roda na thread de gravação, depois dos capítulos gravados)"""
+    try:
+        with HistoricoVersoes(livro_aberto.pasta) as historico:
+            historico.registrar(livro_aberto, descricao, manual)
+    except Exception as e:
+        print(f"Erro ao registrar versão: {e}")
+
+
+def restaurar_versao(livro_aberto, versao):
+    with HistoricoVersoes(livro_aberto.pasta) as historico:
+        historico.restaurar(versao)
+
+
+def linhas_de_texto(caminho, dados):
+    """Linhas comparáveis de um arquivo: o texto dos parágrafos, no caso dos capítulos"""
+    texto = dados.decode("utf-8", errors="replace")
+    if caminho.endswith((".html", ".htm")):
+        from busca import ExtratorTexto
+        texto = ExtratorTexto().extrair(texto)
+    return [linha.strip() for linha in texto.split("\n") if linha.strip()]
+
+
+def formatar_tamanho(tamanho):
+    if tamanho < 1024:
+        return f"{tamanho} B"
+    if tamanho < 1024 * 1024:
+        return f"{tamanho / 1024:.1f} KB"
+    return f"{tamanho / (1024 * 1024):.1f} MB"
+
+
+class DialogoVersoes(QDialog):
+    """Linha do tempo das versões do livro: compara qualquer versão e restaura.
+
+    As versões novas e a restauração passam pela thread de gravação do
+    editor, na mesma fila dos salvamentos.
+    """
+
+    def __init__(self, livro_aberto, autosalvamento, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Versões")
+        self.resize(900, 600)
+        self.livro = livro_aberto
+        self.autosalvamento = autosalvamento
+        self.restaurada = False
+        self.titulos = {capitulo["arquivo"].replace(os.sep, "/"): capitulo["titulo"] for capitulo in livro_aberto.capitulos}
+
+        self.lista = QListWidget()
+        self.comparacao = QComboBox()
+        self.comparacao.addItems(["Comparar com o livro atual", "Comparar com a versão anterior"])
+        self.diferencas = QTextBrowser()
+        self.resumo = QLabel()
+
+        lateral = QWidget()
+        layout_lateral = QVBoxLayout(lateral)
+        layout_lateral.setContentsMargins(0, 0, 0, 0)
+        layout_lateral.addWidget(self.lista)
+        layout_lateral.addWidget(self.resumo)
+
+        principal = QWidget()
+        layout_principal = QVBoxLayout(principal)
+        layout_principal.setContentsMargins(0, 0, 0, 0)
+        layout_principal.addWidget(self.comparacao)
+        layout_principal.addWidget(self.diferencas)
+
+        divisor = QSplitter(Qt.Horizontal)
+        divisor.addWidget(lateral)
+        divisor.addWidget(principal)
+        divisor.setSizes([300, 600])
+
+        self.botao_criar = QPushButton("Criar versão...")
+        self.botao_restaurar = QPushButton("Restaurar esta versão")
+        botao_fechar = QPushButton("Fechar")
+        botoes = QHBoxLayout()
+        botoes.addWidget(self.botao_criar)
+        botoes.addStretch()
+        botoes.addWidget(self.botao_restaurar)
+        botoes.addWidget(botao_fechar)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(divisor)
+        layout.addLayout(botoes)
+
+        self.lista.currentRowChanged.connect(self.mostrar_diferencas)
+        self.comparacao.currentIndexChanged.connect(self.mostrar_diferencas)
+        self.botao_criar.clicked.connect(self.criar_versao)
+        self.botao_restaurar.clicked.connect(self.restaurar)
+        botao_fechar.clicked.connect(self.reject)
+
+        self.carregar_versoes()
+
+    def carregar_versoes(self):
+        try:
+            with HistoricoVersoes(self.livro.pasta) as historico:
+                self.versoes = historico.listar()
+        except Exception as e:
+            print(f"Erro ao ler versões: {e}")
+            self.versoes = []
+
+        self.lista.clear()
+        for versao in self.versoes:
+            data = datetime.fromtimestamp(versao["data"]).strftime("%d/%m/%Y %H:%M")
+            descricao = versao["descricao"] or ("manual" if versao["manual"] else "automática")
+            item = QListWidgetItem(f"{data} · {descricao}\n{formatar_tamanho(versao['tamanho'])} · "
+                                   f"+{formatar_tamanho(versao['tamanho_novo'])} guardados")
+            self.lista.addItem(item)
+
+        ocupado = sum(v["tamanho_novo"] for v in self.versoes)
+        self.resumo.setText(f"{len(self.versoes)} versões · {formatar_tamanho(ocupado)} no histórico")
+        self.botao_restaurar.setEnabled(bool(self.versoes))
+        if self.versoes:
+            self.lista.setCurrentRow(0)
+        else:
+            self.diferencas.setHtml("<p>Nenhuma versão ainda. Elas são criadas ao salvar o livro.</p>")
+
+    def conteudo_atual(self):
+        conteudo = {}
+        for caminho in arquivos_do_livro(self.livro):
+            try:
+                with open(os.path.join(self.livro.pasta, caminho), "rb") as f:
+                    conteudo[caminho] = f.read()
+            except OSError:
+                pass
+        return conteudo
+
+    def mostrar_diferencas(self, *_):
+        linha = self.lista.currentRow()
+        if not 0 <= linha < len(self.versoes):
+            return
+
+        with HistoricoVersoes(self.livro.pasta) as historico:
+            escolhida = historico.ler(self.versoes[linha]["id"])
+            if self.comparacao.currentIndex() == 0:
+                antes, depois = escolhida, self.conteudo_atual()
+            elif linha + 1 < len(self.versoes):
+                antes, depois = historico.ler(self.versoes[linha + 1]["id"]), escolhida
+            else:
+                antes, depois = {}, escolhida
+
+        import difflib
+        partes = []
+        for caminho in sorted(set(antes) | set(depois)):
+            if antes.get(caminho) == depois.get(caminho):
+                continue
+            diferenca = list(difflib.unified_diff(
+                linhas_de_texto(caminho, antes.get(caminho, b"")),
+                linhas_de_texto(caminho, depois.get(caminho, b"")),
+                lineterm="", n=1
+            ))[2:]
+            if not diferenca:
+                continue
+            partes.append(f"<h3>{escape(self.titulos.get(caminho, caminho))}</h3>")
+            for texto in diferenca:
+                if texto.startswith("@@"):
+                    partes.append('<p style="color:#888888">…</p>')
+                elif texto.startswith("+"):
+                    partes.append(f'<p style="background-color:#e6ffec">+ {escape(texto[1:])}</p>')
+                elif texto.startswith("-"):
+                    partes.append(f'<p style="background-color:#ffebe9">− {escape(texto[1:])}</p>')
+                else:
+                    partes.append(f"<p>{escape(texto[1:])}</p>")
+
+        self.diferencas.setHtml("".join(partes) or "<p>Nenhuma diferença no texto.</p>")
+
+    def criar_versao(self):
+        descricao, ok = QInputDialog.getText(self, "Criar versão", "Nome da versão:")
+        if not ok:
+            return
+        self.autosalvamento.enfileirar(registrar_versao, self.livro, descricao.strip(), True)
+        self.autosalvamento.aguardar()
+        self.carregar_versoes()
+
+    def restaurar(self):
+        linha = self.lista.currentRow()
+        if not 0 <= linha < len(self.versoes):
+            return
+        resposta = QMessageBox.question(
+            self, "Restaurar versão",
+            "O livro voltará a esta versão. O estado atual fica guardado como uma versão nova. Continuar?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        )
+        if resposta != QMessageBox.Yes:
+            return
+
+        self.autosalvamento.enfileirar(registrar_versao, self.livro, "Antes de restaurar", True)
+        self.autosalvamento.enfileirar(restaurar_versao, self.livro, self.versoes[linha]["id"])
+        self.autosalvamento.aguardar()
+        self.restaurada = True
+        self.accept()
@@ -0,0 +1,172 @@
+import os
+import hashlib
+from collections import OrderedDict
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, QObject, QRunnable, QThreadPool, QSize, Qt, Signal
+from PySide6.QtGui import QImage, QImageReader, QTextDocument
+from livro import PASTA_IMAGENS
+
+# Memória máxima ocupada pelas imagens decodificadas de um livro aberto
+LIMITE_CACHE = 96 * 1024 * 1024
+
+# A leitura reduzida decodifica com folga para a reamostragem final ter qualidade
+FATOR_FOLGA = 2
+
+
+def ler_reduzida(caminho, tamanho, suave=True):
+    """Decodifica a imagem já perto do tamanho pedido quando o formato permite.
+
+    Formatos como JPEG reduzem durante a decodificação, então a memória
+    usada depende do tamanho pedido e não da resolução original. Com `suave`,
+    a leitura é feita com folga e reamostrada no tamanho exato.
+    """
+    leitor = QImageReader(caminho)
+    original = leitor.size()
+
+    if original.isValid() and original != tamanho:
+        leitura = tamanho * FATOR_FOLGA if suave else tamanho
+        if leitura.width() < original.width() and leitura.height() < original.height():
+            leitor.setScaledSize(leitura)
+
+    imagem = leitor.read()
+    if imagem.isNull():
+        raise ValueError(leitor.errorString())
+
+    if imagem.size() != tamanho:
+        modo = Qt.SmoothTransformation if suave else Qt.FastTransformation
+        imagem = imagem.scaled(tamanho, Qt.IgnoreAspectRatio, modo)
+    return imagem
+
+
+class _TarefaRedimensionar(QRunnable):
+    def __init__(self, redimensionador, caminho, tamanho):
+        super().__init__()
+        # A referência mantém o emissor vivo até o fim da tarefa
+        self.redimensionador = redimensionador
+        self.caminho = caminho
+        self.tamanho = tamanho
+
+    def run(self):
+        try:
+            imagem = ler_reduzida(self.caminho, self.tamanho)
+        except Exception as e:
+            self.redimensionador.falhou.emit(str(e))
+            return
+        self.redimensionador.concluida.emit(imagem)
+
+
+class Redimensionador(QObject):
+    """Faz a leitura e a reamostragem final de uma imagem fora da thread da interface"""
+
+    concluida = Signal(QImage)
+    falhou = Signal(str)
+
+    def iniciar(self, caminho, tamanho):
+        QThreadPool.globalInstance().start(_TarefaRedimensionar(self, caminho, QSize(tamanho)))
+
+
+def codificar(imagem, formato):
+    dados = QByteArray()
+    buffer = QBuffer(dados)
+    buffer.open(QIODevice.WriteOnly)
+    imagem.save(buffer, formato, 90 if formato == "JPG" else -1)
+    buffer.close()
+    return bytes(dados)
+
+
+def armazenar_imagem(pasta_livro, imagem, caminho_origem=None):
+    """Copia a imagem para a pasta images/ do livro, com o nome derivado do conteúdo.
+
+    Se a imagem não foi redimensionada, os bytes do arquivo original são
+    usados como estão; senão ela é recodificada no formato de origem. Imagens
+    iguais inseridas várias vezes ocupam um único arquivo.
+    Devolve o caminho absoluto do arquivo armazenado.
+    """
+    extensao = os.path.splitext(caminho_origem or "")[1].lower()
+
+    # Só o cabeçalho do arquivo é lido para saber o tamanho original
+    if caminho_origem and QImageReader(caminho_origem).size() == imagem.size():
+        with open(caminho_origem, "rb") as f:
+            dados = f.read()
+    elif extensao in (".jpg", ".jpeg"):
+        dados = codificar(imagem, "JPG")
+        extensao = ".jpg"
+    else:
+        dados = codificar(imagem, "PNG")
+        extensao = ".png"
+
+    pasta_imagens = os.path.join(pasta_livro, PASTA_IMAGENS)
+    os.makedirs(pasta_imagens, exist_ok=True)
+
+    destino = os.path.join(pasta_imagens, hashlib.sha256(dados).hexdigest()[:32] + extensao)
+    if not os.path.exists(destino):
+        temporario = f"{destino}.{os.getpid()}.tmp"
+        with open(temporario, "wb") as f:
+            f.write(dados)
+        os.replace(temporario, destino)
+    return os.path.abspath(destino)
+
+
+class CacheImagens:
+    """Cache LRU de imagens decodificadas, limitado pelo total de bytes"""
+
+    def __init__(self, limite=LIMITE_CACHE):
+        self.limite = limite
+        self.itens = OrderedDict()
+        self.total = 0
+
+    def obter(self, caminho):
+        imagem = self.itens.get(caminho)
+        if imagem is not None:
+            self.itens.move_to_end(caminho)
+            return imagem
+
+        imagem = QImage(caminho)
+        if imagem.isNull():
+            return None
+        self.guardar(caminho, imagem)
+        return imagem
+
+    def guardar(self, caminho, imagem):
+        antiga = self.itens.pop(caminho, None)
+        if antiga is not None:
+            self.total -= antiga.sizeInBytes()
+
+        self.itens[caminho] = imagem
+        self.total += imagem.sizeInBytes()
+
+        # A imagem recém-usada fica mesmo que sozinha passe do limite
+        while self.total > self.limite and len(self.itens) > 1:
+            _, removida = self.itens.popitem(last=False)
+            self.total -= removida.sizeInBytes()
+
+    def descartar(self, caminho):
+        """Esquece uma imagem que mudou no disco"""
+        imagem = self.itens.pop(caminho, None)
+        if imagem is not None:
+            self.total -= imagem.sizeInBytes()
+
+    def limpar(self):
+        self.itens.clear()
+        self.total = 0
+
+
+class DocumentoLivro(QTextDocument):
+    """QTextDocument que busca as imagens no cache do livro.
+
+    O QTextDocument padrão guarda para sempre toda imagem carregada; aqui os
+    recursos vêm do CacheImagens, e os nomes são caminhos relativos à pasta
+    do arquivo HTML do capítulo.
+    """
+
+    def __init__(self, diretorio, cache, parent=None):
+        super().__init__(parent)
+        self.diretorio = diretorio
+        self.cache = cache
+
+    def loadResource(self, tipo, nome):
+        if tipo == QTextDocument.ImageResource and self.diretorio:
+            relativo = nome.toLocalFile() or nome.toString()
+            imagem = self.cache.obter(os.path.normpath(os.path.join(self.diretorio, relativo)))
+            if imagem is not None:
+                return imagem
+        return super().loadResource(tipo, nome)
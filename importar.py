@@ -0,0 +1,341 @@
+import os
+import re
+import time
+from PySide6.QtCore import QObject, QTimer, Qt, Signal
+from PySide6.QtGui import QTextCursor, QTextCharFormat, QTextListFormat, QFont
+import estrutura
+import estilos
+
+EXTENSOES_MARKDOWN = (".md", ".markdown")
+EXTENSOES = (".txt",) + EXTENSOES_MARKDOWN
+
+# Tempo de cada lote inserido antes de devolver o controle à interface
+ORCAMENTO_LOTE_S = 0.03
+
+# Blocos inseridos entre uma consulta ao relógio e outra
+BLOCOS_POR_CONSULTA = 64
+
+ESCALA_PROGRESSO = 1000
+
+SEPARADOR_CENA = "* * *"
+
+SEPARADOR_LINHA = "\u2028"
+
+MARCADORES = (QTextListFormat.ListDisc, QTextListFormat.ListCircle, QTextListFormat.ListSquare)
+
+PADRAO_TITULO = re.compile(r" {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$")
+PADRAO_ITEM = re.compile(r"( *)([-*+]|\d{1,9}[.)])[ \t]+(.*)$")
+PADRAO_REGRA = re.compile(r" {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$")
+PADRAO_CERCA = re.compile(r" {0,3}(```|~~~)")
+
+PADRAO_INLINE = re.compile(r"""
+    \\(?P<escape>[\\`*_{}\[\]()\#+\-.!>~|])
+  | `(?P<codigo>[^`]+)`
+  | !\[(?P<imagem>[^\]]*)\]\([^)]*\)
+  | \[(?P<link>[^\]]+)\]\((?P<endereco>[^)\s]*)(?:\s+"[^"]*")?\)
+  | \*\*\*(?P<ambos>\S(?:.*?\S)?)\*\*\*
+  | (?<!\w)___(?P<ambos_>\S(?:.*?\S)?)___(?!\w)
+  | \*\*(?P<negrito>\S(?:.*?\S)?)\*\*
+  | (?<!\w)__(?P<negrito_>\S(?:.*?\S)?)__(?!\w)
+  | \*(?P<italico>[^\s*](?:.*?[^\s\\])?)\*
+  | (?<!\w)_(?P<italico_>\S(?:.*?\S)?)_(?!\w)
+""", re.VERBOSE)
+
+
+class Bloco:
+    """Um parágrafo lido do manuscrito: trechos [(texto, negrito, itálico, endereço)] e o papel dele"""
+
+    __slots__ = ("trechos", "nivel", "lista", "profundidade", "citacao", "centralizado")
+
+    def __init__(self, trechos, nivel=0, lista=None, profundidade=0, citacao=False, centralizado=False):
+        self.trechos = trechos
+        self.nivel = nivel
+        self.lista = lista
+        self.profundidade = profundidade
+        self.citacao = citacao
+        self.centralizado = centralizado
+
+
+def trechos(texto, negrito=False, italico=False, endereco=""):
+    """Ênfases, links e escapes do Markdown em uma linha de parágrafo"""
+    resultado = []
+    posicao = 0
+    for encontrado in PADRAO_INLINE.finditer(texto):
+        if encontrado.start() > posicao:
+            resultado.append((texto[posicao:encontrado.start()], negrito, italico, endereco))
+        grupo = encontrado.groupdict()
+        if grupo["escape"] is not None:
+            resultado.append((grupo["escape"], negrito, italico, endereco))
+        elif grupo["codigo"] is not None:
+            resultado.append((grupo["codigo"], negrito, italico, endereco))
+        elif grupo["imagem"] is not None:
+            if grupo["imagem"]:
+                resultado.append((grupo["imagem"], negrito, italico, endereco))
+        elif grupo["link"] is not None:
+            resultado.extend(trechos(grupo["link"], negrito, italico, grupo["endereco"]))
+        elif grupo["ambos"] is not None or grupo["ambos_"] is not None:
+            resultado.extend(trechos(grupo["ambos"] or grupo["ambos_"], True, True, endereco))
+        elif grupo["negrito"] is not None or grupo["negrito_"] is not None:
+            resultado.extend(trechos(grupo["negrito"] or grupo["negrito_"], True, italico, endereco))
+        else:
+            resultado.extend(trechos(grupo["italico"] or grupo["italico_"], negrito, True, endereco))
+        posicao = encontrado.end()
+    if posicao < len(texto):
+        resultado.append((texto[posicao:], negrito, italico, endereco))
+    return resultado
+
+
+def blocos_texto(linhas):
+    """Texto simples: cada linha não vazia é um parágrafo"""
+    for linha in linhas:
+        linha = linha.strip()
+        if linha:
+            yield Bloco([(linha, False, False, "")])
+
+
+def juntar_linhas(linhas):
+    """Linhas de um parágrafo Markdown; dois espaços ou barra no fim quebram a linha"""
+    partes = []
+    for linha in linhas[:-1]:
+        if linha.endswith("  ") or linha.endswith("\\"):
+            partes.append(linha.rstrip(" \\") + SEPARADOR_LINHA)
+        else:
+            partes.append(linha.strip() + " ")
+    partes.append(linhas[-1].strip())
+    return "".join(partes).strip()
+
+
+def blocos_markdown(linhas):
+    """Lê o Markdown linha a linha e devolve os blocos assim que cada um termina.
+
+    Cobre o que um manuscrito usa: títulos (# e sublinhados), parágrafos,
+    ênfases, listas com marcadores ou numeradas (aninhadas pelo recuo),
+    citações, separadores de cena e blocos de código, que entram como
+    texto.
+    """
+    pendentes = []
+    atributos = {}
+    cerca = None
+
+    def concluir():
+        if not pendentes:
+            return None
+        bloco = Bloco(trechos(juntar_linhas(pendentes)), **atributos)
+        pendentes.clear()
+        atributos.clear()
+        return bloco
+
+    for linha in linhas:
+        linha = linha.rstrip("\r\n").expandtabs(4)
+
+        if cerca is not None:
+            if linha.strip().startswith(cerca):
+                cerca = None
+            elif linha.strip():
+                yield Bloco([(linha, False, False, "")])
+            continue
+
+        abertura = PADRAO_CERCA.match(linha)
+        if abertura:
+            bloco = concluir()
+            if bloco:
+                yield bloco
+            cerca = abertura.group(1)
+            continue
+
+        if not linha.strip():
+            bloco = concluir()
+            if bloco:
+                yield bloco
+            continue
+
+        # Título sublinhado (=== ou ---) vale para o parágrafo que veio antes
+        if pendentes and not atributos and re.fullmatch(r" {0,3}(=+|-+)[ \t]*", linha):
+            atributos["nivel"] = estrutura.NIVEL_TITULO if "=" in linha else estrutura.NIVEL_SUBTITULO
+            yield concluir()
+            continue
+
+        if PADRAO_REGRA.match(linha):
+            bloco = concluir()
+            if bloco:
+                yield bloco
+            yield Bloco([(SEPARADOR_CENA, False, False, "")], centralizado=True)
+            continue
+
+        titulo = PADRAO_TITULO.match(linha)
+        if titulo:
+            bloco = concluir()
+            if bloco:
+                yield bloco
+            nivel = min(len(titulo.group(1)), estrutura.NIVEL_SUBTITULO)
+            yield Bloco(trechos(titulo.group(2) or ""), nivel=nivel)
+            continue
+
+        item = PADRAO_ITEM.match(linha)
+        if item:
+            bloco = concluir()
+            if bloco:
+                yield bloco
+            atributos["lista"] = "marcadores" if item.group(2) in "-*+" else "numerada"
+            atributos["profundidade"] = len(item.group(1)) // 2
+            pendentes.append(item.group(3))
+            continue
+
+        if linha.lstrip().startswith(">"):
+            texto = re.sub(r"^(\s*>\s?)+", "", linha)
+            if pendentes and not atributos.get("citacao"):
+                yield concluir()
+            atributos["citacao"] = True
+            if texto.strip():
+                pendentes.append(texto)
+            continue
+
+        if pendentes and atributos.get("citacao"):
+            yield concluir()
+        pendentes.append(linha)
+
+    bloco = concluir()
+    if bloco:
+        yield bloco
+
+
+class Importador(QObject):
+    """Insere um .txt ou .md em um QTextDocument aos poucos, sem travar a interface.
+
+    O arquivo é lido como fluxo e os blocos vão entrando em lotes de até
+    ORCAMENTO_LOTE_S; entre um lote e outro o controle volta ao laço de
+    eventos. O documento ainda não está em nenhum editor, então não há
+    layout, realce nem estatísticas a atualizar durante a importação.
+    """
+
+    progresso = Signal(int)
+    concluido = Signal()
+    falhou = Signal(str)
+
+    def __init__(self, caminho, documento, parent=None):
+        super().__init__(parent)
+        self.documento = documento
+        self.arquivo = open(caminho, "rb")
+        self.total = max(os.fstat(self.arquivo.fileno()).st_size, 1)
+        self.lidos = 0
+        self.codificacao = "utf-8"
+
+        markdown = os.path.splitext(caminho)[1].lower() in EXTENSOES_MARKDOWN
+        self.blocos = (blocos_markdown if markdown else blocos_texto)(self.linhas())
+
+        self.cursor = QTextCursor(documento)
+        self.primeiro = True
+        self.listas = {}
+        self.formatos = {}
+
+        self.temporizador = QTimer(self)
+        self.temporizador.setSingleShot(True)
+        self.temporizador.setInterval(0)
+        self.temporizador.timeout.connect(self.inserir_lote)
+
+    def iniciar(self):
+        self.temporizador.start()
+
+    def cancelar(self):
+        self.temporizador.stop()
+        self.arquivo.close()
+
+    def linhas(self):
+        for linha in self.arquivo:
+            self.lidos += len(linha)
+            yield self.decodificar(linha)
+
+    def decodificar(self, linha):
+        if self.lidos == len(linha) and linha.startswith(b"\xef\xbb\xbf"):
+            linha = linha[3:]
+        try:
+            return linha.decode(self.codificacao)
+        except UnicodeDecodeError:
+            # Rascunhos antigos costumam estar em Windows-1252; daí em diante vale ela
+            self.codificacao = "cp1252"
+            return linha.decode(self.codificacao, errors="replace")
+
+    def inserir_lote(self):
+        limite = time.perf_counter() + ORCAMENTO_LOTE_S
+        terminou = False
+        try:
+            self.cursor.beginEditBlock()
+            try:
+                for quantidade, bloco in enumerate(self.blocos, 1):
+                    self.inserir(bloco)
+                    if quantidade % BLOCOS_POR_CONSULTA == 0 and time.perf_counter() > limite:
+                        break
+                else:
+                    terminou = True
+            finally:
+                self.cursor.endEditBlock()
+        except Exception as e:
+            self.arquivo.close()
+            self.falhou.emit(str(e))
+            return
+
+        self.progresso.emit(min(self.lidos * ESCALA_PROGRESSO // self.total, ESCALA_PROGRESSO))
+        if terminou:
+            self.arquivo.close()
+            self.concluido.emit()
+        else:
+            self.temporizador.start()
+
+    def formato_caractere(self, estilo, negrito, italico, endereco):
+        chave = (estilo, negrito, italico)
+        formato = self.formatos.get(chave)
+        if formato is None:
+            # O livro importado é novo, então usa a folha de estilos padrão
+            formato = estilos.formato_caractere(estilos.ESTILOS_PADRAO[estilo])
+            if negrito:
+                formato.setFontWeight(QFont.Bold)
+            if italico:
+                formato.setFontItalic(True)
+            self.formatos[chave] = formato
+        if endereco:
+            formato = QTextCharFormat(formato)
+            formato.setAnchor(True)
+            formato.setAnchorHref(endereco)
+        return formato
+
+    def inserir(self, bloco):
+        estilo = estilos.CITACAO if bloco.citacao else estilos.estilo_implicito(bloco.nivel)
+        formato_bloco = estilos.formato_bloco(estilo, estilos.ESTILOS_PADRAO[estilo])
+        if bloco.centralizado:
+            formato_bloco.setAlignment(Qt.AlignHCenter)
+        base = self.formato_caractere(estilo, False, False, "")
+
+        if self.primeiro:
+            self.cursor.setBlockFormat(formato_bloco)
+            self.cursor.setBlockCharFormat(base)
+            self.primeiro = False
+        else:
+            self.cursor.insertBlock(formato_bloco, base)
+
+        if bloco.lista:
+            self.incluir_na_lista(bloco)
+        else:
+            self.listas.clear()
+
+        for texto, negrito, italico, endereco in bloco.trechos:
+            if texto:
+                self.cursor.insertText(texto, self.formato_caractere(estilo, negrito, italico, endereco))
+
+    def incluir_na_lista(self, bloco):
+        """Põe o bloco na lista aberta da mesma profundidade ou começa uma nova"""
+        if bloco.lista == "numerada":
+            estilo = QTextListFormat.ListDecimal
+        else:
+            estilo = MARCADORES[bloco.profundidade % len(MARCADORES)]
+
+        for profundidade in [p for p in self.listas if p > bloco.profundidade]:
+            del self.listas[profundidade]
+
+        lista = self.listas.get(bloco.profundidade)
+        if lista is not None and lista.format().style() == estilo:
+            lista.add(self.cursor.block())
+            return
+        formato = QTextListFormat()
+        formato.setStyle(estilo)
+        formato.setIndent(bloco.profundidade + 1)
+        self.listas[bloco.profundidade] = self.cursor.createList(formato)
@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import functools
+from collections import deque
+from PySide6.QtCore import QObject, QEvent, QCoreApplication
+from PySide6.QtWidgets import QTextEdit
+
+LIMITE_EVENTOS = 50000
+
+# Desligada, cada ponto medido custa só a leitura desta variável
+_ativo = False
+_eventos = deque(maxlen=LIMITE_EVENTOS)
+_inicio = time.perf_counter()
+_medidor_pintura = None
+
+
+def ativo():
+    return _ativo
+
+
+def ativar():
+    global _ativo
+    _ativo = True
+    instalar_medidor_pintura()
+
+
+def desativar():
+    global _ativo, _medidor_pintura
+    _ativo = False
+    if _medidor_pintura is not None:
+        QCoreApplication.instance().removeEventFilter(_medidor_pintura)
+        _medidor_pintura.deleteLater()
+        _medidor_pintura = None
+
+
+def limpar():
+    _eventos.clear()
+
+
+def memoria_kb():
+    """Memória residente atual do processo (ou o pico, onde não há /proc)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * (os.sysconf("SC_PAGE_SIZE") // 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico // 1024 if sys.platform == "darwin" else pico
+
+
+def _microssegundos(instante):
+    return round((instante - _inicio) * 1_000_000, 1)
+
+
+class _Trecho:
+    __slots__ = ("nome", "categoria", "argumentos", "inicio", "memoria")
+
+    def __init__(self, nome, categoria, argumentos):
+        self.nome = nome
+        self.categoria = categoria
+        self.argumentos = argumentos
+
+    def __enter__(self):
+        self.memoria = memoria_kb()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        fim = time.perf_counter()
+        memoria = memoria_kb()
+        argumentos = dict(self.argumentos, memoria_kb=memoria, memoria_delta_kb=memoria - self.memoria)
+        if exc[0] is not None:
+            argumentos["erro"] = repr(exc[1])
+        thread = threading.get_ident()
+        _eventos.append({
+            "name": self.nome, "cat": self.categoria, "ph": "X",
+            "ts": _microssegundos(self.inicio), "dur": round((fim - self.inicio) * 1_000_000, 1),
+            "pid": os.getpid(), "tid": thread, "args": argumentos,
+        })
+        _eventos.append({
+            "name": "memoria", "ph": "C", "ts": _microssegundos(fim),
+            "pid": os.getpid(), "tid": thread, "args": {"residente_kb": memoria},
+        })
+        return False
+
+
+class _Nada:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NADA = _Nada()
+
+
+def medir(nome, categoria="editor", **argumentos):
+    """Context manager que registra a duração do trecho (e não faz nada se desligado)"""
+    if not _ativo:
+        return _NADA
+    return _Trecho(nome, categoria, argumentos)
+
+
+def medido(nome=None, categoria="editor"):
+    """Decorador: registra cada chamada da função"""
+    def decorar(funcao):
+        rotulo = nome or funcao.__qualname__
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if not _ativo:
+                return funcao(*args, **kwargs)
+            with _Trecho(rotulo, categoria, {}):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorar
+
+
+def marcar(nome, categoria="editor", **argumentos):
+    """Evento instantâneo (sem duração)"""
+    if _ativo:
+        _eventos.append({
+            "name": nome, "cat": categoria, "ph": "i", "s": "t",
+            "ts": _microssegundos(time.perf_counter()), "pid": os.getpid(),
+            "tid": threading.get_ident(), "args": argumentos,
+        })
+
+
+class MedidorPintura(QObject):
+    """Mede a pintura dos editores de texto, que é quando o QTextDocument faz o layout visível.
+
+    Filtro instalado no aplicativo só enquanto a medida está ligada: o
+    evento de pintura é reenviado ao próprio viewport dentro do trecho
+    medido e o original é consumido.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pintando = False
+
+    def eventFilter(self, objeto, evento):
+        if self.pintando or evento.type() != QEvent.Paint:
+            return False
+        editor = objeto.parent()
+        if not isinstance(editor, QTextEdit) or objeto is not editor.viewport():
+            return False
+
+        self.pintando = True
+        try:
+            with medir("layout_e_pintura", "layout", blocos=editor.document().blockCount()):
+                QCoreApplication.sendEvent(objeto, evento)
+        finally:
+            self.pintando = False
+        return True
+
+
+def instalar_medidor_pintura():
+    """Liga a medida do layout, se já houver um QApplication (senão o editor chama de novo ao abrir)"""
+    global _medidor_pintura
+    aplicativo = QCoreApplication.instance()
+    if _medidor_pintura is None and aplicativo is not None and _ativo:
+        _medidor_pintura = MedidorPintura(aplicativo)
+        aplicativo.installEventFilter(_medidor_pintura)
+
+
+def eventos():
+    return list(_eventos)
+
+
+def exportar(caminho):
+    """Grava o buffer no formato JSON de trace do Chrome; devolve quantos eventos foram gravados"""
+    from livro import escrever_atomico
+
+    registrados = eventos()
+    nomes_threads = [
+        {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": thread.ident, "args": {"name": thread.name}}
+        for thread in threading.enumerate()
+    ]
+    escrever_atomico(caminho, json.dumps({
+        "traceEvents": nomes_threads + registrados,
+        "displayTimeUnit": "ms",
+        "otherData": {"programa": "Editor A5", "eventos_descartados": len(registrados) >= LIMITE_EVENTOS},
+    }))
+    return len(registrados)
+
+
+def _exportar_ao_sair(caminho):
+    try:
+        total = exportar(caminho)
+        print(f"Trace de desempenho gravado em {caminho} ({total} eventos)")
+    except Exception as e:
+        print(f"Erro ao gravar trace de desempenho: {e}")
+
+
+_destino_ambiente = os.environ.get("EDITORA5_TRACE")
+if _destino_ambiente:
+    ativar()
+    atexit.register(_exportar_ao_sair, os.path.abspath(_destino_ambiente))
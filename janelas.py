@@ -0,0 +1,123 @@
+import os
+from PySide6.QtCore import QObject
+from PySide6.QtWidgets import QApplication
+
+# Janelas de editor fechadas que ficam guardadas (vazias) para o próximo livro
+LIMITE_EDITORES_LIVRES = 2
+
+_gerenciador = None
+
+
+def gerenciador():
+    """O gerenciador de janelas da aplicação, criado no primeiro uso"""
+    global _gerenciador
+    if _gerenciador is None:
+        _gerenciador = GerenciadorJanelas(QApplication.instance())
+    return _gerenciador
+
+
+def pasta_do_livro(caminho):
+    """Pasta que identifica o livro, seja o caminho a pasta, o livro.json ou o HTML antigo"""
+    caminho = os.path.realpath(caminho)
+    return caminho if os.path.isdir(caminho) else os.path.dirname(caminho)
+
+
+class GerenciadorJanelas(QObject):
+    """Dono de todas as janelas: uma tela inicial e as janelas de editor.
+
+    A tela inicial é criada uma vez e só escondida/mostrada. Cada livro
+    aberto tem a sua janela de editor; ao fechar, a janela devolve a
+    memória do livro e fica guardada para ser reaproveitada, sem recriar
+    os widgets.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.inicio = None
+        self.editores = []
+        self.livres = []
+
+        if parent is not None:
+            parent.aboutToQuit.connect(self.encerrar)
+
+    def mostrar_inicio(self):
+        if self.inicio is None:
+            import welcome
+            self.inicio = welcome.WelcomeWindow()
+        else:
+            # A lista vem do SQLite e as capas do cache, então recarregar é barato
+            self.inicio.carregar_livros_recentes()
+            self.inicio.ui.show()
+        self.inicio.ui.raise_()
+        self.inicio.ui.activateWindow()
+        return self.inicio
+
+    def esconder_inicio(self):
+        if self.inicio is not None:
+            self.inicio.ui.hide()
+
+    def editor_do_livro(self, caminho):
+        pasta = pasta_do_livro(caminho)
+        for editor in self.editores:
+            if editor.livro is not None and pasta_do_livro(editor.livro.pasta) == pasta:
+                return editor
+        return None
+
+    def abrir_livro(self, caminho=None):
+        """Mostra o livro em uma janela de editor: a que já o tem aberto, uma guardada ou uma nova.
+
+        Sem `caminho`, abre um editor com um documento vazio. Devolve a
+        janela, ou None se o livro não pôde ser aberto.
+        """
+        if caminho:
+            editor = self.editor_do_livro(caminho)
+            if editor is not None:
+                self.mostrar_editor(editor)
+                return editor
+
+        if self.livres:
+            editor = self.livres.pop()
+        else:
+            import editor as modulo_editor
+            editor = modulo_editor.EditorWindow()
+
+        if caminho:
+            editor.carregar_arquivo(caminho)
+            if editor.livro is None:
+                # Erro já mostrado ao usuário; a janela volta vazia para a reserva
+                self.guardar(editor)
+                return None
+
+        self.editores.append(editor)
+        self.mostrar_editor(editor)
+        return editor
+
+    def mostrar_editor(self, editor):
+        editor.show()
+        editor.raise_()
+        editor.activateWindow()
+        self.esconder_inicio()
+
+    def editor_fechado(self, editor):
+        """Chamado pela janela de editor quando ela é fechada de fato"""
+        if editor in self.editores:
+            self.editores.remove(editor)
+        editor.liberar_livro()
+        self.guardar(editor)
+
+    def guardar(self, editor):
+        """Põe na reserva uma janela sem livro; ela fica escondida até ser usada de novo"""
+        # Uma janela nova já nasce visível (EditorWindow.__init__ chama show)
+        editor.hide()
+        if editor in self.livres:
+            return
+        if len(self.livres) < LIMITE_EDITORES_LIVRES:
+            self.livres.append(editor)
+        else:
+            editor.autosalvamento.encerrar()
+            editor.deleteLater()
+
+    def encerrar(self):
+        """Termina as escritas pendentes de todas as janelas antes de sair"""
+        for editor in self.editores + self.livres:
+            editor.autosalvamento.encerrar()
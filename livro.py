@@ -0,0 +1,195 @@
+import os
+import json
+import stat
+import tempfile
+from datetime import datetime
+
+MANIFESTO = "livro.json"
+PASTA_CAPITULOS = "capitulos"
+PASTA_IMAGENS = "images"
+VERSAO_FORMATO = 1
+
+MODELO_CAPITULO = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>{titulo}</title>
+</head>
+<body>
+    <h1>{titulo}</h1>
+    <p>{texto}</p>
+</body>
+</html>"""
+
+
+def escrever_atomico(caminho, conteudo):
+    """Grava em um arquivo temporário da mesma pasta e o renomeia sobre o destino.
+
+    Quem lê o arquivo vê sempre a versão antiga inteira ou a nova inteira,
+    nunca um arquivo pela metade.
+    """
+    pasta = os.path.dirname(caminho) or "."
+    fd, temporario = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=pasta)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(conteudo)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(caminho):
+            os.chmod(temporario, stat.S_IMODE(os.stat(caminho).st_mode))
+        else:
+            os.chmod(temporario, 0o644)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+class Livro:
+    """Livro dividido em capítulos, cada um salvo em seu próprio arquivo HTML.
+
+    A pasta do livro guarda um manifesto (livro.json) com a lista ordenada de
+    capítulos. Livros antigos, de um único arquivo HTML, são tratados como um
+    livro de um capítulo só, sem manifesto.
+    """
+
+    def __init__(self, pasta, dados, caminho_manifesto=None):
+        self.pasta = pasta
+        self.dados = dados
+        self.caminho_manifesto = caminho_manifesto
+
+    @classmethod
+    def criar(cls, pasta, nome, capa=""):
+        """Cria a estrutura de um livro novo com manifesto e primeiro capítulo"""
+        os.makedirs(os.path.join(pasta, PASTA_CAPITULOS), exist_ok=True)
+
+        dados = {
+            "formato": VERSAO_FORMATO,
+            "nome": nome,
+            "capa": capa,
+            "data_criacao": datetime.now().isoformat(),
+            "capitulos": [],
+        }
+        novo = cls(pasta, dados, os.path.join(pasta, MANIFESTO))
+
+        novo.adicionar_capitulo(nome, "Seu livro começa aqui...")
+        novo.salvar_manifesto()
+        return novo
+
+    @classmethod
+    def abrir(cls, caminho):
+        """Abre um livro a partir do manifesto, da pasta do livro ou de um HTML avulso"""
+        if not os.path.exists(caminho):
+            raise FileNotFoundError(f"Livro não encontrado: {caminho}")
+
+        if os.path.isdir(caminho):
+            legado = os.path.join(caminho, os.path.basename(os.path.normpath(caminho)) + ".html")
+            if not os.path.exists(os.path.join(caminho, MANIFESTO)) and os.path.exists(legado):
+                return cls.de_html(legado)
+            caminho = os.path.join(caminho, MANIFESTO)
+
+        if os.path.basename(caminho) != MANIFESTO:
+            # Um HTML legado que já foi convertido passa a abrir pelo manifesto
+            manifesto = os.path.join(os.path.dirname(caminho), MANIFESTO)
+            if not os.path.exists(manifesto):
+                return cls.de_html(caminho)
+            livro = cls.abrir(manifesto)
+            arquivos = [os.path.normpath(c["arquivo"]) for c in livro.capitulos]
+            if os.path.basename(caminho) not in arquivos:
+                return cls.de_html(caminho)
+            return livro
+
+        with open(caminho, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        return cls(os.path.dirname(caminho), dados, caminho)
+
+    @classmethod
+    def de_html(cls, caminho_html):
+        """Livro legado: um único arquivo HTML tratado como um capítulo"""
+        nome = os.path.splitext(os.path.basename(caminho_html))[0]
+        dados = {
+            "formato": VERSAO_FORMATO,
+            "nome": nome,
+            "capa": "",
+            "capitulos": [{"titulo": nome, "arquivo": os.path.basename(caminho_html)}],
+        }
+        return cls(os.path.dirname(caminho_html), dados)
+
+    @staticmethod
+    def eh_manifesto(caminho):
+        return os.path.basename(caminho) == MANIFESTO
+
+    @property
+    def legado(self):
+        return self.caminho_manifesto is None
+
+    @property
+    def caminho(self):
+        """Caminho que identifica o livro: o manifesto ou o HTML único"""
+        return self.caminho_manifesto or self.caminho_capitulo(0)
+
+    @property
+    def nome(self):
+        return self.dados.get("nome", "")
+
+    @property
+    def capitulos(self):
+        return self.dados["capitulos"]
+
+    def caminho_capitulo(self, indice):
+        return os.path.join(self.pasta, self.capitulos[indice]["arquivo"])
+
+    def diretorio_capitulo(self, indice):
+        """Pasta a partir da qual os caminhos relativos do capítulo são resolvidos"""
+        return os.path.dirname(os.path.abspath(self.caminho_capitulo(indice)))
+
+    def ler_capitulo(self, indice):
+        caminho = self.caminho_capitulo(indice)
+        if not os.path.exists(caminho):
+            return ""
+        with open(caminho, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def salvar_capitulo(self, indice, html):
+        escrever_atomico(self.caminho_capitulo(indice), html)
+
+    def salvar_capitulos(self, conteudos):
+        """Grava vários capítulos de uma vez; conteudos mapeia índice -> HTML"""
+        for indice, html in conteudos.items():
+            self.salvar_capitulo(indice, html)
+
+    def alterar_capitulos(self, capitulos):
+        """Troca a lista de capítulos por uma nova, sem alterar a anterior nem os dados que a contêm.
+
+        Uma gravação do manifesto em outra thread pode estar lendo os dados antigos.
+        """
+        self.dados = {**self.dados, "capitulos": capitulos}
+
+    def adicionar_capitulo(self, titulo, texto=""):
+        """Grava um capítulo novo no final do livro e devolve seu índice; o manifesto fica para quem chamou"""
+        if self.legado:
+            self.converter_para_capitulos()
+
+        numero = len(self.capitulos) + 1
+        arquivo = f"{PASTA_CAPITULOS}/{numero:03d}.html"
+        while os.path.exists(os.path.join(self.pasta, arquivo)):
+            numero += 1
+            arquivo = f"{PASTA_CAPITULOS}/{numero:03d}.html"
+
+        escrever_atomico(os.path.join(self.pasta, arquivo), MODELO_CAPITULO.format(titulo=titulo, texto=texto))
+        self.alterar_capitulos(self.capitulos + [{"titulo": titulo, "arquivo": arquivo}])
+        return len(self.capitulos) - 1
+
+    def renomear_capitulo(self, indice, titulo):
+        capitulos = list(self.capitulos)
+        capitulos[indice] = {**capitulos[indice], "titulo": titulo}
+        self.alterar_capitulos(capitulos)
+
+    def converter_para_capitulos(self):
+        """Passa um livro legado a usar manifesto, mantendo o HTML original como capítulo 1"""
+        os.makedirs(os.path.join(self.pasta, PASTA_CAPITULOS), exist_ok=True)
+        self.caminho_manifesto = os.path.join(self.pasta, MANIFESTO)
+
+    def salvar_manifesto(self):
+        escrever_atomico(self.caminho_manifesto, json.dumps(self.dados, ensure_ascii=False, indent=4))
@@ -0,0 +1,399 @@
+import re
+import unicodedata
+from PySide6.QtWidgets import (
+    QWidget, QHBoxLayout, QLineEdit, QPushButton, QCheckBox, QLabel, QTextEdit
+)
+from PySide6.QtGui import QTextCursor, QColor, QTextCharFormat
+from PySide6.QtCore import QTimer, QPoint
+
+# Espera entre a última tecla e a nova contagem/destaque das ocorrências
+ATRASO_ATUALIZACAO_MS = 120
+
+COR_DESTAQUE = QColor("#fff59d")
+
+# Letras acentuadas do Latim-1 e do Latim Estendido -> letra base, um caractere por um
+TABELA_ACENTOS = {
+    codigo: unicodedata.normalize("NFD", chr(codigo))[0]
+    for codigo in range(0xC0, 0x250)
+    if unicodedata.normalize("NFD", chr(codigo))[0] != chr(codigo)
+}
+
+# Referência a um grupo num texto de substituição (\1, \g<nome>); \\ e os escapes octais ficam de fora
+REFERENCIA_GRUPO = re.compile(r"\\(?:\\|0[0-7]{0,2}|[0-7]{3}|g<([^>]*)>|([1-9][0-9]?))")
+
+
+def sem_acentos(texto):
+    """Remove os acentos mantendo o tamanho do texto (as posições continuam valendo)"""
+    if texto.isascii():
+        return texto
+    return texto.translate(TABELA_ACENTOS)
+
+
+class MotorBusca:
+    """Localiza ocorrências em um QTextDocument percorrendo um bloco (parágrafo) por vez.
+
+    A busca nunca atravessa parágrafos, o que permite examinar só os blocos
+    de interesse (os visíveis, os seguintes ao cursor) sem montar o texto
+    do documento inteiro.
+    """
+
+    def __init__(self, padrao="", regex=False, palavra_inteira=False,
+                 diferenciar_maiusculas=False, diferenciar_acentos=False):
+        self.padrao = padrao
+        self.regex = regex
+        self.palavra_inteira = palavra_inteira
+        self.diferenciar_maiusculas = diferenciar_maiusculas
+        self.diferenciar_acentos = diferenciar_acentos
+        self.erro = None
+        self.expressao = self._compilar()
+
+    def _compilar(self):
+        if not self.padrao:
+            return None
+
+        padrao = self.padrao if self.regex else re.escape(self.padrao)
+        if not self.diferenciar_acentos:
+            padrao = sem_acentos(padrao)
+        if self.palavra_inteira:
+            padrao = rf"\b(?:{padrao})\b"
+
+        flags = 0 if self.diferenciar_maiusculas else re.IGNORECASE
+        try:
+            return re.compile(padrao, flags)
+        except re.error as e:
+            self.erro = str(e)
+            return None
+
+    @property
+    def valido(self):
+        return self.expressao is not None
+
+    def ocorrencias_no_bloco(self, bloco):
+        """Ocorrências de um bloco como (posição no documento, fim, match)"""
+        texto = bloco.text()
+        if not self.diferenciar_acentos:
+            texto = sem_acentos(texto)
+
+        inicio_bloco = bloco.position()
+        for encontrado in self.expressao.finditer(texto):
+            if encontrado.end() == encontrado.start():
+                continue
+            yield inicio_bloco + encontrado.start(), inicio_bloco + encontrado.end(), encontrado
+
+    def ocorrencias(self, documento, primeiro=None, ultimo=None):
+        """Percorre os blocos de `primeiro` até `ultimo` (inclusive), ou o documento todo"""
+        if not self.valido:
+            return
+        bloco = primeiro if primeiro is not None else documento.begin()
+        while bloco.isValid():
+            yield from self.ocorrencias_no_bloco(bloco)
+            if ultimo is not None and bloco == ultimo:
+                break
+            bloco = bloco.next()
+
+    def contar(self, documento):
+        return sum(1 for _ in self.ocorrencias(documento))
+
+    def contar_por_bloco(self, documento, primeiro=None, ultimo=None):
+        """Número de ocorrências de cada bloco de `primeiro` até `ultimo` (inclusive), ou do documento todo"""
+        contagens = []
+        bloco = primeiro if primeiro is not None else documento.begin()
+        while bloco.isValid():
+            contagens.append(sum(1 for _ in self.ocorrencias_no_bloco(bloco)))
+            if ultimo is not None and bloco == ultimo:
+                break
+            bloco = bloco.next()
+        return contagens
+
+    def proxima(self, documento, posicao, para_tras=False):
+        """Primeira ocorrência depois (ou antes) de `posicao`, dando a volta no documento"""
+        if not self.valido:
+            return None
+
+        inicial = documento.findBlock(posicao)
+        if not inicial.isValid():
+            inicial = documento.lastBlock()
+
+        # Primeiro o resto do bloco do cursor
+        candidatas = list(self.ocorrencias_no_bloco(inicial))
+        if para_tras:
+            antes = [c for c in candidatas if c[0] < posicao]
+            if antes:
+                return antes[-1][:2]
+        else:
+            depois = [c for c in candidatas if c[0] >= posicao]
+            if depois:
+                return depois[0][:2]
+
+        # Depois os outros blocos, dando a volta no fim (ou no início) do documento
+        bloco = inicial.previous() if para_tras else inicial.next()
+        while bloco != inicial:
+            if not bloco.isValid():
+                bloco = documento.lastBlock() if para_tras else documento.begin()
+                continue
+            encontradas = list(self.ocorrencias_no_bloco(bloco))
+            if encontradas:
+                return (encontradas[-1] if para_tras else encontradas[0])[:2]
+            bloco = bloco.previous() if para_tras else bloco.next()
+
+        # Por fim, a parte do bloco do cursor que ficou para trás
+        if candidatas:
+            return (candidatas[-1] if para_tras else candidatas[0])[:2]
+        return None
+
+    def substituicao(self, encontrado, texto, original):
+        """Texto que entra no lugar de `encontrado`, com os grupos da regex tirados de `original`.
+
+        Sem diferenciar acentos, a busca roda no texto sem eles; como as
+        posições são as mesmas, os grupos são copiados do texto do bloco.
+        """
+        if not self.regex:
+            return texto
+        if original != encontrado.string:
+            texto = REFERENCIA_GRUPO.sub(lambda referencia: self._grupo_original(referencia, encontrado, original), texto)
+        return encontrado.expand(texto)
+
+    @staticmethod
+    def _grupo_original(referencia, encontrado, original):
+        nome = referencia.group(1) if referencia.group(1) is not None else referencia.group(2)
+        if nome is None:
+            return referencia.group(0)
+        try:
+            inicio, fim = encontrado.span(int(nome) if nome.isdigit() else nome)
+        except IndexError:
+            # Grupo inexistente: fica para o expand acusar o erro
+            return referencia.group(0)
+        if inicio < 0:
+            return ""
+        return original[inicio:fim].replace("\\", "\\\\")
+
+    def substituir_todos(self, documento, texto):
+        """Substitui tudo em um único bloco de edição (um passo de desfazer).
+
+        Os blocos são percorridos de trás para frente, para que cada troca não
+        desloque as posições das ocorrências que ainda faltam.
+        """
+        if not self.valido:
+            return 0
+
+        cursor = QTextCursor(documento)
+        total = 0
+        cursor.beginEditBlock()
+        try:
+            bloco = documento.lastBlock()
+            while bloco.isValid():
+                original = bloco.text()
+                for inicio, fim, encontrado in reversed(list(self.ocorrencias_no_bloco(bloco))):
+                    cursor.setPosition(inicio)
+                    cursor.setPosition(fim, QTextCursor.KeepAnchor)
+                    cursor.insertText(self.substituicao(encontrado, texto, original))
+                    total += 1
+                bloco = bloco.previous()
+        finally:
+            cursor.endEditBlock()
+        return total
+
+
+class BarraLocalizar(QWidget):
+    """Barra de localizar/substituir presa a um QTextEdit.
+
+    Só as ocorrências dos blocos visíveis são destacadas; o destaque é
+    refeito quando o texto rola ou muda, sempre com um pequeno atraso. O
+    total guarda a contagem de cada bloco e, a cada edição, recontam-se só
+    os blocos que mudaram.
+    """
+
+    def __init__(self, editor, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.motor = MotorBusca()
+        self.documento = None
+        # Ocorrências por bloco do documento (None: recontar tudo na próxima atualização)
+        self.contagens = None
+        self.total = 0
+
+        self.campo_busca = QLineEdit()
+        self.campo_busca.setPlaceholderText("Localizar")
+        self.campo_substituir = QLineEdit()
+        self.campo_substituir.setPlaceholderText("Substituir por")
+
+        self.check_regex = QCheckBox("Regex")
+        self.check_palavra = QCheckBox("Palavra inteira")
+        self.check_maiusculas = QCheckBox("Maiúsculas")
+        self.check_acentos = QCheckBox("Acentos")
+
+        self.botao_anterior = QPushButton("Anterior")
+        self.botao_proxima = QPushButton("Próxima")
+        self.botao_substituir = QPushButton("Substituir")
+        self.botao_substituir_todos = QPushButton("Substituir todos")
+        self.botao_fechar = QPushButton("Fechar")
+        self.rotulo_total = QLabel()
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(10, 0, 10, 0)
+        for widget in (self.campo_busca, self.campo_substituir, self.check_regex, self.check_palavra,
+                       self.check_maiusculas, self.check_acentos, self.botao_anterior, self.botao_proxima,
+                       self.botao_substituir, self.botao_substituir_todos, self.rotulo_total, self.botao_fechar):
+            layout.addWidget(widget)
+
+        self.temporizador = QTimer(self)
+        self.temporizador.setSingleShot(True)
+        self.temporizador.setInterval(ATRASO_ATUALIZACAO_MS)
+        self.temporizador.timeout.connect(self.atualizar)
+
+        self.campo_busca.textChanged.connect(self.reconfigurar)
+        for check in (self.check_regex, self.check_palavra, self.check_maiusculas, self.check_acentos):
+            check.toggled.connect(self.reconfigurar)
+        self.campo_busca.returnPressed.connect(self.proxima)
+        self.botao_proxima.clicked.connect(self.proxima)
+        self.botao_anterior.clicked.connect(self.anterior)
+        self.botao_substituir.clicked.connect(self.substituir)
+        self.botao_substituir_todos.clicked.connect(self.substituir_todos)
+        self.botao_fechar.clicked.connect(self.fechar)
+
+        self.editor.verticalScrollBar().valueChanged.connect(self.agendar_destaque)
+        self.editor.textChanged.connect(self.agendar_atualizacao)
+
+        self.hide()
+
+    def acompanhar(self, documento):
+        """Passa a contar as ocorrências de outro documento"""
+        if self.documento is not None:
+            self.documento.contentsChange.disconnect(self.conteudo_alterado)
+        self.documento = documento
+        documento.contentsChange.connect(self.conteudo_alterado)
+        self.contagens = None
+        self.agendar_atualizacao()
+
+    def abrir(self):
+        cursor = self.editor.textCursor()
+        if cursor.hasSelection() and " " not in cursor.selectedText():
+            self.campo_busca.setText(cursor.selectedText())
+        self.show()
+        self.campo_busca.setFocus()
+        self.campo_busca.selectAll()
+        self.reconfigurar()
+
+    def fechar(self):
+        self.hide()
+        self.contagens = None
+        self.editor.setExtraSelections([])
+        self.editor.setFocus()
+
+    def reconfigurar(self):
+        self.motor = MotorBusca(
+            self.campo_busca.text(),
+            regex=self.check_regex.isChecked(),
+            palavra_inteira=self.check_palavra.isChecked(),
+            diferenciar_maiusculas=self.check_maiusculas.isChecked(),
+            diferenciar_acentos=self.check_acentos.isChecked(),
+        )
+        self.contagens = None
+        self.temporizador.start()
+
+    def agendar_atualizacao(self):
+        if self.isVisible():
+            self.temporizador.start()
+
+    def agendar_destaque(self):
+        if self.isVisible():
+            self.destacar_visiveis()
+
+    def atualizar(self):
+        if not self.isVisible():
+            return
+        if self.motor.erro:
+            self.rotulo_total.setText("Regex inválida")
+        elif self.motor.valido:
+            if self.contagens is None:
+                self.contagens = self.motor.contar_por_bloco(self.documento)
+                self.total = sum(self.contagens)
+            self.rotulo_total.setText(f"{self.total} ocorrências")
+        else:
+            self.rotulo_total.setText("")
+        self.destacar_visiveis()
+
+    def conteudo_alterado(self, posicao, removidos, adicionados):
+        """Reconta só os blocos tocados pela edição; os de antes e os de depois dela não mudaram"""
+        if self.contagens is None:
+            return
+        if not self.isVisible() or not self.motor.valido:
+            self.contagens = None
+            return
+
+        documento = self.documento
+        primeiro = documento.findBlock(posicao)
+        ultimo = documento.findBlock(posicao + adicionados)
+        if not ultimo.isValid():
+            ultimo = documento.lastBlock()
+        inicio = primeiro.blockNumber()
+        # Os blocos depois do trecho editado são os mesmos de antes, só deslocados
+        fim_antigo = len(self.contagens) - (documento.blockCount() - 1 - ultimo.blockNumber())
+        if not primeiro.isValid() or fim_antigo <= inicio:
+            self.contagens = None
+            return
+
+        novas = self.motor.contar_por_bloco(documento, primeiro, ultimo)
+        self.total += sum(novas) - sum(self.contagens[inicio:fim_antigo])
+        self.contagens[inicio:fim_antigo] = novas
+
+    def blocos_visiveis(self):
+        viewport = self.editor.viewport()
+        primeiro = self.editor.cursorForPosition(QPoint(0, 0)).block()
+        ultimo = self.editor.cursorForPosition(QPoint(viewport.width() - 1, viewport.height() - 1)).block()
+        return primeiro, ultimo
+
+    def destacar_visiveis(self):
+        if not self.motor.valido:
+            self.editor.setExtraSelections([])
+            return
+
+        formato = QTextCharFormat()
+        formato.setBackground(COR_DESTAQUE)
+        selecoes = []
+        primeiro, ultimo = self.blocos_visiveis()
+        for inicio, fim, _ in self.motor.ocorrencias(self.editor.document(), primeiro, ultimo):
+            selecao = QTextEdit.ExtraSelection()
+            selecao.cursor = QTextCursor(self.editor.document())
+            selecao.cursor.setPosition(inicio)
+            selecao.cursor.setPosition(fim, QTextCursor.KeepAnchor)
+            selecao.format = formato
+            selecoes.append(selecao)
+        self.editor.setExtraSelections(selecoes)
+
+    def ir_para(self, encontrado):
+        if encontrado is None:
+            self.rotulo_total.setText("Nenhuma ocorrência")
+            return
+        cursor = self.editor.textCursor()
+        cursor.setPosition(encontrado[0])
+        cursor.setPosition(encontrado[1], QTextCursor.KeepAnchor)
+        self.editor.setTextCursor(cursor)
+        self.editor.ensureCursorVisible()
+
+    def proxima(self):
+        cursor = self.editor.textCursor()
+        self.ir_para(self.motor.proxima(self.editor.document(), cursor.selectionEnd()))
+
+    def anterior(self):
+        cursor = self.editor.textCursor()
+        self.ir_para(self.motor.proxima(self.editor.document(), cursor.selectionStart(), para_tras=True))
+
+    def substituir(self):
+        """Troca a ocorrência selecionada e avança para a próxima"""
+        cursor = self.editor.textCursor()
+        if cursor.hasSelection():
+            bloco = cursor.block()
+            for inicio, fim, encontrado in self.motor.ocorrencias_no_bloco(bloco) if self.motor.valido else ():
+                if inicio == cursor.selectionStart() and fim == cursor.selectionEnd():
+                    cursor.insertText(self.motor.substituicao(encontrado, self.campo_substituir.text(), bloco.text()))
+                    break
+        self.proxima()
+
+    def substituir_todos(self):
+        self.editor.setUpdatesEnabled(False)
+        try:
+            total = self.motor.substituir_todos(self.editor.document(), self.campo_substituir.text())
+        finally:
+            self.editor.setUpdatesEnabled(True)
+        self.rotulo_total.setText(f"{total} substituições")
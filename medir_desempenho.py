@@ -0,0 +1,246 @@
+"""Mede os caminhos mais usados do editor em livros sintéticos, sem abrir janelas.
+
+Cada tamanho de livro roda em um processo separado (com um HOME
+temporário), para que o pico de memória medido seja só dele:
+
+    python medir_desempenho.py [--paragrafos 1000 10000 100000] [--saida resultados.json]
+    python medir_desempenho.py --baseline base.json       # aponta regressões
+    python medir_desempenho.py --gravar-baseline base.json
+
+A saída em JSON traz, por tamanho, o tempo de cada operação (mediana das
+repetições) e o pico de memória do processo depois de cada uma.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+PARAGRAFOS_PADRAO = (1000, 10000, 100000)
+
+# Uma operação é regressão quando fica mais lenta que a baseline além desta folga
+TOLERANCIA_PADRAO = 0.25
+
+# Abaixo disso o ruído de medida domina; não vale como regressão
+TEMPO_MINIMO_S = 0.005
+
+# Livros já registrados na biblioteca durante a medida da lista de recentes
+LIVROS_NA_BIBLIOTECA = 500
+
+TEXTO = ("Era uma vez uma cidade pequena, cercada de montanhas, onde todos se conheciam "
+         "pelo nome e as notícias corriam mais depressa que o vento da tarde. ")
+
+
+def pico_memoria_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def gerar_livro(pasta, paragrafos):
+    """Livro de um capítulo com títulos, listas e imagens espalhados pelo texto"""
+    from PySide6.QtGui import QImage, QColor
+    import livro
+    import imagens
+
+    novo = livro.Livro.criar(pasta, "Livro de teste")
+
+    imagem = QImage(320, 200, QImage.Format_RGB32)
+    imagem.fill(QColor("#6a8caf"))
+    relativo = os.path.relpath(imagens.armazenar_imagem(pasta, imagem), novo.diretorio_capitulo(0))
+
+    partes = []
+    for i in range(paragrafos):
+        if i % 50 == 0:
+            partes.append(f"<h1>Capítulo {i // 50 + 1}</h1>")
+        elif i % 25 == 0:
+            partes.append(f"<h2>Seção {i // 25}</h2>")
+        elif i % 20 == 0:
+            partes.append(f"<ul><li>{TEXTO[:40]}</li><li>{TEXTO[40:80]}</li></ul>")
+        elif i % 200 == 7:
+            partes.append(f'<p><img src="{relativo}" width="320" height="200" /></p>')
+        else:
+            partes.append(f"<p>{TEXTO}</p>")
+    novo.salvar_capitulo(0, "<html><body>" + "".join(partes) + "</body></html>")
+    return novo
+
+
+def cronometrar(funcao, repeticoes=1):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def medir_livro(paragrafos, repeticoes):
+    """Roda dentro do processo filho: abre o editor e mede cada operação"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, DIRETORIO)
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtGui import QTextCursor
+
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+    import editor
+    import biblioteca
+
+    pasta = os.path.join(os.path.expanduser("~"), "livro")
+    inicio = time.perf_counter()
+    livro_teste = gerar_livro(pasta, paragrafos)
+    resultado = {
+        "paragrafos": paragrafos,
+        "tamanho_html_kb": round(os.path.getsize(livro_teste.caminho_capitulo(0)) / 1024, 1),
+        "geracao_s": round(time.perf_counter() - inicio, 3),
+        "operacoes": {},
+    }
+
+    def anotar(nome, segundos):
+        resultado["operacoes"][nome] = {"segundos": round(segundos, 4), "pico_memoria_mb": pico_memoria_mb()}
+
+    with biblioteca.Biblioteca() as livros:
+        for i in range(LIVROS_NA_BIBLIOTECA - 1):
+            livros.registrar(f"Livro {i}", f"/livros/{i}", f"/livros/{i}/livro.json")
+        livros.registrar(livro_teste.nome, pasta, livro_teste.caminho)
+
+    janela = editor.EditorWindow()
+    app.processEvents()
+
+    def carregar():
+        janela.carregar_arquivo(livro_teste.caminho)
+        app.processEvents()
+    anotar("carregar_arquivo", cronometrar(carregar, repeticoes))
+
+    def selecionar_tudo():
+        cursor = janela.editor.textCursor()
+        cursor.select(QTextCursor.Document)
+        janela.editor.setTextCursor(cursor)
+
+    def negrito():
+        selecionar_tudo()
+        janela.toggle_negrito()
+        app.processEvents()
+    anotar("toggle_negrito", cronometrar(negrito, repeticoes))
+
+    def lista_numerada():
+        selecionar_tudo()
+        janela.aplicar_lista_numerada()
+        app.processEvents()
+    anotar("aplicar_lista_numerada", cronometrar(lista_numerada, 1))
+
+    def salvar():
+        janela.editor.document().setModified(True)
+        janela.salvar_arquivo()
+        janela.autosalvamento.aguardar()
+    anotar("salvar_arquivo", cronometrar(salvar, repeticoes))
+
+    def tocar_recentes():
+        for _ in range(20):
+            janela.atualizar_biblioteca(livro_teste.caminho)
+    anotar("atualizar_biblioteca_x20", cronometrar(tocar_recentes, repeticoes))
+
+    janela.autosalvamento.encerrar()
+    resultado["pico_memoria_mb"] = pico_memoria_mb()
+    return resultado
+
+
+def executar_em_processo(paragrafos, repeticoes):
+    with tempfile.TemporaryDirectory() as home:
+        ambiente = dict(os.environ, HOME=home, USERPROFILE=home)
+        ambiente.setdefault("QT_QPA_PLATFORM", "offscreen")
+        processo = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--interno", str(paragrafos), "--repeticoes", str(repeticoes)],
+            env=ambiente, capture_output=True, text=True
+        )
+    for linha in reversed(processo.stdout.splitlines()):
+        if linha.startswith("{"):
+            return json.loads(linha)
+    raise RuntimeError(f"a medida de {paragrafos} parágrafos falhou:\n{processo.stderr.strip()}")
+
+
+def comparar(resultados, baseline, tolerancia):
+    """Lista de regressões: operações mais lentas que a baseline além da tolerância"""
+    anteriores = {r["paragrafos"]: r for r in baseline.get("resultados", [])}
+    regressoes = []
+    for resultado in resultados:
+        anterior = anteriores.get(resultado["paragrafos"])
+        if not anterior:
+            continue
+        for nome, medida in resultado["operacoes"].items():
+            antes = anterior["operacoes"].get(nome)
+            if not antes:
+                continue
+            agora, referencia = medida["segundos"], antes["segundos"]
+            if agora > TEMPO_MINIMO_S and agora > referencia * (1 + tolerancia):
+                regressoes.append({
+                    "paragrafos": resultado["paragrafos"], "operacao": nome,
+                    "baseline_s": referencia, "atual_s": agora,
+                    "variacao": round(agora / referencia - 1, 3) if referencia else None,
+                })
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Medidas de desempenho do Editor A5")
+    parser.add_argument("--paragrafos", type=int, nargs="+", default=list(PARAGRAFOS_PADRAO))
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", help="grava os resultados neste arquivo JSON")
+    parser.add_argument("--baseline", help="compara com uma medida anterior e falha se houver regressão")
+    parser.add_argument("--gravar-baseline", metavar="ARQUIVO", help="grava os resultados como nova baseline")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO)
+    parser.add_argument("--interno", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.interno:
+        print(json.dumps(medir_livro(args.interno, args.repeticoes)))
+        return 0
+
+    resultados = []
+    for paragrafos in args.paragrafos:
+        print(f"Medindo {paragrafos} parágrafos...", file=sys.stderr)
+        resultado = executar_em_processo(paragrafos, args.repeticoes)
+        resultados.append(resultado)
+        for nome, medida in resultado["operacoes"].items():
+            print(f"  {nome:26} {medida['segundos'] * 1000:10.1f} ms   pico {medida['pico_memoria_mb']} MB",
+                  file=sys.stderr)
+
+    relatorio = {
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "resultados": resultados,
+    }
+
+    codigo = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressoes = comparar(resultados, json.load(f), args.tolerancia)
+        relatorio["regressoes"] = regressoes
+        for regressao in regressoes:
+            print(f"REGRESSÃO: {regressao['operacao']} com {regressao['paragrafos']} parágrafos: "
+                  f"{regressao['baseline_s']:.4f}s -> {regressao['atual_s']:.4f}s", file=sys.stderr)
+        codigo = 1 if regressoes else 0
+
+    texto = json.dumps(relatorio, indent=4, ensure_ascii=False)
+    for destino in (args.saida, args.gravar_baseline):
+        if destino:
+            with open(destino, "w", encoding="utf-8") as f:
+                f.write(texto + "\n")
+    if not args.saida:
+        print(texto)
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
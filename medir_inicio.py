@@ -0,0 +1,109 @@
+"""Mede o tempo até a primeira janela aparecer, em processos novos.
+
+Cada rodada abre um interpretador limpo (como o escritor abrindo o
+programa), importa a tela inicial e espera o primeiro evento de pintura.
+Compara os formulários compilados com o QUiLoader:
+
+    python medir_inicio.py [--rodadas 10] [--janela welcome|editor]
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+# Roda dentro do processo medido; `inicio` é o relógio tomado antes de qualquer import
+SCRIPT_RODADA = r"""
+import time
+inicio = time.perf_counter()
+import os, sys, json
+sys.path.insert(0, {diretorio!r})
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QObject, QEvent
+
+app = QApplication(sys.argv)
+pronto = time.perf_counter()
+
+class Pintura(QObject):
+    def eventFilter(self, objeto, evento):
+        if evento.type() == QEvent.Paint:
+            print(json.dumps({{"qt": pronto - inicio, "janela": time.perf_counter() - inicio}}))
+            sys.stdout.flush()
+            os._exit(0)
+        return False
+
+filtro = Pintura()
+app.installEventFilter(filtro)
+
+if {janela!r} == "editor":
+    import editor
+    janela = editor.EditorWindow()
+else:
+    import welcome
+    janela = welcome.WelcomeWindow()
+app.exec()
+"""
+
+
+def rodada(janela, quiloader):
+    ambiente = dict(os.environ)
+    ambiente.setdefault("QT_QPA_PLATFORM", "offscreen")
+    ambiente["EDITORA5_UI_LOADER"] = "1" if quiloader else "0"
+
+    script = SCRIPT_RODADA.format(diretorio=DIRETORIO, janela=janela)
+    resultado = subprocess.run([sys.executable, "-c", script], env=ambiente, capture_output=True,
+                               text=True, timeout=60)
+    for linha in reversed(resultado.stdout.splitlines()):
+        if linha.startswith("{"):
+            return json.loads(linha)
+    raise RuntimeError(resultado.stderr.strip() or "a janela não chegou a ser pintada")
+
+
+def medir(janela, rodadas, quiloader):
+    rodada(janela, quiloader)  # aquece o cache de disco e gera os formulários compilados
+    tempos = [rodada(janela, quiloader) for _ in range(rodadas)]
+    janelas = [t["janela"] * 1000 for t in tempos]
+    return {
+        "carregador": "QUiLoader" if quiloader else "compilado",
+        "janela": janela,
+        "rodadas": rodadas,
+        "qt_ms": statistics.median(t["qt"] * 1000 for t in tempos),
+        "mediana_ms": statistics.median(janelas),
+        "minimo_ms": min(janelas),
+        "maximo_ms": max(janelas),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tempo até a primeira janela do Editor A5")
+    parser.add_argument("--rodadas", type=int, default=10)
+    parser.add_argument("--janela", choices=("welcome", "editor"), default="welcome")
+    parser.add_argument("--json", action="store_true", help="saída em JSON")
+    args = parser.parse_args(argv)
+
+    # Um HOME temporário isola a medida da biblioteca do usuário
+    ambiente_original = os.environ.get("HOME")
+    with tempfile.TemporaryDirectory() as home:
+        os.environ["HOME"] = home
+        try:
+            resultados = [medir(args.janela, args.rodadas, quiloader) for quiloader in (False, True)]
+        finally:
+            if ambiente_original is not None:
+                os.environ["HOME"] = ambiente_original
+
+    if args.json:
+        print(json.dumps(resultados, indent=4))
+        return
+
+    for r in resultados:
+        print(f"{r['janela']:8} {r['carregador']:10} mediana {r['mediana_ms']:7.1f} ms  "
+              f"(mín {r['minimo_ms']:.1f}, máx {r['maximo_ms']:.1f}; Qt pronto em {r['qt_ms']:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
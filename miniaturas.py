@@ -0,0 +1,92 @@
+import os
+import hashlib
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QSize, Qt, Signal
+from PySide6.QtGui import QImage, QImageReader
+from biblioteca import diretorio_central
+
+TAMANHO_MINIATURA = QSize(120, 170)
+
+
+def diretorio_cache():
+    return os.path.join(diretorio_central(), "miniaturas")
+
+
+def chave_cache(caminho, info, tamanho):
+    """A chave muda sempre que a imagem de origem muda de conteúdo (mtime/tamanho)"""
+    texto = f"{os.path.abspath(caminho)}|{info.st_mtime_ns}|{info.st_size}|{tamanho.width()}x{tamanho.height()}"
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+def gerar_miniatura(caminho, tamanho=TAMANHO_MINIATURA):
+    """Devolve a miniatura da imagem, lendo do cache em disco ou decodificando já reduzida"""
+    info = os.stat(caminho)
+    cache = os.path.join(diretorio_cache(), chave_cache(caminho, info, tamanho) + ".png")
+
+    if os.path.exists(cache):
+        imagem = QImage(cache)
+        if not imagem.isNull():
+            return imagem
+
+    leitor = QImageReader(caminho)
+    leitor.setAutoTransform(True)
+    original = leitor.size()
+    if original.isValid():
+        # Formatos como JPEG decodificam direto na resolução reduzida
+        leitor.setScaledSize(original.scaled(tamanho, Qt.KeepAspectRatio))
+    imagem = leitor.read()
+    if imagem.isNull():
+        raise ValueError(leitor.errorString())
+
+    if imagem.width() > tamanho.width() or imagem.height() > tamanho.height():
+        imagem = imagem.scaled(tamanho, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    os.makedirs(diretorio_cache(), exist_ok=True)
+    temporario = f"{cache}.{os.getpid()}.tmp"
+    if imagem.save(temporario, "PNG"):
+        os.replace(temporario, cache)
+    return imagem
+
+
+class _TarefaMiniatura(QRunnable):
+    def __init__(self, carregador, caminho):
+        super().__init__()
+        self.carregador = carregador
+        self.caminho = caminho
+
+    def run(self):
+        try:
+            imagem = gerar_miniatura(self.caminho, self.carregador.tamanho)
+        except Exception as e:
+            print(f"Erro ao gerar miniatura de {self.caminho}: {e}")
+            return
+        self.carregador.pronta.emit(self.caminho, imagem)
+
+
+class CarregadorMiniaturas(QObject):
+    """Gera miniaturas de capas em um pool de threads e avisa pelo sinal `pronta`.
+
+    O sinal leva um QImage; a conversão para QPixmap fica na thread da
+    interface, que é a única onde QPixmap pode ser usado.
+    """
+
+    pronta = Signal(str, QImage)
+
+    def __init__(self, tamanho=TAMANHO_MINIATURA, parent=None):
+        super().__init__(parent)
+        self.tamanho = tamanho
+        self.pool = QThreadPool(self)
+        self.pendentes = set()
+        self.pronta.connect(self._concluida)
+
+    def _concluida(self, caminho, imagem):
+        self.pendentes.discard(caminho)
+
+    def solicitar(self, caminho):
+        if not caminho or caminho in self.pendentes:
+            return
+        self.pendentes.add(caminho)
+        self.pool.start(_TarefaMiniatura(self, caminho))
+
+    def cancelar(self):
+        self.pool.clear()
+        self.pendentes.clear()
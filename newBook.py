@@ -1,25 +1,22 @@
 import os
-import json
 from datetime import datetime
 from PySide6.QtWidgets import QDialog, QFileDialog, QMessageBox
-from PySide6.QtUiTools import QUiLoader
-from PySide6.QtCore import QFile, QObject
-import editor
+from PySide6.QtCore import QObject
+import formularios
+import livro
+import biblioteca
 
 class NewBookDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Novo Livro")
 
-        loader = QUiLoader()
-        ui_file = QFile("newBook.ui")
-        if not ui_file.open(QFile.ReadOnly):
-            print(f"Erro ao abrir o arquivo newBook.ui: {ui_file.errorString()}")
+        try:
+            self.ui = formularios.carregar_formulario("newBook")
+        except Exception as e:
+            print(f"Erro ao abrir o arquivo newBook.ui: {e}")
             return
 
-        self.ui = loader.load(ui_file)
-        ui_file.close()
-
         if not self.ui:
             print("Erro ao carregar a interface do usuário")
             return
@@ -73,50 +70,15 @@ class NewBookDialog(QDialog):
         book_dir = os.path.join(self.selected_path, nome)
         os.makedirs(book_dir, exist_ok=True)
 
-        html_path = os.path.join(book_dir, f"{nome}.html")
-        with open(html_path, "w", encoding="utf-8") as f:
-            f.write(f"""<!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>{nome}</title>
-    </head>
-    <body>
-        <h1>{nome}</h1>
-        <p>Seu livro começa aqui...</p>
-    </body>
-    </html>""")
-
-        home_dir = os.path.expanduser("~")
-        central_dir = os.path.join(home_dir, "EditorA5")
-        os.makedirs(central_dir, exist_ok=True)
-
-        central_json_path = os.path.join(central_dir, "livros_recentes.json")
-
-        livros = []
-        if os.path.exists(central_json_path):
-            try:
-                with open(central_json_path, "r", encoding="utf-8") as f:
-                    livros = json.load(f)
-            except json.JSONDecodeError:
-                livros = []
+        novo = livro.Livro.criar(book_dir, nome, self.cover_path or "")
+        html_path = novo.caminho_manifesto
 
         current_time = datetime.now()
 
-        novo_livro = {
-            "nome": nome,
-            "pasta": book_dir,
-            "html": html_path,
-            "capa": self.cover_path or "",
-            "data_criacao": current_time.isoformat()
-        }
-
-        livros = [livro for livro in livros if livro.get("pasta") != book_dir]
-
-        livros.insert(0, novo_livro)
-
-        with open(central_json_path, "w", encoding="utf-8") as f:
-            json.dump(livros, f, ensure_ascii=False, indent=4)
+        with biblioteca.Biblioteca() as livros:
+            livros.registrar(nome, book_dir, html_path, self.cover_path or "", current_time.isoformat())
+            # Livros que aparecerem nesta pasta por outros meios também vão para a tela inicial
+            livros.adicionar_raiz(self.selected_path)
 
         QMessageBox.information(self, "Sucesso", "Livro salvo com sucesso!")
 
@@ -134,7 +96,7 @@ def openBook():
 
     if result == QDialog.Accepted and hasattr(dialog, 'html_path'):
         from editor import abrir_editor
-        editor_window = abrir_editor(dialog.html_path)
+        abrir_editor(dialog.html_path)
         return dialog
 
     return dialog
@@ -0,0 +1,502 @@
+import os
+import re
+import sys
+import queue
+import threading
+from collections import OrderedDict
+from PySide6.QtCore import QObject, QTimer, QPoint, Signal
+from PySide6.QtGui import QSyntaxHighlighter, QTextBlockUserData, QTextCharFormat, QColor, QTextCursor
+from biblioteca import diretorio_central
+from livro import escrever_atomico
+from localizar import sem_acentos
+
+# Um dicionário de cada língua, o primeiro encontrado de cada grupo
+IDIOMAS = (("pt_BR", "pt_PT"), ("en_US", "en_GB"))
+
+# Lista de palavras aceitas em cada livro, dentro da pasta dele
+ARQUIVO_PALAVRAS_LIVRO = "palavras.txt"
+
+# Espera depois da última tecla (ou rolagem) antes de pedir a verificação
+ATRASO_VERIFICACAO_MS = 250
+
+# Quantos textos de parágrafo já verificados ficam em memória
+LIMITE_RESULTADOS = 20000
+
+LIMITE_SUGESTOES = 8
+
+PADRAO_PALAVRA = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*")
+
+
+def diretorios_dicionarios():
+    pastas = [os.path.join(diretorio_central(), "dicionarios")]
+    if sys.platform == "darwin":
+        pastas += [os.path.expanduser("~/Library/Spelling"), "/Library/Spelling"]
+    pastas += ["/usr/share/hunspell", "/usr/share/myspell", "/usr/share/myspell/dicts"]
+    return pastas
+
+
+def encontrar_dicionarios():
+    """Caminhos (aff, dic) dos dicionários disponíveis, um por língua"""
+    encontrados = []
+    for grupo in IDIOMAS:
+        for idioma in grupo:
+            achado = next((
+                (os.path.join(pasta, idioma + ".aff"), os.path.join(pasta, idioma + ".dic"))
+                for pasta in diretorios_dicionarios()
+                if os.path.exists(os.path.join(pasta, idioma + ".dic"))
+                and os.path.exists(os.path.join(pasta, idioma + ".aff"))
+            ), None)
+            if achado:
+                encontrados.append(achado)
+                break
+    return encontrados
+
+
+def condicao_regex(condicao, sufixo):
+    """Converte a condição de uma regra de afixo (ex.: "[^aeiou]y") em regex"""
+    if condicao in (".", ""):
+        return None
+    return re.compile(condicao + "$" if sufixo else "^" + condicao)
+
+
+class RegraAfixo:
+    __slots__ = ("flag", "remover", "acrescentar", "condicao", "combinavel", "sufixo")
+
+    def __init__(self, flag, remover, acrescentar, condicao, combinavel, sufixo):
+        self.flag = flag
+        self.remover = remover
+        self.acrescentar = acrescentar
+        self.condicao = condicao_regex(condicao, sufixo)
+        self.combinavel = combinavel
+        self.sufixo = sufixo
+
+    def radical(self, palavra):
+        """O radical de `palavra` por esta regra, ou None se ela não se aplica"""
+        if self.sufixo:
+            radical = palavra[:len(palavra) - len(self.acrescentar)] + self.remover
+        else:
+            radical = self.remover + palavra[len(self.acrescentar):]
+        if not radical or (self.condicao and not self.condicao.search(radical)):
+            return None
+        return radical
+
+
+class Dicionario:
+    """Leitor de dicionários no formato do Hunspell (.aff + .dic).
+
+    As formas flexionadas não são expandidas: uma palavra é aceita se ela
+    mesma, ou o radical obtido desfazendo um prefixo e/ou um sufixo, está
+    no .dic com a marca da regra. Cobre o que os dicionários de português e
+    inglês usam no dia a dia (PFX/SFX, AF, REP, TRY, NEEDAFFIX,
+    FORBIDDENWORD); palavras compostas e sufixos em dois níveis ficam de fora.
+    """
+
+    def __init__(self, caminho_aff, caminho_dic):
+        self.tipo_flag = "char"
+        self.aliases = []
+        self.substituicoes = []
+        self.tentativas = ""
+        self.flag_precisa_afixo = None
+        self.flag_proibida = None
+        self.prefixos = {}
+        self.sufixos = {}
+        self.palavras = {}
+
+        codificacao = self._codificacao(caminho_aff)
+        self._ler_aff(caminho_aff, codificacao)
+        self._ler_dic(caminho_dic, codificacao)
+
+    @staticmethod
+    def _codificacao(caminho_aff):
+        with open(caminho_aff, "rb") as f:
+            for linha in f:
+                if linha.startswith(b"SET "):
+                    codificacao = linha.split()[1].decode("ascii").lower()
+                    return {"microsoft-cp1251": "cp1251"}.get(codificacao, codificacao)
+        return "utf-8"
+
+    def _flags(self, texto):
+        if self.aliases and texto.isdigit():
+            indice = int(texto) - 1
+            return self.aliases[indice] if 0 <= indice < len(self.aliases) else frozenset()
+        if self.tipo_flag == "long":
+            return frozenset(texto[i:i + 2] for i in range(0, len(texto), 2))
+        if self.tipo_flag == "num":
+            return frozenset(parte for parte in texto.split(",") if parte)
+        return frozenset(texto)
+
+    def _ler_aff(self, caminho, codificacao):
+        with open(caminho, encoding=codificacao, errors="replace") as f:
+            linhas = [linha.split() for linha in f if linha.strip() and not linha.startswith("#")]
+
+        aliases_brutos = []
+        for partes in linhas:
+            chave = partes[0]
+            if chave == "FLAG" and len(partes) > 1:
+                self.tipo_flag = partes[1].lower().replace("utf-8", "char")
+            elif chave == "AF" and len(partes) > 1 and not partes[1].isdigit():
+                aliases_brutos.append(partes[1])
+            elif chave == "TRY" and len(partes) > 1:
+                self.tentativas = partes[1]
+            elif chave == "REP" and len(partes) > 2:
+                self.substituicoes.append((partes[1].replace("_", " "), partes[2].replace("_", " ")))
+            elif chave == "NEEDAFFIX" and len(partes) > 1:
+                self.flag_precisa_afixo = partes[1]
+            elif chave == "FORBIDDENWORD" and len(partes) > 1:
+                self.flag_proibida = partes[1]
+        # As flags dos aliases dependem de FLAG, que pode vir depois do AF no arquivo
+        self.aliases = [self._flags(texto) for texto in aliases_brutos]
+
+        combinaveis = {}
+        for partes in linhas:
+            if partes[0] not in ("PFX", "SFX") or len(partes) < 4:
+                continue
+            sufixo = partes[0] == "SFX"
+            flag = partes[1]
+            if len(partes) == 4 and partes[3].isdigit() and partes[2] in ("Y", "N"):
+                combinaveis[(sufixo, flag)] = partes[2] == "Y"
+                continue
+
+            remover = "" if partes[2] == "0" else partes[2]
+            acrescentar = partes[3].split("/")[0]
+            acrescentar = "" if acrescentar == "0" else acrescentar
+            condicao = partes[4] if len(partes) > 4 else "."
+            regra = RegraAfixo(flag, remover, acrescentar, condicao,
+                               combinaveis.get((sufixo, flag), False), sufixo)
+            # Indexadas pelo texto acrescentado: a busca só olha as regras que combinam com a palavra
+            (self.sufixos if sufixo else self.prefixos).setdefault(acrescentar, []).append(regra)
+
+    def _ler_dic(self, caminho, codificacao):
+        with open(caminho, encoding=codificacao, errors="replace") as f:
+            next(f, None)  # a primeira linha é só a contagem
+            for linha in f:
+                entrada = linha.split("\t")[0].split(" ")[0].strip()
+                if not entrada:
+                    continue
+                palavra, _, flags = entrada.partition("/")
+                anteriores = self.palavras.get(palavra)
+                flags = self._flags(flags) if flags else frozenset()
+                self.palavras[palavra] = anteriores | flags if anteriores else flags
+
+    def _tem_radical(self, radical, flag, outra_flag=None):
+        flags = self.palavras.get(radical)
+        if flags is None or flag not in flags or (outra_flag and outra_flag not in flags):
+            return False
+        return self.flag_proibida not in flags
+
+    def _por_sufixo(self, palavra, flag_prefixo=None):
+        for tamanho in range(len(palavra) + 1):
+            for regra in self.sufixos.get(palavra[len(palavra) - tamanho:] if tamanho else "", ()):
+                if flag_prefixo and not regra.combinavel:
+                    continue
+                radical = regra.radical(palavra)
+                if radical and self._tem_radical(radical, regra.flag, flag_prefixo):
+                    return True
+        return False
+
+    def _conhece_exata(self, palavra):
+        flags = self.palavras.get(palavra)
+        if flags is not None:
+            if self.flag_proibida in flags:
+                return False
+            if self.flag_precisa_afixo not in flags:
+                return True
+
+        if self._por_sufixo(palavra):
+            return True
+
+        for tamanho in range(1, len(palavra) + 1):
+            for regra in self.prefixos.get(palavra[:tamanho], ()):
+                radical = regra.radical(palavra)
+                if not radical:
+                    continue
+                if self._tem_radical(radical, regra.flag):
+                    return True
+                if regra.combinavel and self._por_sufixo(radical, regra.flag):
+                    return True
+        return False
+
+    def conhece(self, palavra):
+        palavra = palavra.replace("’", "'")
+        if self._conhece_exata(palavra):
+            return True
+        # "Casa" no início da frase e "CASA" em títulos valem como "casa"
+        if palavra[:1].isupper() and (palavra[1:].islower() or palavra.isupper()):
+            minuscula = palavra.lower()
+            if self._conhece_exata(minuscula):
+                return True
+            if palavra.isupper() and self._conhece_exata(palavra.capitalize()):
+                return True
+        return False
+
+    def candidatos(self, palavra):
+        """Variações próximas de `palavra`: REP, acentos, e uma edição com as letras de TRY"""
+        vistos = set()
+        for de, para in self.substituicoes:
+            inicio = palavra.find(de)
+            while inicio >= 0:
+                yield palavra[:inicio] + para + palavra[inicio + len(de):]
+                inicio = palavra.find(de, inicio + 1)
+
+        letras = self.tentativas or "esianrtolcdugmphbyfvkwzqjxç"
+        partes = [(palavra[:i], palavra[i:]) for i in range(len(palavra) + 1)]
+        for esquerda, direita in partes:
+            if direita:
+                yield esquerda + direita[1:]
+                for letra in letras:
+                    if letra != direita[0]:
+                        yield esquerda + letra + direita[1:]
+            if len(direita) > 1:
+                yield esquerda + direita[1] + direita[0] + direita[2:]
+            for letra in letras:
+                yield esquerda + letra + direita
+
+    def sugestoes(self, palavra, limite=LIMITE_SUGESTOES):
+        encontradas = []
+        base = sem_acentos(palavra.lower())
+        for candidato in self.candidatos(palavra):
+            if candidato not in encontradas and candidato != palavra and self.conhece(candidato):
+                encontradas.append(candidato)
+        # Quem só difere em acentos (a falha mais comum em português) vem primeiro
+        encontradas.sort(key=lambda c: sem_acentos(c.lower()) != base)
+        return encontradas[:limite]
+
+
+_dicionarios = None
+_trava_dicionarios = threading.Lock()
+
+
+def carregar_dicionarios():
+    """Os dicionários do sistema, lidos uma única vez por processo"""
+    global _dicionarios
+    with _trava_dicionarios:
+        if _dicionarios is None:
+            dicionarios = []
+            for aff, dic in encontrar_dicionarios():
+                try:
+                    dicionarios.append(Dicionario(aff, dic))
+                except Exception as e:
+                    print(f"Erro ao ler o dicionário {dic}: {e}")
+            _dicionarios = dicionarios
+        return _dicionarios
+
+
+def ler_palavras_livro(pasta):
+    caminho = os.path.join(pasta, ARQUIVO_PALAVRAS_LIVRO)
+    if not os.path.exists(caminho):
+        return set()
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            return {linha.strip() for linha in f if linha.strip()}
+    except OSError as e:
+        print(f"Erro ao ler {caminho}: {e}")
+        return set()
+
+
+def salvar_palavras_livro(pasta, palavras):
+    escrever_atomico(os.path.join(pasta, ARQUIVO_PALAVRAS_LIVRO), "\n".join(sorted(palavras)) + "\n")
+
+
+class Verificador(QObject):
+    """Verifica parágrafos em uma thread de trabalho e devolve a posição dos erros.
+
+    Cada pedido é (chave, texto); a resposta chega pelo sinal `verificados`
+    como uma lista de (chave, [(início, tamanho), ...]).
+    """
+
+    verificados = Signal(list)
+    pronto = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.dicionarios = []
+        self.palavras_livro = frozenset()
+        self.ignoradas = set()
+        self.fila = queue.Queue()
+        self.trabalhador = threading.Thread(target=self._trabalhar, name="ortografia", daemon=True)
+        self.trabalhador.start()
+
+    @property
+    def disponivel(self):
+        return bool(self.dicionarios)
+
+    def pedir(self, pedidos):
+        if pedidos:
+            self.fila.put(list(pedidos))
+
+    def encerrar(self):
+        self.fila.put(None)
+
+    def palavra_correta(self, palavra):
+        if palavra in self.palavras_livro or palavra in self.ignoradas:
+            return True
+        if any(dicionario.conhece(palavra) for dicionario in self.dicionarios):
+            return True
+        # Compostos com hífen ("disse-lhe") valem se cada parte vale
+        if "-" in palavra:
+            return all(self.palavra_correta(parte) for parte in palavra.split("-") if parte)
+        return False
+
+    def erros(self, texto):
+        return [(encontrada.start(), encontrada.end() - encontrada.start())
+                for encontrada in PADRAO_PALAVRA.finditer(texto)
+                if not self.palavra_correta(encontrada.group())]
+
+    def sugestoes(self, palavra):
+        sugestoes = []
+        for dicionario in self.dicionarios:
+            for sugestao in dicionario.sugestoes(palavra):
+                if sugestao not in sugestoes:
+                    sugestoes.append(sugestao)
+        return sugestoes[:LIMITE_SUGESTOES]
+
+    def _trabalhar(self):
+        self.dicionarios = carregar_dicionarios()
+        self.pronto.emit()
+        while True:
+            pedidos = self.fila.get()
+            if pedidos is None:
+                return
+            if not self.dicionarios:
+                continue
+            try:
+                self.verificados.emit([(chave, self.erros(texto)) for chave, texto in pedidos])
+            except Exception as e:
+                print(f"Erro na verificação ortográfica: {e}")
+
+
+class MarcaVerificacao(QTextBlockUserData):
+    """Guarda no bloco qual texto teve o resultado aplicado.
+
+    Usar o estado do bloco (setCurrentBlockState) faria o QSyntaxHighlighter
+    realçar em cascata os blocos seguintes a cada mudança de estado.
+    """
+
+    def __init__(self, chave=None):
+        super().__init__()
+        self.chave = chave
+
+
+def verificado(bloco):
+    marca = bloco.userData()
+    return marca is not None and marca.chave is not None and marca.chave == hash(bloco.text())
+
+
+class RealceOrtografico(QSyntaxHighlighter):
+    """Sublinha as palavras desconhecidas usando os resultados guardados por texto de parágrafo.
+
+    O realce nunca verifica nada na thread da interface: um parágrafo sem
+    resultado em cache vira pedido para o Verificador, e só os parágrafos
+    visíveis ou editados nesta sessão são pedidos. Quando as respostas
+    chegam, só os blocos visíveis são realçados de novo.
+    """
+
+    def __init__(self, editor, verificador):
+        super().__init__(editor)
+        self.editor = editor
+        self.verificador = verificador
+        self.resultados = OrderedDict()
+        self.pedidos = {}
+        self.revisao_base = 0
+
+        self.formato_erro = QTextCharFormat()
+        self.formato_erro.setUnderlineStyle(QTextCharFormat.SpellCheckUnderline)
+        self.formato_erro.setUnderlineColor(QColor("#d32f2f"))
+
+        self.temporizador = QTimer(self)
+        self.temporizador.setSingleShot(True)
+        self.temporizador.setInterval(ATRASO_VERIFICACAO_MS)
+        self.temporizador.timeout.connect(self.enviar_pedidos)
+
+        self.verificador.verificados.connect(self.receber)
+        self.verificador.pronto.connect(self.agendar)
+        self.editor.verticalScrollBar().valueChanged.connect(self.agendar)
+
+    def agendar(self, *_):
+        # Sem argumentos: valueChanged(int) ligado direto a start() viraria o intervalo do timer
+        self.temporizador.start()
+
+    def acompanhar(self, documento):
+        """Passa a realçar outro documento; só o que for editado a partir daqui conta como recente"""
+        self.pedidos.clear()
+        self.revisao_base = documento.revision()
+        self.setDocument(documento)
+        self.temporizador.start()
+
+    def highlightBlock(self, texto):
+        if not texto.strip():
+            return
+
+        chave = hash(texto)
+        erros = self.resultados.get(chave)
+        self.setCurrentBlockUserData(MarcaVerificacao(chave if erros is not None else None))
+        if erros is None:
+            if self.currentBlock().revision() > self.revisao_base:
+                self.pedidos[self.currentBlock().blockNumber()] = (chave, texto)
+                self.temporizador.start()
+            return
+
+        for inicio, tamanho in erros:
+            self.setFormat(inicio, tamanho, self.formato_erro)
+
+    def blocos_visiveis(self):
+        viewport = self.editor.viewport()
+        bloco = self.editor.cursorForPosition(QPoint(0, 0)).block()
+        ultimo = self.editor.cursorForPosition(QPoint(viewport.width() - 1, viewport.height() - 1)).block()
+        while bloco.isValid():
+            yield bloco
+            if bloco == ultimo:
+                break
+            bloco = bloco.next()
+
+    def enviar_pedidos(self):
+        if self.document() is None or not self.verificador.disponivel:
+            return
+        pedidos = dict(self.pedidos)
+        self.pedidos.clear()
+        for bloco in self.blocos_visiveis():
+            texto = bloco.text()
+            if not texto.strip() or verificado(bloco):
+                continue
+            chave = hash(texto)
+            if chave in self.resultados:
+                self.rehighlightBlock(bloco)
+            else:
+                pedidos[bloco.blockNumber()] = (chave, texto)
+        self.verificador.pedir(pedidos.values())
+
+    def receber(self, verificados):
+        for chave, erros in verificados:
+            self.resultados[chave] = erros
+            self.resultados.move_to_end(chave)
+        while len(self.resultados) > LIMITE_RESULTADOS:
+            self.resultados.popitem(last=False)
+
+        if self.document() is None:
+            return
+        chaves = {chave for chave, _ in verificados}
+        bloco_cursor = self.editor.textCursor().block()
+        for bloco in [bloco_cursor, *self.blocos_visiveis()]:
+            if hash(bloco.text()) in chaves and not verificado(bloco):
+                self.rehighlightBlock(bloco)
+
+    def invalidar(self):
+        """Esquece os resultados (a lista de palavras mudou) e verifica de novo o que está à vista"""
+        self.resultados.clear()
+        # Um realce completo só com consultas ao cache (vazio): tira os sublinhados antigos de todo o documento
+        self.rehighlight()
+        self.temporizador.start()
+
+    def palavra_em(self, posicao_tela):
+        """(cursor com a palavra selecionada, palavra) se houver um erro sob o ponto, senão None"""
+        cursor = self.editor.cursorForPosition(posicao_tela)
+        bloco = cursor.block()
+        erros = self.resultados.get(hash(bloco.text())) or ()
+        coluna = cursor.position() - bloco.position()
+        for inicio, tamanho in erros:
+            if inicio <= coluna <= inicio + tamanho:
+                selecao = QTextCursor(bloco)
+                selecao.setPosition(bloco.position() + inicio)
+                selecao.setPosition(bloco.position() + inicio + tamanho, QTextCursor.KeepAnchor)
+                return selecao, selecao.selectedText()
+        return None
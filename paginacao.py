@@ -0,0 +1,604 @@
+import time
+from bisect import bisect_left, bisect_right
+from PySide6.QtCore import QObject, QTimer, QPointF, QRectF, Qt, Signal, QCoreApplication
+from PySide6.QtGui import (
+    QAbstractTextDocumentLayout, QTextCharFormat, QTextCursor, QTextFormat, QPainter, QColor, QPalette, QFont
+)
+from PySide6.QtWidgets import (
+    QAbstractScrollArea, QApplication, QTextEdit, QDialog, QFormLayout, QDoubleSpinBox, QLineEdit, QCheckBox, QDialogButtonBox
+)
+import estrutura
+import desfazer
+
+A5_MM = (148.0, 210.0)
+
+CONFIGURACAO_PADRAO = {
+    # superior, inferior, esquerda, direita
+    "margens_mm": [20.0, 20.0, 15.0, 15.0],
+    "cabecalho": "{livro}",
+    "numeros": True,
+}
+
+# Espaço cinza entre as páginas e em volta delas
+ESPACO_PAGINAS = 24
+
+# Tempo de cada volta da paginação em segundo plano
+ORCAMENTO_PAGINACAO_S = 0.015
+
+QUEBRA_ANTES = QTextFormat.PageBreak_AlwaysBefore
+QUEBRA_DEPOIS = QTextFormat.PageBreak_AlwaysAfter
+
+
+def configuracao_do_livro(livro_aberto):
+    """Configuração de página do livro (margens, cabeçalho, números), com os valores padrão no que faltar"""
+    configuracao = dict(CONFIGURACAO_PADRAO)
+    if livro_aberto is not None:
+        configuracao.update(livro_aberto.dados.get("pagina", {}))
+    return configuracao
+
+
+def mm_para_px(mm, dpi):
+    return mm / 25.4 * dpi
+
+
+def topo_da_pagina(pagina):
+    return pagina[0]
+
+
+def bloco_da_pagina(pagina):
+    return pagina[1]
+
+
+class Paginacao(QObject):
+    """Quebras de página A5 de um QTextDocument, sobre o layout contínuo do editor.
+
+    Cada página é guardada como (y do topo, número do bloco, deslocamento
+    do topo dentro do bloco) e as quebras caem sempre entre linhas. Uma
+    edição descarta só as páginas a partir da que contém o primeiro bloco
+    alterado; a paginação recomeça dali e para assim que uma quebra volta a
+    cair no mesmo ponto de um bloco não alterado, quando o resto das páginas
+    antigas é reaproveitado deslocado. O que não está na tela é paginado em
+    segundo plano, em voltas curtas.
+    """
+
+    alterada = Signal()
+
+    def __init__(self, documento):
+        super().__init__(documento)
+        self.documento = documento
+        self.altura = 0.0
+        # Largura do layout para a qual as páginas foram calculadas; None enquanto pausada
+        self.largura = None
+        self.blocos = documento.blockCount()
+        self.paginas = [(0.0, 0, 0.0)]
+        self.completa = False
+        self.anteriores = []
+        self.anteriores_completa = False
+        self.delta_blocos = 0
+        self.ultimo_alterado = -1
+        self.indice_anteriores = None
+
+        self.temporizador = QTimer(self)
+        self.temporizador.setSingleShot(True)
+        self.temporizador.setInterval(0)
+        self.temporizador.timeout.connect(self.continuar)
+
+        documento.contentsChange.connect(self.conteudo_alterado)
+
+    @classmethod
+    def do_documento(cls, documento):
+        """A paginação do documento, criada no primeiro uso do modo de páginas"""
+        paginacao = getattr(documento, "paginacao", None)
+        if paginacao is None:
+            paginacao = cls(documento)
+            documento.paginacao = paginacao
+        return paginacao
+
+    def definir_altura(self, altura):
+        if altura != self.altura or not self.atual():
+            self.altura = altura
+            self.reiniciar()
+
+    def atual(self):
+        """Se o layout do documento ainda tem a largura com que as páginas foram calculadas"""
+        return self.largura is not None and self.documento.textWidth() == self.largura
+
+    def pausar(self):
+        """Fora do modo de páginas o layout tem a largura da janela: nada é paginado até a próxima definir_altura"""
+        self.temporizador.stop()
+        self.largura = None
+
+    def reiniciar(self):
+        self.largura = self.documento.textWidth()
+        self.blocos = self.documento.blockCount()
+        self.paginas = [(0.0, 0, 0.0)]
+        self.completa = False
+        self.anteriores = []
+        self.temporizador.start()
+        self.alterada.emit()
+
+    def conteudo_alterado(self, posicao, removidos, adicionados):
+        if not self.atual():
+            self.pausar()
+            return
+        total = self.documento.blockCount()
+        delta = total - self.blocos
+        self.blocos = total
+        numero = self.documento.findBlock(posicao).blockNumber()
+
+        # As páginas que começam antes do bloco alterado continuam valendo
+        indice = bisect_left(self.paginas, numero, key=bloco_da_pagina)
+        if not (indice < len(self.paginas) and self.paginas[indice][1] == numero and self.paginas[indice][2] == 0):
+            indice -= 1
+        indice = max(indice, 0)
+
+        if self.anteriores:
+            # Uma edição anterior ainda não convergiu: sem páginas antigas para reaproveitar
+            self.anteriores = []
+        else:
+            self.anteriores = self.paginas[indice + 1:]
+            self.anteriores_completa = self.completa
+            self.delta_blocos = delta
+            self.indice_anteriores = None
+        self.ultimo_alterado = self.documento.findBlock(posicao + adicionados).blockNumber()
+        del self.paginas[indice + 1:]
+        self.completa = False
+        self.temporizador.start()
+        self.alterada.emit()
+
+    def proxima(self, topo, numero):
+        """Onde começa a página seguinte à que começa em `topo` (bloco `numero`); None no fim do documento"""
+        layout = self.documento.documentLayout()
+        limite = topo + self.altura
+        bloco = self.documento.findBlockByNumber(numero)
+        while bloco.isValid():
+            retangulo = layout.blockBoundingRect(bloco)
+            politica = bloco.blockFormat().pageBreakPolicy()
+            if retangulo.top() > topo and politica & QUEBRA_ANTES:
+                return retangulo.top(), bloco.blockNumber(), 0.0
+            if retangulo.bottom() > limite:
+                linhas = bloco.layout()
+                base = linhas.position().y()
+                for i in range(linhas.lineCount()):
+                    linha = linhas.lineAt(i)
+                    y = base + linha.y()
+                    if y + linha.height() > limite:
+                        # Uma linha maior que a página (uma imagem) fica sozinha nela
+                        if y <= topo:
+                            y += linha.height()
+                        return y, bloco.blockNumber(), y - retangulo.top()
+            seguinte = bloco.next()
+            if politica & QUEBRA_DEPOIS and seguinte.isValid():
+                return layout.blockBoundingRect(seguinte).top(), seguinte.blockNumber(), 0.0
+            bloco = seguinte
+        return None
+
+    def convergir(self, pagina):
+        """Reaproveita as páginas antigas se esta quebra coincide com uma delas; devolve se conseguiu"""
+        topo, numero, deslocamento = pagina
+        if not self.anteriores or numero <= self.ultimo_alterado:
+            return False
+        if self.indice_anteriores is None:
+            self.indice_anteriores = {(p[1], p[2]): i for i, p in enumerate(self.anteriores)}
+        i = self.indice_anteriores.get((numero - self.delta_blocos, deslocamento))
+        if i is None:
+            return False
+        diferenca = topo - self.anteriores[i][0]
+        delta = self.delta_blocos
+        self.paginas.extend((y + diferenca, b + delta, d) for y, b, d in self.anteriores[i + 1:])
+        self.completa = self.anteriores_completa
+        self.anteriores = []
+        return True
+
+    def avancar(self):
+        """Calcula mais uma página; devolve False quando o documento acabou"""
+        if self.completa or self.altura <= 0:
+            return False
+        topo, numero, _ = self.paginas[-1]
+        pagina = self.proxima(topo, numero)
+        if pagina is None:
+            self.completa = True
+            self.anteriores = []
+            return False
+        self.paginas.append(pagina)
+        self.convergir(pagina)
+        return True
+
+    def continuar(self):
+        if not self.atual():
+            self.pausar()
+            return
+        limite = time.perf_counter() + ORCAMENTO_PAGINACAO_S
+        while time.perf_counter() < limite:
+            if not self.avancar():
+                break
+        if not self.completa:
+            self.temporizador.start()
+        self.alterada.emit()
+
+    def garantir(self, indice):
+        """Pagina (na hora) até existir a página `indice` ou o documento acabar"""
+        while len(self.paginas) <= indice and self.avancar():
+            pass
+        return indice < len(self.paginas)
+
+    def garantir_y(self, y):
+        while (self.completa is False and self.paginas[-1][0] <= y) and self.avancar():
+            pass
+
+    def pagina_de(self, y):
+        return max(bisect_right(self.paginas, y, key=topo_da_pagina) - 1, 0)
+
+    def fim(self, indice):
+        """y onde termina o conteúdo da página"""
+        if indice + 1 < len(self.paginas):
+            return self.paginas[indice + 1][0]
+        if self.garantir(indice + 1):
+            return self.paginas[indice + 1][0]
+        return self.documento.documentLayout().blockBoundingRect(self.documento.lastBlock()).bottom()
+
+    def total_estimado(self):
+        """Páginas já calculadas ou, enquanto a paginação não chega ao fim, uma estimativa pelos blocos"""
+        if self.completa:
+            return len(self.paginas)
+        # documentSize() obrigaria o layout do documento inteiro
+        ultimo = self.paginas[-1][1]
+        if not ultimo:
+            return len(self.paginas)
+        return max(len(self.paginas), round(len(self.paginas) * self.documento.blockCount() / ultimo))
+
+
+class VisualizacaoPaginas(QAbstractScrollArea):
+    """O capítulo aberto em páginas A5, com margens, cabeçalho e número de página.
+
+    Quem edita continua sendo o QTextEdit do editor (escondido neste
+    modo): ele recebe as teclas e guarda o cursor, e o documento é o mesmo.
+    Esta vista só desenha cada página como uma fatia do layout contínuo e
+    traduz os cliques para posições do documento.
+    """
+
+    def __init__(self, editor, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.documento = None
+        self.paginacao = None
+        self.livro = ""
+        self.capitulo = ""
+        self.cursor_visivel = True
+        self.arrastando = False
+
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.setAttribute(Qt.WA_InputMethodEnabled)
+        self.viewport().setCursor(Qt.IBeamCursor)
+        self.viewport().setAutoFillBackground(True)
+        paleta = self.viewport().palette()
+        paleta.setColor(QPalette.Window, QColor("#9a9a9a"))
+        self.viewport().setPalette(paleta)
+        self.viewport().setBackgroundRole(QPalette.Window)
+        self.setMinimumWidth(600)
+
+        self.pisca = QTimer(self)
+        self.pisca.setInterval(max(QApplication.cursorFlashTime() // 2, 100))
+        self.pisca.timeout.connect(self.piscar)
+
+        self.editor.cursorPositionChanged.connect(self.cursor_movido)
+        self.editor.selectionChanged.connect(self.viewport().update)
+
+        self.configurar(CONFIGURACAO_PADRAO)
+
+    def configurar(self, configuracao):
+        self.configuracao = configuracao
+        dpi = self.editor.logicalDpiY()
+        superior, inferior, esquerda, direita = configuracao["margens_mm"]
+        self.cabecalho = configuracao["cabecalho"]
+        self.numeros = configuracao["numeros"]
+        self.largura_pagina = round(mm_para_px(A5_MM[0], dpi))
+        self.altura_pagina = round(mm_para_px(A5_MM[1], dpi))
+        self.margem_superior = round(mm_para_px(superior, dpi))
+        self.margem_inferior = round(mm_para_px(inferior, dpi))
+        self.margem_esquerda = round(mm_para_px(esquerda, dpi))
+        self.largura_conteudo = max(self.largura_pagina - self.margem_esquerda - round(mm_para_px(direita, dpi)), 50)
+        self.altura_conteudo = max(self.altura_pagina - self.margem_superior - self.margem_inferior, 50)
+        if self.isVisible():
+            self.ajustar_editor()
+            self.paginacao.definir_altura(self.altura_conteudo)
+
+    def ajustar_editor(self):
+        """O layout contínuo passa a ter a largura do miolo da página"""
+        margem = self.editor.document().documentMargin()
+        self.editor.setLineWrapMode(QTextEdit.FixedPixelWidth)
+        self.editor.setLineWrapColumnOrWidth(round(self.largura_conteudo + 2 * margem))
+
+    def ativar(self, livro="", capitulo=""):
+        self.ajustar_editor()
+        self.editor.setFocusProxy(self)
+        self.editor.hide()
+        self.show()
+        self.definir_documento(self.editor.document(), livro, capitulo)
+        # O que foi editado com a vista desligada foi diagramado em outra largura
+        self.paginacao.reiniciar()
+        self.setFocus(Qt.OtherFocusReason)
+        self.pisca.start()
+
+    def desativar(self):
+        self.pisca.stop()
+        if self.paginacao is not None:
+            self.paginacao.pausar()
+        self.hide()
+        self.editor.setFocusProxy(None)
+        self.editor.setLineWrapMode(QTextEdit.WidgetWidth)
+        self.editor.show()
+        self.editor.setFocus(Qt.OtherFocusReason)
+
+    def definir_documento(self, documento, livro="", capitulo=""):
+        self.livro = livro
+        self.capitulo = capitulo
+        if self.paginacao is not None:
+            self.paginacao.alterada.disconnect(self.paginas_alteradas)
+            self.documento.documentLayout().update.disconnect(self.layout_atualizado)
+        self.documento = documento
+        self.paginacao = Paginacao.do_documento(documento)
+        self.paginacao.definir_altura(self.altura_conteudo)
+        self.paginacao.alterada.connect(self.paginas_alteradas)
+        documento.documentLayout().update.connect(self.layout_atualizado)
+        self.paginacao.temporizador.start()
+        self.paginas_alteradas()
+        self.cursor_movido()
+
+    def layout_atualizado(self, *_):
+        self.viewport().update()
+
+    def paginas_alteradas(self):
+        total = self.paginacao.total_estimado()
+        altura = ESPACO_PAGINAS + total * (self.altura_pagina + ESPACO_PAGINAS)
+        self.verticalScrollBar().setRange(0, max(altura - self.viewport().height(), 0))
+        self.verticalScrollBar().setPageStep(self.viewport().height())
+        self.verticalScrollBar().setSingleStep(20)
+        largura = self.largura_pagina + 2 * ESPACO_PAGINAS
+        self.horizontalScrollBar().setRange(0, max(largura - self.viewport().width(), 0))
+        self.horizontalScrollBar().setPageStep(self.viewport().width())
+        self.viewport().update()
+
+    def resizeEvent(self, evento):
+        super().resizeEvent(evento)
+        if self.paginacao is not None:
+            self.paginas_alteradas()
+
+    # Geometria: coordenadas da vista <-> páginas <-> y do layout contínuo
+
+    def esquerda_pagina(self):
+        livre = self.viewport().width() - self.largura_pagina
+        return max(livre // 2, ESPACO_PAGINAS) - self.horizontalScrollBar().value()
+
+    def topo_pagina(self, indice):
+        return ESPACO_PAGINAS + indice * (self.altura_pagina + ESPACO_PAGINAS) - self.verticalScrollBar().value()
+
+    def posicao_no_documento(self, ponto):
+        passo = self.altura_pagina + ESPACO_PAGINAS
+        indice = max(int((ponto.y() + self.verticalScrollBar().value() - ESPACO_PAGINAS) // passo), 0)
+        if not self.paginacao.garantir(indice):
+            indice = len(self.paginacao.paginas) - 1
+        topo = self.paginacao.paginas[indice][0]
+        fim = self.paginacao.fim(indice)
+        y = topo + min(max(ponto.y() - self.topo_pagina(indice) - self.margem_superior, 0), max(fim - topo - 1, 0))
+        x = ponto.x() - self.esquerda_pagina() - self.margem_esquerda + self.documento.documentMargin()
+        return self.documento.documentLayout().hitTest(QPointF(x, y), Qt.FuzzyHit)
+
+    def retangulo_cursor(self):
+        """y do cursor no layout contínuo e a altura da linha"""
+        cursor = self.editor.textCursor()
+        bloco = cursor.block()
+        linhas = bloco.layout()
+        if linhas is None or linhas.lineCount() == 0:
+            retangulo = self.documento.documentLayout().blockBoundingRect(bloco)
+            return retangulo.top(), retangulo.height()
+        linha = linhas.lineForTextPosition(cursor.positionInBlock())
+        if not linha.isValid():
+            linha = linhas.lineAt(0)
+        return linhas.position().y() + linha.y(), linha.height()
+
+    def cursor_movido(self):
+        if self.paginacao is None or not self.isVisible():
+            return
+        self.cursor_visivel = True
+        y, altura = self.retangulo_cursor()
+        self.paginacao.garantir_y(y)
+        indice = self.paginacao.pagina_de(y)
+        topo = self.topo_pagina(indice) + self.margem_superior + (y - self.paginacao.paginas[indice][0])
+        barra = self.verticalScrollBar()
+        if topo < 0:
+            barra.setValue(barra.value() + int(topo) - ESPACO_PAGINAS)
+        elif topo + altura > self.viewport().height():
+            barra.setValue(barra.value() + int(topo + altura - self.viewport().height()) + ESPACO_PAGINAS)
+        self.viewport().update()
+
+    def piscar(self):
+        self.cursor_visivel = not self.cursor_visivel
+        self.viewport().update()
+
+    # Desenho
+
+    def contexto_pintura(self, topo, fim):
+        contexto = QAbstractTextDocumentLayout.PaintContext()
+        contexto.palette = self.editor.palette()
+        contexto.palette.setColor(QPalette.Text, QColor("#333333"))
+        contexto.clip = QRectF(0, topo, self.largura_conteudo + 2 * self.documento.documentMargin(), fim - topo)
+        cursor = self.editor.textCursor()
+        contexto.cursorPosition = cursor.position() if self.cursor_visivel and self.hasFocus() else -1
+
+        selecoes = []
+        for extra in self.editor.extraSelections():
+            selecao = QAbstractTextDocumentLayout.Selection()
+            selecao.cursor = extra.cursor
+            selecao.format = extra.format
+            selecoes.append(selecao)
+        if cursor.hasSelection():
+            selecao = QAbstractTextDocumentLayout.Selection()
+            selecao.cursor = cursor
+            formato = QTextCharFormat()
+            formato.setBackground(self.palette().brush(QPalette.Highlight))
+            formato.setForeground(self.palette().brush(QPalette.HighlightedText))
+            selecao.format = formato
+            selecoes.append(selecao)
+        contexto.selections = selecoes
+        return contexto
+
+    def texto_cabecalho(self, topo_bloco):
+        if not self.cabecalho:
+            return ""
+        titulo = ""
+        estrutura_documento = getattr(self.documento, "estrutura", None)
+        if estrutura_documento is not None and estrutura_documento.cursores:
+            posicao = self.documento.findBlockByNumber(topo_bloco).position()
+            anterior = bisect_right(estrutura_documento.cursores, posicao, key=estrutura.posicao) - 1
+            if anterior >= 0:
+                titulo = estrutura_documento.entradas[anterior][1]
+        try:
+            return self.cabecalho.format(livro=self.livro, capitulo=self.capitulo, titulo=titulo or self.capitulo)
+        except (KeyError, IndexError, ValueError):
+            return self.cabecalho
+
+    def paintEvent(self, evento):
+        if self.paginacao is None:
+            return
+        pintor = QPainter(self.viewport())
+        passo = self.altura_pagina + ESPACO_PAGINAS
+        rolagem = self.verticalScrollBar().value()
+        primeira = max((rolagem - ESPACO_PAGINAS) // passo, 0)
+        ultima = (rolagem + self.viewport().height()) // passo
+        esquerda = self.esquerda_pagina()
+        margem_documento = self.documento.documentMargin()
+
+        fonte_margens = QFont(self.font())
+        fonte_margens.setPointSizeF(max(fonte_margens.pointSizeF() - 1, 7))
+
+        for indice in range(primeira, ultima + 1):
+            if not self.paginacao.garantir(indice):
+                break
+            topo_pagina = self.topo_pagina(indice)
+            pintor.fillRect(esquerda + 3, topo_pagina + 3, self.largura_pagina, self.altura_pagina, QColor(0, 0, 0, 60))
+            pintor.fillRect(esquerda, topo_pagina, self.largura_pagina, self.altura_pagina, Qt.white)
+
+            pintor.setFont(fonte_margens)
+            pintor.setPen(QColor("#777777"))
+            cabecalho = self.texto_cabecalho(self.paginacao.paginas[indice][1])
+            if cabecalho:
+                pintor.drawText(QRectF(esquerda + self.margem_esquerda, topo_pagina, self.largura_conteudo,
+                                       self.margem_superior), Qt.AlignCenter, cabecalho)
+            if self.numeros:
+                pintor.drawText(QRectF(esquerda, topo_pagina + self.altura_pagina - self.margem_inferior,
+                                       self.largura_pagina, self.margem_inferior), Qt.AlignCenter, str(indice + 1))
+
+            topo = self.paginacao.paginas[indice][0]
+            fim = self.paginacao.fim(indice)
+            pintor.save()
+            pintor.setClipRect(QRectF(esquerda + self.margem_esquerda - margem_documento, topo_pagina + self.margem_superior,
+                                      self.largura_conteudo + 2 * margem_documento, fim - topo))
+            pintor.translate(esquerda + self.margem_esquerda - margem_documento, topo_pagina + self.margem_superior - topo)
+            self.documento.documentLayout().draw(pintor, self.contexto_pintura(topo, fim))
+            pintor.restore()
+        pintor.end()
+
+    # Entrada: teclas vão para o editor; cliques viram posições no documento
+
+    def focusNextPrevChild(self, proximo):
+        # Tab é texto, como no editor
+        return False
+
+    def keyPressEvent(self, evento):
+        QCoreApplication.sendEvent(self.editor, evento)
+
+    def keyReleaseEvent(self, evento):
+        QCoreApplication.sendEvent(self.editor, evento)
+
+    def inputMethodEvent(self, evento):
+        QCoreApplication.sendEvent(self.editor, evento)
+
+    def inputMethodQuery(self, consulta):
+        return self.editor.inputMethodQuery(consulta)
+
+    def focusInEvent(self, evento):
+        super().focusInEvent(evento)
+        self.viewport().update()
+
+    def focusOutEvent(self, evento):
+        super().focusOutEvent(evento)
+        self.viewport().update()
+
+    def mover_cursor(self, ponto, manter_ancora):
+        posicao = self.posicao_no_documento(ponto)
+        if posicao < 0:
+            return
+        cursor = self.editor.textCursor()
+        cursor.setPosition(posicao, QTextCursor.KeepAnchor if manter_ancora else QTextCursor.MoveAnchor)
+        self.editor.setTextCursor(cursor)
+
+    def mousePressEvent(self, evento):
+        if self.paginacao is None or evento.button() != Qt.LeftButton:
+            return
+        self.setFocus(Qt.MouseFocusReason)
+        self.mover_cursor(evento.position(), evento.modifiers() & Qt.ShiftModifier)
+        self.arrastando = True
+
+    def mouseMoveEvent(self, evento):
+        if self.arrastando:
+            self.mover_cursor(evento.position(), True)
+
+    def mouseReleaseEvent(self, evento):
+        self.arrastando = False
+
+    def mouseDoubleClickEvent(self, evento):
+        if self.paginacao is None:
+            return
+        self.mover_cursor(evento.position(), False)
+        cursor = self.editor.textCursor()
+        cursor.select(QTextCursor.WordUnderCursor)
+        self.editor.setTextCursor(cursor)
+
+    def contextMenuEvent(self, evento):
+        menu = self.editor.createStandardContextMenu()
+        controle = desfazer.ControleDesfazer.do_editor(self.editor)
+        if controle is not None:
+            controle.ajustar_menu(menu)
+        menu.exec(evento.globalPos())
+        menu.deleteLater()
+
+
+class DialogoPagina(QDialog):
+    """Margens, cabeçalho e números da página A5"""
+
+    def __init__(self, configuracao, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Configurar Página")
+
+        layout = QFormLayout(self)
+        self.margens = []
+        for rotulo, valor in zip(("Margem superior", "Margem inferior", "Margem esquerda", "Margem direita"),
+                                 configuracao["margens_mm"]):
+            campo = QDoubleSpinBox()
+            campo.setRange(0, 60)
+            campo.setDecimals(1)
+            campo.setSuffix(" mm")
+            campo.setValue(valor)
+            layout.addRow(rotulo, campo)
+            self.margens.append(campo)
+
+        self.cabecalho = QLineEdit(configuracao["cabecalho"])
+        self.cabecalho.setToolTip("Use {livro}, {capitulo} e {titulo} (o último título antes da página)")
+        layout.addRow("Cabeçalho", self.cabecalho)
+
+        self.numeros = QCheckBox("Numerar as páginas")
+        self.numeros.setChecked(configuracao["numeros"])
+        layout.addRow(self.numeros)
+
+        botoes = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        botoes.accepted.connect(self.accept)
+        botoes.rejected.connect(self.reject)
+        layout.addRow(botoes)
+
+    def configuracao(self):
+        return {
+            "margens_mm": [campo.value() for campo in self.margens],
+            "cabecalho": self.cabecalho.text(),
+            "numeros": self.numeros.isChecked(),
+        }
@@ -0,0 +1,478 @@
+import re
+import json
+import hashlib
+from html import escape, unescape
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QTextBlockFormat, QTextCharFormat, QTextCursor, QTextDocument, QTextFormat, QTextListFormat
+import estilos
+
+# Identifica os capítulos gravados por este serializador
+GERADOR = "Editor A5"
+
+# Qt põe margens e fonte próprias em <p>, <li> e nos títulos; aqui tudo parte do zero
+ESTILO_BASE = (
+    "body{white-space:pre-wrap}\n"
+    "p,li,ul,ol,h1,h2,h3,h4,h5,h6{margin-top:0px;margin-bottom:0px;margin-left:0px;margin-right:0px}\n"
+    ".vazio{-qt-paragraph-type:empty}\n"
+)
+
+ALINHAMENTOS = {
+    Qt.AlignLeft: "left",
+    Qt.AlignRight: "right",
+    # O Qt lê align="right" como alinhamento absoluto
+    Qt.AlignRight | Qt.AlignAbsolute: "right",
+    Qt.AlignHCenter: "center",
+    Qt.AlignJustify: "justify",
+}
+
+ESTILOS_LISTA = {
+    QTextListFormat.ListDisc: "disc",
+    QTextListFormat.ListCircle: "circle",
+    QTextListFormat.ListSquare: "square",
+    QTextListFormat.ListDecimal: "decimal",
+    QTextListFormat.ListLowerAlpha: "lower-alpha",
+    QTextListFormat.ListUpperAlpha: "upper-alpha",
+    QTextListFormat.ListLowerRoman: "lower-roman",
+    QTextListFormat.ListUpperRoman: "upper-roman",
+}
+
+LISTAS_NUMERADAS = {
+    QTextListFormat.ListDecimal, QTextListFormat.ListLowerAlpha, QTextListFormat.ListUpperAlpha,
+    QTextListFormat.ListLowerRoman, QTextListFormat.ListUpperRoman,
+}
+
+# lineHeightType() devolve um int
+ALTURA_PROPORCIONAL = QTextBlockFormat.ProportionalHeight.value
+ALTURAS_LINHA = {
+    QTextBlockFormat.FixedHeight.value: "fixed",
+    QTextBlockFormat.MinimumHeight.value: "minimum",
+    QTextBlockFormat.LineDistanceHeight.value: "line-distance",
+}
+
+# Tamanho relativo do caractere (o que o Qt lê de <h1>…<h5> e de font-size:small…xx-large)
+TAMANHOS_RELATIVOS = {-1: "small", 0: "medium", 1: "large", 2: "x-large", 3: "xx-large"}
+
+SEPARADOR_LINHA = " "
+
+# O Qt ignora atributos que não conhece: o nome do estilo do parágrafo é relido à parte, linha a linha
+LINHA_PARAGRAFO = re.compile(r"<(?:p|li|h[1-6])[ >]")
+ATRIBUTO_ESTILO = re.compile(r' data-estilo="([^"]*)"')
+META_ESTILOS = re.compile(r'<meta name="estilos" content="([^"]*)" />')
+TAG_TITULO = re.compile(r"<h[1-6][ >]")
+
+
+def numero(valor):
+    return f"{valor:g}"
+
+
+def cor(pincel):
+    cor_pincel = pincel.color()
+    if cor_pincel.alpha() == 255:
+        return cor_pincel.name()
+    return f"rgba({cor_pincel.red()},{cor_pincel.green()},{cor_pincel.blue()},{cor_pincel.alpha()})"
+
+
+def css_caractere(formato, titulo=False):
+    """Declarações CSS das propriedades de caractere definidas no formato.
+
+    Ao ler <h1>…<h5> o Qt põe negrito e um tamanho relativo; num título o
+    peso e o tamanho vão sempre explícitos, para o texto voltar como era.
+    """
+    formato = formato.toCharFormat()
+    declaracoes = []
+    if formato.hasProperty(QTextFormat.FontFamilies):
+        familias = formato.fontFamilies() or []
+        if familias:
+            declaracoes.append("font-family:" + ",".join(f"'{f}'" for f in familias))
+    if formato.hasProperty(QTextFormat.FontPointSize):
+        declaracoes.append(f"font-size:{numero(formato.fontPointSize())}pt")
+    elif formato.hasProperty(QTextFormat.FontPixelSize):
+        declaracoes.append(f"font-size:{formato.intProperty(QTextFormat.FontPixelSize)}px")
+    elif formato.hasProperty(QTextFormat.FontSizeAdjustment) or titulo:
+        tamanho = TAMANHOS_RELATIVOS.get(formato.intProperty(QTextFormat.FontSizeAdjustment))
+        if tamanho:
+            declaracoes.append(f"font-size:{tamanho}")
+    if formato.hasProperty(QTextFormat.FontWeight) or titulo:
+        declaracoes.append(f"font-weight:{formato.fontWeight()}")
+    if formato.hasProperty(QTextFormat.FontItalic):
+        declaracoes.append("font-style:" + ("italic" if formato.fontItalic() else "normal"))
+    if any(formato.hasProperty(p) for p in (QTextFormat.TextUnderlineStyle, QTextFormat.FontUnderline,
+                                             QTextFormat.FontStrikeOut, QTextFormat.FontOverline)):
+        decoracoes = [nome for nome, ligada in (("underline", formato.fontUnderline()),
+                                                ("line-through", formato.fontStrikeOut()),
+                                                ("overline", formato.fontOverline())) if ligada]
+        declaracoes.append("text-decoration:" + (" ".join(decoracoes) or "none"))
+    if formato.hasProperty(QTextFormat.ForegroundBrush) and formato.foreground().style() != Qt.NoBrush:
+        declaracoes.append(f"color:{cor(formato.foreground())}")
+    if formato.hasProperty(QTextFormat.BackgroundBrush) and formato.background().style() != Qt.NoBrush:
+        declaracoes.append(f"background-color:{cor(formato.background())}")
+    alinhamento = formato.verticalAlignment()
+    if alinhamento == QTextCharFormat.AlignSuperScript:
+        declaracoes.append("vertical-align:super")
+    elif alinhamento == QTextCharFormat.AlignSubScript:
+        declaracoes.append("vertical-align:sub")
+    return ";".join(declaracoes)
+
+
+def css_bloco(formato):
+    """Declarações CSS do formato de parágrafo (o nível de título vira a tag e o alinhamento, atributo)"""
+    formato = formato.toBlockFormat()
+    declaracoes = []
+    for nome, valor in (("margin-top", formato.topMargin()), ("margin-bottom", formato.bottomMargin()),
+                        ("margin-left", formato.leftMargin()), ("margin-right", formato.rightMargin()),
+                        ("text-indent", formato.textIndent())):
+        if valor:
+            declaracoes.append(f"{nome}:{numero(valor)}px")
+    if formato.indent():
+        declaracoes.append(f"-qt-block-indent:{formato.indent()}")
+    tipo_altura = formato.lineHeightType()
+    if tipo_altura == ALTURA_PROPORCIONAL:
+        declaracoes.append(f"line-height:{numero(formato.lineHeight())}%")
+    elif tipo_altura in ALTURAS_LINHA:
+        declaracoes.append(f"line-height:{numero(formato.lineHeight())}px;-qt-line-height-type:{ALTURAS_LINHA[tipo_altura]}")
+    if formato.hasProperty(QTextFormat.BackgroundBrush) and formato.background().style() != Qt.NoBrush:
+        declaracoes.append(f"background-color:{cor(formato.background())}")
+    quebra = formato.pageBreakPolicy()
+    if quebra & QTextFormat.PageBreak_AlwaysBefore:
+        declaracoes.append("page-break-before:always")
+    if quebra & QTextFormat.PageBreak_AlwaysAfter:
+        declaracoes.append("page-break-after:always")
+    return ";".join(declaracoes)
+
+
+def alinhamento_bloco(formato):
+    """Atributo align do parágrafo; o Qt não lê text-align de folhas de estilo"""
+    formato = formato.toBlockFormat()
+    if not formato.hasProperty(QTextFormat.BlockAlignment):
+        return ""
+    horizontal = ALINHAMENTOS.get(formato.alignment() & Qt.AlignHorizontal_Mask)
+    if not horizontal or horizontal == "left":
+        return ""
+    return f' align="{horizontal}"'
+
+
+def atributo_estilo(formato):
+    """Atributo data-estilo do parágrafo; dispensado quando o nível de título já diz o estilo"""
+    formato = formato.toBlockFormat()
+    if not formato.hasProperty(estilos.PROPRIEDADE_ESTILO):
+        return ""
+    identificador = formato.stringProperty(estilos.PROPRIEDADE_ESTILO)
+    if identificador == estilos.estilo_implicito(formato.headingLevel()):
+        return ""
+    return f' data-estilo="{escape(identificador)}"'
+
+
+def css_lista(formato):
+    formato = formato.toListFormat()
+    declaracoes = [f"list-style-type:{ESTILOS_LISTA.get(formato.style(), 'disc')}",
+                   f"-qt-list-indent:{formato.indent()}"]
+    if formato.numberPrefix():
+        declaracoes.append(f'-qt-list-number-prefix:"{formato.numberPrefix()}"')
+    if formato.numberSuffix() and formato.numberSuffix() != ".":
+        declaracoes.append(f'-qt-list-number-suffix:"{formato.numberSuffix()}"')
+    return ";".join(declaracoes)
+
+
+def texto_html(texto):
+    if "&" in texto or "<" in texto or ">" in texto:
+        texto = texto.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    if SEPARADOR_LINHA in texto:
+        texto = texto.replace(SEPARADOR_LINHA, "<br />")
+    return texto
+
+
+def juntar(*classes):
+    return " ".join(classe for classe in classes if classe)
+
+
+class Serializador:
+    """Escreve um QTextDocument como HTML enxuto, com as formatações em classes CSS.
+
+    O `toHtml` do Qt repete o estilo completo em cada parágrafo e trecho;
+    aqui cada formato distinto do documento vira uma classe uma única vez
+    (pelo índice do formato, então o CSS de cada um é montado só uma vez),
+    e os parágrafos de formatação uniforme nem precisam de <span>. O nome
+    da classe vem do próprio CSS, então o mesmo formato tem o mesmo nome
+    em todos os capítulos.
+    """
+
+    def __init__(self, documento):
+        self.documento = documento
+        self.formatos = documento.allFormats()
+        self.classes = {}
+        self.declaracoes = {}
+        self.blocos = {}
+        self.caracteres = {}
+
+    def classe(self, prefixo, declaracoes):
+        if not declaracoes:
+            return ""
+        chave = (prefixo, declaracoes)
+        nome = self.classes.get(chave)
+        if nome is None:
+            resumo = hashlib.blake2s(declaracoes.encode("utf-8"), digest_size=4).hexdigest()
+            tamanho = 6
+            nome = prefixo + resumo[:tamanho]
+            while nome in self.declaracoes:
+                tamanho += 1
+                nome = prefixo + resumo[:tamanho]
+            self.classes[chave] = nome
+            self.declaracoes[nome] = declaracoes
+        return nome
+
+    def formato_bloco(self, indice):
+        """(lista, nível de título, classe, atributos align e data-estilo) do formato de parágrafo.
+
+        Os itens de uma lista têm um formato próprio, que aponta para ela,
+        então nem é preciso perguntar a lista de cada parágrafo.
+        """
+        resultado = self.blocos.get(indice)
+        if resultado is None:
+            formato = self.formatos[indice]
+            resultado = self.blocos[indice] = (
+                formato.objectIndex(), formato.toBlockFormat().headingLevel(),
+                self.classe("b", css_bloco(formato)), alinhamento_bloco(formato) + atributo_estilo(formato)
+            )
+        return resultado
+
+    def formato_caractere(self, indice, titulo=False):
+        """(classe, se é texto simples: nem imagem nem link) do formato de caractere"""
+        resultado = self.caracteres.get((indice, titulo))
+        if resultado is None:
+            formato = self.formatos[indice].toCharFormat()
+            resultado = self.caracteres[indice, titulo] = (
+                self.classe("c", css_caractere(formato, titulo)), not formato.isImageFormat() and not formato.isAnchor()
+            )
+        return resultado
+
+    def serializar(self):
+        documento = self.documento
+        # Tabelas e quadros ficam com o HTML do próprio Qt (as imagens criam quadros vazios)
+        if tem_quadros(documento):
+            return documento.toHtml()
+
+        partes = []
+        lista_aberta = -1
+        tag_lista = ""
+
+        bloco = documento.firstBlock()
+        while bloco.isValid():
+            indice_lista, linha = self.paragrafo(bloco)
+            if indice_lista != lista_aberta:
+                if lista_aberta >= 0:
+                    partes.append(f"</{tag_lista}>\n")
+                if indice_lista >= 0:
+                    formato_lista = documento.object(indice_lista).format().toListFormat()
+                    tag_lista = "ol" if formato_lista.style() in LISTAS_NUMERADAS else "ul"
+                    partes.append(f'<{tag_lista} class="{self.classe("l", css_lista(formato_lista))}">\n')
+                lista_aberta = indice_lista
+            partes.append(linha)
+            bloco = bloco.next()
+
+        if lista_aberta >= 0:
+            partes.append(f"</{tag_lista}>\n")
+
+        # Com white-space:pre-wrap, uma quebra antes de </body> viraria texto no último parágrafo
+        return self.cabecalho() + "".join(partes).rstrip("\n") + "</body></html>"
+
+    def paragrafo(self, bloco):
+        """(índice da lista do parágrafo ou -1, linha de HTML do parágrafo)"""
+        indice_lista, nivel, classe, atributos = self.formato_bloco(bloco.blockFormatIndex())
+        lista = indice_lista >= 0
+        titulo = not lista and 1 <= nivel <= 6
+        tag = "li" if lista else (f"h{nivel}" if titulo else "p")
+
+        iterador = bloco.begin()
+        if iterador.atEnd():
+            classe = juntar(classe, "vazio", self.formato_caractere(bloco.charFormatIndex(), titulo)[0])
+            conteudo = "<br />"
+        else:
+            fragmento = iterador.fragment()
+            iterador += 1
+            if iterador.atEnd():
+                classe_caractere, simples = self.formato_caractere(fragmento.charFormatIndex(), titulo)
+                if simples and not lista:
+                    # Formatação uniforme: a classe vai no próprio parágrafo (o Qt não a aplica em <li>)
+                    classe = juntar(classe, classe_caractere)
+                    conteudo = texto_html(fragmento.text())
+                else:
+                    conteudo = self.trecho(fragmento, titulo)
+            else:
+                trechos = [self.trecho(fragmento, titulo)]
+                while not iterador.atEnd():
+                    trechos.append(self.trecho(iterador.fragment(), titulo))
+                    iterador += 1
+                conteudo = "".join(trechos)
+
+        if classe:
+            return indice_lista, f'<{tag}{atributos} class="{classe}">{conteudo}</{tag}>\n'
+        return indice_lista, f"<{tag}{atributos}>{conteudo}</{tag}>\n"
+
+    def assinaturas(self):
+        """Uma linha por parágrafo, precedida da classe da lista a que ele pertence.
+
+        Não depende dos índices de formato, então serve para comparar dois
+        documentos parágrafo a parágrafo. O primeiro item de cada lista leva
+        uma marca, para duas listas seguidas do mesmo estilo não virarem uma.
+        """
+        documento = self.documento
+        linhas = []
+        listas = {}
+        bloco = documento.firstBlock()
+        while bloco.isValid():
+            indice_lista, linha = self.paragrafo(bloco)
+            if indice_lista >= 0:
+                lista = listas.get(indice_lista)
+                if lista is None:
+                    objeto = documento.object(indice_lista)
+                    lista = listas[indice_lista] = (self.classe("l", css_lista(objeto.format().toListFormat())),
+                                                    objeto.item(0).blockNumber())
+                classe_lista, primeiro = lista
+                linha = f"{classe_lista}{'+' if bloco.blockNumber() == primeiro else ''}:{linha}"
+            linhas.append(linha)
+            bloco = bloco.next()
+        return linhas
+
+    def trecho(self, fragmento, titulo=False):
+        classe, simples = self.formato_caractere(fragmento.charFormatIndex(), titulo)
+        if simples:
+            if classe:
+                return f'<span class="{classe}">{texto_html(fragmento.text())}</span>'
+            return texto_html(fragmento.text())
+
+        formato = fragmento.charFormat()
+        if formato.isImageFormat():
+            imagem = formato.toImageFormat()
+            atributos = f' src="{escape(imagem.name())}"'
+            if imagem.hasProperty(QTextFormat.ImageWidth):
+                atributos += f' width="{numero(imagem.width())}"'
+            if imagem.hasProperty(QTextFormat.ImageHeight):
+                atributos += f' height="{numero(imagem.height())}"'
+            return f"<img{atributos} />" * fragmento.length()
+
+        texto = texto_html(fragmento.text())
+        if classe:
+            texto = f'<span class="{classe}">{texto}</span>'
+        atributos = ""
+        if formato.anchorHref():
+            atributos += f' href="{escape(formato.anchorHref())}"'
+        for nome in formato.anchorNames():
+            atributos += f' name="{escape(nome)}"'
+        return f"<a{atributos}>{texto}</a>"
+
+    def cabecalho(self):
+        # Sem fonte no <body>: o texto sem fonte própria continua herdando a do documento
+        estilos = [ESTILO_BASE]
+        estilos.extend(f".{nome}{{{declaracoes}}}\n" for nome, declaracoes in self.declaracoes.items())
+
+        titulo = self.documento.metaInformation(QTextDocument.DocumentTitle)
+        # A folha com que o capítulo foi gravado: ao abri-lo depois de a folha do livro mudar, ele é atualizado
+        folha = getattr(self.documento, "estilos", None)
+        return (
+            "<!DOCTYPE html>\n<html>\n<head>\n"
+            f'<meta charset="UTF-8" />\n<meta name="generator" content="{GERADOR}" />\n'
+            + (f'<meta name="estilos" content="{escape(json.dumps(folha, ensure_ascii=False))}" />\n'
+               if folha else "")
+            + (f"<title>{escape(titulo)}</title>\n" if titulo else "")
+            + "<style>\n" + "".join(estilos) + "</style>\n</head>\n<body>\n"
+        )
+
+
+def para_html(documento):
+    """HTML compacto do documento, para gravar em disco"""
+    return Serializador(documento).serializar()
+
+
+def assinaturas(documento):
+    return Serializador(documento).assinaturas()
+
+
+def tem_quadros(documento):
+    """Tabelas e quadros não cabem no formato de um parágrafo por linha"""
+    return any(quadro.lastPosition() >= quadro.firstPosition() for quadro in documento.rootFrame().childFrames())
+
+
+def carregar_html(documento, html):
+    """Carrega no documento tanto o HTML compacto quanto o gerado pelo Qt (capítulos antigos)"""
+    documento.setHtml(html)
+    restaurar_estilos(documento, html)
+    restaurar_tamanhos(documento, html)
+    documento.estilos = folha_gravada(html)
+    documento.setModified(False)
+
+
+def folha_gravada(html):
+    """Folha de estilos com que o capítulo foi gravado, ou None nos capítulos anteriores aos estilos"""
+    encontrada = META_ESTILOS.search(html, 0, html.find("</head>"))
+    if encontrada is None:
+        return None
+    try:
+        return json.loads(unescape(encontrada.group(1)))
+    except ValueError:
+        return None
+
+
+def restaurar_estilos(documento, html):
+    """Devolve aos parágrafos os nomes de estilo gravados em data-estilo.
+
+    No HTML compacto cada parágrafo ocupa uma linha, então a n-ésima linha
+    de parágrafo é o n-ésimo bloco; um HTML de outra origem fica só com os
+    estilos que o nível de título indica.
+    """
+    if ' data-estilo="' not in html:
+        return
+    linhas = [linha for linha in html[html.find("<body>"):].split("\n") if LINHA_PARAGRAFO.match(linha)]
+    if len(linhas) != documento.blockCount():
+        return
+
+    desfazer = documento.isUndoRedoEnabled()
+    documento.setUndoRedoEnabled(False)
+    cursor = QTextCursor(documento)
+    cursor.beginEditBlock()
+    for numero_bloco, linha in enumerate(linhas):
+        atributo = ATRIBUTO_ESTILO.search(linha, 0, linha.find(">"))
+        if atributo is None:
+            continue
+        formato = QTextBlockFormat()
+        formato.setProperty(estilos.PROPRIEDADE_ESTILO, unescape(atributo.group(1)))
+        cursor.setPosition(documento.findBlockByNumber(numero_bloco).position())
+        cursor.mergeBlockFormat(formato)
+    cursor.endEditBlock()
+    documento.setUndoRedoEnabled(desfazer)
+
+
+def restaurar_tamanhos(documento, html):
+    """Tira o tamanho relativo que o Qt põe no texto de <hN> quando o texto já tem tamanho próprio.
+
+    Com os dois, o Qt desenha no tamanho relativo e ignora o gravado.
+    """
+    if TAG_TITULO.search(html) is None:
+        return
+
+    trechos = []
+    bloco = documento.firstBlock()
+    while bloco.isValid():
+        if bloco.blockFormat().headingLevel():
+            iterador = bloco.begin()
+            while not iterador.atEnd():
+                fragmento = iterador.fragment()
+                formato = fragmento.charFormat()
+                if formato.hasProperty(QTextFormat.FontSizeAdjustment) and (
+                        formato.hasProperty(QTextFormat.FontPointSize) or formato.hasProperty(QTextFormat.FontPixelSize)):
+                    formato.clearProperty(QTextFormat.FontSizeAdjustment)
+                    trechos.append((fragmento.position(), fragmento.length(), formato))
+                iterador += 1
+        bloco = bloco.next()
+    if not trechos:
+        return
+
+    desfazer = documento.isUndoRedoEnabled()
+    documento.setUndoRedoEnabled(False)
+    cursor = QTextCursor(documento)
+    cursor.beginEditBlock()
+    for posicao, tamanho, formato in trechos:
+        cursor.setPosition(posicao)
+        cursor.setPosition(posicao + tamanho, QTextCursor.KeepAnchor)
+        cursor.setCharFormat(formato)
+    cursor.endEditBlock()
+    documento.setUndoRedoEnabled(desfazer)
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+from PySide6.QtGui import QTextCursor
+from PySide6.QtWidgets import QTextEdit
+
+import desfazer
+import serializacao
+
+
+@pytest.fixture(autouse=True)
+def configuracao_padrao(tmp_path, monkeypatch):
+    # Os pontos em disco vão para ~/EditorA5
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(desfazer, "_configuracao", dict(desfazer.CONFIGURACAO_PADRAO))
+
+
+def editor_com(paragrafos):
+    editor = QTextEdit()
+    editor.setHtml("".join(f"<p>Parágrafo {i} com algum texto corrido para pesar.</p>" for i in range(paragrafos)))
+    historico = desfazer.HistoricoEdicao.do_documento(editor.document())
+    return editor, historico
+
+
+def editar(editor, numero):
+    """Um nível novo: uma marca no começo de um parágrafo diferente a cada vez"""
+    documento = editor.document()
+    cursor = QTextCursor(documento.findBlockByNumber(numero * 7 % documento.blockCount()))
+    cursor.insertText(f"[{numero}]")
+
+
+def test_poda_de_documento_grande_nao_percorre_a_pilha():
+    editor, historico = editor_com(20000)
+    passos = desfazer.CONFIGURACAO_PADRAO["passos"]
+    for numero in range(passos + 1):
+        editar(editor, numero)
+        # Pausas de vez em quando, e em todos os níveis recentes
+        if numero % desfazer.INTERVALO_PONTOS == 0 or numero > passos - desfazer.NIVEIS_INDIVIDUAIS:
+            historico.guardar_estado(editor)
+    assert historico.excedido()
+
+    inicio = time.perf_counter()
+    serializacao.para_html(editor.document())
+    um_estado = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    historico.podar(editor)
+    poda = time.perf_counter() - inicio
+
+    # Percorrer a pilha e serializar cada ponto levava dezenas de vezes o tempo de um estado
+    assert poda < max(2 * um_estado, 0.05)
+    assert historico.passos() == 0
+    assert len(historico.pontos) > desfazer.NIVEIS_INDIVIDUAIS
+
+
+def test_desfazer_depois_da_poda_passa_pelos_pontos():
+    editor, historico = editor_com(50)
+    documento = editor.document()
+    textos = [documento.toPlainText()]
+    for numero in range(40):
+        editar(editor, numero)
+        historico.guardar_estado(editor)
+        textos.append(documento.toPlainText())
+    historico.podar(editor)
+    assert not documento.isUndoAvailable()
+
+    recuos = []
+    nivel = len(textos) - 1
+    while historico.pode_desfazer():
+        historico.desfazer(editor)
+        anterior = textos.index(documento.toPlainText())
+        recuos.append(nivel - anterior)
+        nivel = anterior
+    assert nivel == 0
+    assert recuos[:desfazer.NIVEIS_INDIVIDUAIS] == [1] * desfazer.NIVEIS_INDIVIDUAIS
+    assert max(recuos) <= desfazer.INTERVALO_PONTOS
+
+    while historico.pode_refazer():
+        historico.refazer(editor)
+    assert documento.toPlainText() == textos[-1]
+
+
+def test_nivel_desfeito_sem_pausa_vira_ponto():
+    editor, historico = editor_com(50)
+    documento = editor.document()
+    editar(editor, 1)
+    historico.guardar_estado(editor)
+    historico.podar(editor)
+    depois_da_poda = documento.toPlainText()
+
+    # Sem pausa depois da edição, o estado dela só existe na pilha do Qt
+    editar(editor, 2)
+    final = documento.toPlainText()
+    historico.desfazer(editor)
+    assert documento.toPlainText() == depois_da_poda
+    historico.desfazer(editor)
+    historico.refazer(editor)
+    historico.refazer(editor)
+    assert documento.toPlainText() == final
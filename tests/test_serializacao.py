@@ -0,0 +1,248 @@
+import pytest
+from PySide6.QtCore import Qt
+from PySide6.QtGui import (
+    QColor, QFont, QTextBlockFormat, QTextCharFormat, QTextCursor, QTextDocument, QTextFormat, QTextImageFormat,
+    QTextListFormat
+)
+
+import estilos
+import serializacao
+
+
+def ida_e_volta(documento):
+    """(HTML gravado, documento lido de volta dele)"""
+    html = serializacao.para_html(documento)
+    lido = QTextDocument()
+    serializacao.carregar_html(lido, html)
+    return html, lido
+
+
+def blocos(documento):
+    bloco = documento.firstBlock()
+    while bloco.isValid():
+        yield bloco
+        bloco = bloco.next()
+
+
+def formato_texto(bloco):
+    return bloco.begin().fragment().charFormat()
+
+
+def documento_variado():
+    documento = QTextDocument()
+    cursor = QTextCursor(documento)
+
+    titulo = QTextBlockFormat()
+    titulo.setHeadingLevel(1)
+    cursor.setBlockFormat(titulo)
+    negrito = QTextCharFormat()
+    negrito.setFontWeight(QFont.Bold)
+    negrito.setFontPointSize(24)
+    cursor.insertText("Título & <capítulo>", negrito)
+
+    cursor.insertBlock(QTextBlockFormat(), QTextCharFormat())
+    cursor.insertText("Texto comum, ")
+    italico = QTextCharFormat()
+    italico.setFontItalic(True)
+    italico.setForeground(QColor("#ff0000"))
+    cursor.insertText("itálico vermelho", italico)
+    cursor.insertText(" e linha quebrada", QTextCharFormat())
+
+    centro = QTextBlockFormat()
+    centro.setAlignment(Qt.AlignHCenter)
+    centro.setTopMargin(10)
+    cursor.insertBlock(centro)
+    cursor.insertText("centrado")
+
+    cursor.insertBlock(QTextBlockFormat())
+
+    lista = QTextListFormat()
+    lista.setStyle(QTextListFormat.ListDecimal)
+    cursor.insertList(lista)
+    cursor.insertText("um")
+    cursor.insertBlock()
+    cursor.insertText("dois")
+
+    cursor.insertBlock(QTextBlockFormat())
+    cursor.insertText("antes ")
+    imagem = QTextImageFormat()
+    imagem.setName("../images/a.png")
+    imagem.setWidth(100)
+    imagem.setHeight(50)
+    cursor.insertImage(imagem)
+    cursor.insertText(" depois")
+    return documento
+
+
+def test_titulos_mantem_nivel_peso_e_tamanho():
+    documento = QTextDocument()
+    documento.setHtml("<h1>Um</h1><p>texto</p><h2>Dois</h2>")
+    _, lido = ida_e_volta(documento)
+
+    titulo, paragrafo, subtitulo = blocos(lido)
+    assert [titulo.blockFormat().headingLevel(), paragrafo.blockFormat().headingLevel(),
+            subtitulo.blockFormat().headingLevel()] == [1, 0, 2]
+    for original, relido in zip(blocos(documento), blocos(lido)):
+        assert relido.text() == original.text()
+        assert formato_texto(relido).fontWeight() == formato_texto(original).fontWeight()
+        assert formato_texto(relido).font().pointSizeF() == formato_texto(original).font().pointSizeF()
+
+
+def test_titulo_sem_peso_continua_sem_negrito():
+    documento = QTextDocument()
+    cursor = QTextCursor(documento)
+    titulo = QTextBlockFormat()
+    titulo.setHeadingLevel(1)
+    cursor.setBlockFormat(titulo)
+    cursor.insertText("Título")
+
+    html, lido = ida_e_volta(documento)
+
+    assert formato_texto(lido.firstBlock()).fontWeight() == QFont.Normal
+    assert formato_texto(lido.firstBlock()).font().pointSizeF() == lido.defaultFont().pointSizeF()
+    assert serializacao.para_html(lido) == html
+
+
+def test_titulo_com_tamanho_proprio_nao_fica_com_o_tamanho_do_qt():
+    documento = documento_variado()
+    _, lido = ida_e_volta(documento)
+
+    formato = formato_texto(lido.firstBlock())
+    assert not formato.hasProperty(QTextFormat.FontSizeAdjustment)
+    assert formato.font().pointSizeF() == 24
+
+
+def test_listas_seguidas_e_aninhadas():
+    documento = QTextDocument()
+    cursor = QTextCursor(documento)
+    externa = QTextListFormat()
+    externa.setStyle(QTextListFormat.ListDisc)
+    cursor.createList(externa)
+    cursor.insertText("a")
+    cursor.insertBlock()
+    interna = QTextListFormat()
+    interna.setStyle(QTextListFormat.ListCircle)
+    interna.setIndent(2)
+    cursor.createList(interna)
+    cursor.insertText("a.1")
+    cursor.insertBlock(QTextBlockFormat())
+    lista_b = cursor.createList(externa)
+    cursor.insertText("b")
+    # Outra lista do mesmo estilo logo depois: não pode se juntar à anterior
+    cursor.insertBlock(QTextBlockFormat())
+    cursor.createList(externa)
+    cursor.insertText("c")
+    assert cursor.currentList() != lista_b
+
+    _, lido = ida_e_volta(documento)
+
+    listas = [bloco.textList() for bloco in blocos(lido)]
+    assert [bloco.text() for bloco in blocos(lido)] == ["a", "a.1", "b", "c"]
+    assert all(lista is not None for lista in listas)
+    assert [(lista.format().style(), lista.format().indent()) for lista in listas] == [
+        (QTextListFormat.ListDisc, 1), (QTextListFormat.ListCircle, 2),
+        (QTextListFormat.ListDisc, 1), (QTextListFormat.ListDisc, 1),
+    ]
+    assert listas[1] != listas[0]
+    assert listas[3] != listas[2]
+
+
+def test_separador_de_linha_e_escapes():
+    documento = documento_variado()
+    html, lido = ida_e_volta(documento)
+
+    assert "&amp; &lt;capítulo&gt;" in html
+    assert "linha<br />quebrada" in html
+    assert lido.firstBlock().text() == "Título & <capítulo>"
+    assert lido.firstBlock().next().text().endswith("linha quebrada")
+
+
+def test_imagem_e_link():
+    documento = documento_variado()
+    cursor = QTextCursor(documento)
+    cursor.movePosition(QTextCursor.End)
+    link = QTextCharFormat()
+    link.setAnchor(True)
+    link.setAnchorHref("http://exemplo.com/?a=1&b=2")
+    cursor.insertText(" site", link)
+
+    _, lido = ida_e_volta(documento)
+
+    formatos = []
+    iterador = lido.lastBlock().begin()
+    while not iterador.atEnd():
+        formatos.append(iterador.fragment().charFormat())
+        iterador += 1
+    imagem = next(formato.toImageFormat() for formato in formatos if formato.isImageFormat())
+    assert (imagem.name(), imagem.width(), imagem.height()) == ("../images/a.png", 100, 50)
+    assert formatos[-1].anchorHref() == "http://exemplo.com/?a=1&b=2"
+
+
+@pytest.mark.parametrize("alinhamento", [Qt.AlignHCenter, Qt.AlignRight, Qt.AlignJustify])
+def test_alinhamento(alinhamento):
+    documento = QTextDocument()
+    formato = QTextBlockFormat()
+    formato.setAlignment(alinhamento)
+    QTextCursor(documento).setBlockFormat(formato)
+    QTextCursor(documento).insertText("texto")
+
+    html, lido = ida_e_volta(documento)
+
+    # O Qt lê align="right" como AlignRight | AlignAbsolute
+    assert lido.firstBlock().blockFormat().alignment() & ~Qt.AlignAbsolute & Qt.AlignHorizontal_Mask == alinhamento
+    assert serializacao.para_html(lido) == html
+
+
+def test_data_estilo():
+    documento = QTextDocument()
+    cursor = QTextCursor(documento)
+    titulo = QTextBlockFormat()
+    titulo.setHeadingLevel(1)
+    titulo.setProperty(estilos.PROPRIEDADE_ESTILO, estilos.TITULO)
+    cursor.setBlockFormat(titulo)
+    cursor.insertText("Título")
+    citacao = QTextBlockFormat()
+    citacao.setProperty(estilos.PROPRIEDADE_ESTILO, estilos.CITACAO)
+    cursor.insertBlock(citacao)
+    cursor.insertText("Citação")
+
+    html, lido = ida_e_volta(documento)
+
+    # O nível de título já diz o estilo do primeiro parágrafo
+    assert html.count("data-estilo=") == 1
+    assert [estilos.estilo_do_bloco(bloco.blockFormat()) for bloco in blocos(lido)] == [
+        estilos.TITULO, estilos.CITACAO
+    ]
+
+
+def test_tabela_fica_com_o_html_do_qt():
+    documento = QTextDocument()
+    cursor = QTextCursor(documento)
+    cursor.insertText("antes")
+    cursor.insertTable(2, 2)
+    cursor.insertText("célula")
+
+    html, lido = ida_e_volta(documento)
+
+    assert f'content="{serializacao.GERADOR}"' not in html
+    assert serializacao.tem_quadros(lido)
+    assert "célula" in lido.toPlainText()
+
+
+@pytest.mark.parametrize("montar", [
+    documento_variado,
+    lambda: documento_de_html("<h1>Um</h1><h2>Dois</h2><h3>Três</h3><h6>Seis</h6><p>texto</p>"),
+    lambda: documento_de_html('<p>a <span style="font-size:x-large">grande</span> e <b>negrito</b></p><p></p>'),
+])
+def test_regravar_da_os_mesmos_bytes(montar):
+    html, lido = ida_e_volta(montar())
+
+    assert serializacao.para_html(lido) == html
+    _, relido = ida_e_volta(lido)
+    assert serializacao.para_html(relido) == html
+
+
+def documento_de_html(html):
+    documento = QTextDocument()
+    documento.setHtml(html)
+    return documento
@@ -0,0 +1,235 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QListWidget, QPushButton, QFileDialog
+import biblioteca
+from livro import MANIFESTO
+
+# Em pastas sincronizadas e discos de rede cada stat espera pela rede; em paralelo a espera se sobrepõe
+TRABALHADORES = 8
+
+
+def mtime(caminho):
+    try:
+        return os.stat(caminho).st_mtime_ns
+    except OSError:
+        return None
+
+
+def livro_da_pasta(pasta):
+    """Caminho do livro guardado na pasta, no formato que o NewBookDialog cria, ou None"""
+    manifesto = os.path.join(pasta, MANIFESTO)
+    if os.path.isfile(manifesto):
+        return manifesto
+    legado = os.path.join(pasta, os.path.basename(os.path.normpath(pasta)) + ".html")
+    if os.path.isfile(legado):
+        return legado
+    return None
+
+
+def ler_livro(caminho):
+    """Os dados de um livro que a tela inicial mostra, lidos do manifesto (ou do nome do HTML legado)"""
+    pasta = os.path.dirname(caminho)
+    dados = {"caminho": caminho, "pasta": pasta, "nome": os.path.splitext(os.path.basename(caminho))[0],
+             "capa": "", "data_criacao": "", "mtime": mtime(caminho) or 0}
+    if os.path.basename(caminho) == MANIFESTO:
+        with open(caminho, "r", encoding="utf-8") as f:
+            manifesto = json.load(f)
+        dados["nome"] = manifesto.get("nome") or os.path.basename(pasta)
+        dados["capa"] = manifesto.get("capa", "")
+        dados["data_criacao"] = manifesto.get("data_criacao", "")
+    return dados
+
+
+def conferir(livro):
+    """(estado, dados) de um livro já conhecido: "igual", "alterado", "ausente" ou "removido"
+
+    O manifesto só é relido quando o mtime mudou desde a última varredura.
+    """
+    atual = mtime(livro["caminho"])
+    if atual is None:
+        # Pasta de cima presente e livro sumido: foi apagado ou movido. Sem ela, o disco pode só estar desmontado
+        if os.path.isdir(os.path.dirname(os.path.normpath(livro["pasta"]))):
+            return "removido", None
+        return "ausente", None
+    if atual == livro["mtime"] and not livro["ausente"]:
+        return "igual", None
+    return "alterado", ler_livro(livro["caminho"])
+
+
+def examinar_raiz(raiz, mtime_anterior):
+    """(mtime atual, subpastas) de uma raiz; sem subpastas quando ela não mudou desde a última varredura"""
+    atual = mtime(raiz)
+    if atual is None or atual == mtime_anterior:
+        return atual, []
+    try:
+        with os.scandir(raiz) as entradas:
+            pastas = [entrada.path for entrada in entradas
+                      if not entrada.name.startswith(".") and entrada.is_dir(follow_symlinks=False)]
+    except OSError as e:
+        print(f"Erro ao varrer {raiz}: {e}")
+        return None, []
+    return atual, pastas
+
+
+def chave_pasta(pasta):
+    return os.path.normcase(os.path.normpath(pasta))
+
+
+class VarreduraBiblioteca(QObject):
+    """Confere a biblioteca e procura livros novos nas pastas raiz, numa thread.
+
+    Os livros já conhecidos são conferidos em paralelo só pelo mtime; as raízes
+    só são listadas quando o mtime delas mudou (uma pasta de livro nova muda o
+    mtime da raiz). Cada resultado sai num sinal assim que fica pronto, e o
+    SQLite é atualizado de uma vez no fim.
+    """
+
+    livro_encontrado = Signal(dict)
+    livro_alterado = Signal(dict)
+    livro_ausente = Signal(str)
+    livro_removido = Signal(str)
+    concluida = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cancelada = threading.Event()
+
+    def iniciar(self):
+        self.cancelar()
+        self.cancelada = threading.Event()
+        threading.Thread(target=self.executar, args=(self.cancelada,),
+                         name="varredura-biblioteca", daemon=True).start()
+
+    def cancelar(self):
+        self.cancelada.set()
+
+    def executar(self, cancelada):
+        try:
+            self.varrer(cancelada)
+        except Exception as e:
+            print(f"Erro ao varrer a biblioteca: {e}")
+        if not cancelada.is_set():
+            self.concluida.emit()
+
+    def varrer(self, cancelada):
+        with biblioteca.Biblioteca() as livros:
+            conhecidos = livros.listar()
+            raizes = livros.raizes()
+
+        alterados, descobertos, ausentes, removidos = [], [], [], []
+        mtimes_raizes = {}
+        with ThreadPoolExecutor(TRABALHADORES, thread_name_prefix="varredura") as executor:
+            tarefas = {executor.submit(conferir, livro): livro for livro in conhecidos}
+            for tarefa in as_completed(tarefas):
+                if cancelada.is_set():
+                    executor.shutdown(cancel_futures=True)
+                    return
+                livro = tarefas[tarefa]
+                try:
+                    estado, dados = tarefa.result()
+                except (OSError, ValueError) as e:
+                    print(f"Erro ao conferir {livro['caminho']}: {e}")
+                    continue
+                if estado == "alterado":
+                    alterados.append(dados)
+                    if livro["ausente"] or dados["nome"] != livro["nome"] or dados["capa"] != livro["capa"]:
+                        self.livro_alterado.emit(dados)
+                elif estado == "ausente" and not livro["ausente"]:
+                    ausentes.append(livro["caminho"])
+                    self.livro_ausente.emit(livro["caminho"])
+                elif estado == "removido":
+                    removidos.append(livro["caminho"])
+                    self.livro_removido.emit(livro["caminho"])
+
+            # Pastas já na biblioteca (inclusive HTMLs legados já convertidos) não são descobertas de novo
+            pastas_conhecidas = {chave_pasta(livro["pasta"]) for livro in conhecidos
+                                 if livro["caminho"] not in removidos}
+            candidatas = []
+            for raiz, (atual, pastas) in zip(raizes, executor.map(examinar_raiz, raizes, raizes.values())):
+                if atual is not None:
+                    mtimes_raizes[raiz] = atual
+                candidatas.extend((raiz, pasta) for pasta in pastas if chave_pasta(pasta) not in pastas_conhecidas)
+
+            tarefas = {executor.submit(livro_da_pasta, pasta): (raiz, pasta) for raiz, pasta in candidatas}
+            for tarefa in as_completed(tarefas):
+                if cancelada.is_set():
+                    executor.shutdown(cancel_futures=True)
+                    return
+                raiz, pasta = tarefas[tarefa]
+                caminho = tarefa.result()
+                if caminho is None:
+                    # Sincronização e cópias criam a pasta antes do livro.json: o mtime da raiz não é
+                    # guardado, e ela é listada de novo na próxima varredura até a pasta ter um livro
+                    mtimes_raizes.pop(raiz, None)
+                    continue
+                if chave_pasta(pasta) in pastas_conhecidas:
+                    continue
+                try:
+                    dados = ler_livro(caminho)
+                except (OSError, ValueError) as e:
+                    print(f"Erro ao ler {caminho}: {e}")
+                    mtimes_raizes.pop(raiz, None)
+                    continue
+                pastas_conhecidas.add(chave_pasta(pasta))
+                descobertos.append(dados)
+                self.livro_encontrado.emit(dados)
+
+        if cancelada.is_set():
+            return
+        with biblioteca.Biblioteca() as livros:
+            livros.aplicar_varredura(alterados, descobertos, ausentes, removidos, mtimes_raizes)
+
+
+class DialogoPastas(QDialog):
+    """Pastas onde a tela inicial procura livros criados fora do editor"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Pastas da Biblioteca")
+        self.alterado = False
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Os livros guardados diretamente nestas pastas aparecem na tela inicial:"))
+        self.lista = QListWidget()
+        layout.addWidget(self.lista)
+
+        botoes = QHBoxLayout()
+        adicionar = QPushButton("Adicionar...")
+        adicionar.clicked.connect(self.adicionar)
+        remover = QPushButton("Remover")
+        remover.clicked.connect(self.remover)
+        fechar = QPushButton("Fechar")
+        fechar.clicked.connect(self.accept)
+        botoes.addWidget(adicionar)
+        botoes.addWidget(remover)
+        botoes.addStretch()
+        botoes.addWidget(fechar)
+        layout.addLayout(botoes)
+
+        self.carregar()
+
+    def carregar(self):
+        self.lista.clear()
+        with biblioteca.Biblioteca() as livros:
+            self.lista.addItems(sorted(livros.raizes()))
+
+    def adicionar(self):
+        pasta = QFileDialog.getExistingDirectory(self, "Pasta com livros")
+        if not pasta:
+            return
+        with biblioteca.Biblioteca() as livros:
+            livros.adicionar_raiz(pasta)
+        self.alterado = True
+        self.carregar()
+
+    def remover(self):
+        item = self.lista.currentItem()
+        if item is None:
+            return
+        with biblioteca.Biblioteca() as livros:
+            livros.remover_raiz(item.text())
+        self.alterado = True
+        self.carregar()
@@ -0,0 +1,501 @@
+import os
+import json
+import zlib
+import difflib
+import hashlib
+import shiboken6
+from PySide6.QtCore import QObject, QFileSystemWatcher, QTimer, Qt, Signal
+from PySide6.QtGui import QTextBlockFormat, QTextCursor, QTextList
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QListWidget, QListWidgetItem, QPushButton
+)
+import imagens
+import serializacao
+from livro import PASTA_CAPITULOS, PASTA_IMAGENS
+
+# Ferramentas de sincronização gravam em rajadas; só depois desta pausa os arquivos são conferidos
+ATRASO_VERIFICACAO_MS = 500
+
+# Conteúdos já conhecidos de cada capítulo (o lido, os gravados por este editor)
+LIMITE_RESUMOS = 4
+
+TAMANHO_PREVIA = 80
+
+
+def resumo_conteudo(dados):
+    # O modo texto do Python grava \r\n no Windows
+    return hashlib.blake2b(dados.replace(b"\r\n", b"\n"), digest_size=16).digest()
+
+
+def assinatura(caminho):
+    """(tamanho, mtime) do arquivo, ou None se ele não existe"""
+    try:
+        estado = os.stat(caminho)
+    except OSError:
+        return None
+    return estado.st_size, estado.st_mtime_ns
+
+
+def imagem_intacta(caminho):
+    """As imagens guardadas pelo editor têm no nome o começo do SHA-256 do conteúdo"""
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    if len(nome) != 32:
+        return False
+    try:
+        with open(caminho, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:32] == nome
+    except OSError:
+        return False
+
+
+class CapituloVigiado:
+    __slots__ = ("assinatura", "resumos", "base")
+
+    def __init__(self):
+        self.assinatura = None
+        self.resumos = []
+        self.base = b""
+
+
+class VigiaLivro(QObject):
+    """Percebe quando os arquivos do livro aberto mudam fora do editor.
+
+    O QFileSystemWatcher avisa de qualquer escrita, inclusive das nossas e de
+    ferramentas de sincronização que só tocam o arquivo; os avisos são
+    juntados por um temporizador e, na conferência, um arquivo só é relido
+    quando o tamanho ou a data mudaram. Um capítulo só conta como alterado se
+    o resumo do conteúdo não for o de uma versão que este editor leu ou gravou.
+    Só os capítulos carregados são vigiados: os outros são lidos do disco
+    quando forem abertos.
+    """
+
+    capitulo_alterado = Signal(str, str)
+    imagem_alterada = Signal(str)
+    manifesto_alterado = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.livro = None
+        self.capitulos = {}
+        self.imagens = {}
+        self.manifesto = None
+        self.verificando = False
+
+        self.observador = QFileSystemWatcher(self)
+        self.observador.fileChanged.connect(self.anotar)
+        self.observador.directoryChanged.connect(self.anotar)
+
+        self.temporizador = QTimer(self)
+        self.temporizador.setSingleShot(True)
+        self.temporizador.setInterval(ATRASO_VERIFICACAO_MS)
+        self.temporizador.timeout.connect(self.verificar)
+
+    def pasta_imagens(self):
+        return os.path.join(self.livro.pasta, PASTA_IMAGENS)
+
+    def vigiar(self, livro):
+        self.parar()
+        self.livro = livro
+        pastas = [livro.pasta, os.path.join(livro.pasta, PASTA_CAPITULOS), self.pasta_imagens()]
+        self.adicionar([pasta for pasta in pastas if os.path.isdir(pasta)])
+        if livro.caminho_manifesto:
+            self.manifesto = assinatura(livro.caminho_manifesto)
+            self.adicionar([livro.caminho_manifesto])
+        self.imagens = self.listar_imagens()
+        self.adicionar(list(self.imagens))
+
+    def parar(self):
+        self.temporizador.stop()
+        caminhos = self.observador.files() + self.observador.directories()
+        if caminhos:
+            self.observador.removePaths(caminhos)
+        self.livro = None
+        self.capitulos.clear()
+        self.imagens = {}
+        self.manifesto = None
+
+    def adicionar(self, caminhos):
+        caminhos = [caminho for caminho in caminhos if os.path.exists(caminho)]
+        if caminhos:
+            self.observador.addPaths(caminhos)
+
+    def listar_imagens(self):
+        pasta = self.pasta_imagens()
+        try:
+            nomes = os.listdir(pasta)
+        except OSError:
+            return {}
+        return {os.path.join(pasta, nome): assinatura(os.path.join(pasta, nome))
+                for nome in nomes if not nome.endswith(".tmp")}
+
+    def conhecer(self, caminho, html):
+        """Registra o conteúdo que o editor leu ou vai gravar neste capítulo"""
+        if self.livro is None:
+            return
+        capitulo = self.capitulos.get(caminho)
+        if capitulo is None:
+            capitulo = self.capitulos[caminho] = CapituloVigiado()
+            capitulo.assinatura = assinatura(caminho)
+            self.adicionar([caminho])
+        dados = html.encode("utf-8")
+        resumo = resumo_conteudo(dados)
+        if resumo in capitulo.resumos:
+            capitulo.resumos.remove(resumo)
+        capitulo.resumos.append(resumo)
+        del capitulo.resumos[:-LIMITE_RESUMOS]
+        # A base de uma mesclagem: o que está (ou vai estar) no disco segundo o editor
+        capitulo.base = zlib.compress(dados, 1)
+
+    def esquecer(self, caminho):
+        if self.capitulos.pop(caminho, None) is not None and caminho in self.observador.files():
+            self.observador.removePath(caminho)
+
+    def base(self, caminho):
+        capitulo = self.capitulos.get(caminho)
+        if capitulo is None or not capitulo.base:
+            return ""
+        return zlib.decompress(capitulo.base).decode("utf-8")
+
+    def anotar(self, caminho):
+        # Uma troca atômica (renomear por cima) tira o arquivo da lista do observador
+        if caminho not in self.observador.files() and caminho not in self.observador.directories():
+            if caminho in self.capitulos or caminho in self.imagens \
+                    or caminho == getattr(self.livro, "caminho_manifesto", None):
+                self.adicionar([caminho])
+        self.temporizador.start()
+
+    def verificar(self):
+        """Confere os arquivos vigiados; também chamado antes de salvar, sem esperar o temporizador"""
+        self.temporizador.stop()
+        if self.livro is None or self.verificando:
+            return
+        self.verificando = True
+        try:
+            alteracoes = self.conferir()
+        finally:
+            self.verificando = False
+
+        for sinal, argumentos in alteracoes:
+            sinal.emit(*argumentos)
+
+    def conferir(self):
+        alteracoes = []
+        livro = self.livro
+
+        if livro.caminho_manifesto:
+            atual = assinatura(livro.caminho_manifesto)
+            if atual is not None and atual != self.manifesto:
+                self.manifesto = atual
+                try:
+                    with open(livro.caminho_manifesto, "r", encoding="utf-8") as f:
+                        dados = json.load(f)
+                except (OSError, ValueError):
+                    # Pode estar no meio de uma escrita; a próxima conferência o lê inteiro
+                    self.manifesto = None
+                    dados = livro.dados
+                if dados != livro.dados:
+                    alteracoes.append((self.manifesto_alterado, ()))
+
+        for caminho, capitulo in self.capitulos.items():
+            atual = assinatura(caminho)
+            if atual is None or atual == capitulo.assinatura:
+                continue
+            try:
+                with open(caminho, "rb") as f:
+                    dados = f.read()
+            except OSError:
+                continue
+            capitulo.assinatura = atual
+            resumo = resumo_conteudo(dados)
+            if resumo in capitulo.resumos:
+                continue
+            capitulo.resumos.append(resumo)
+            del capitulo.resumos[:-LIMITE_RESUMOS]
+            alteracoes.append((self.capitulo_alterado, (caminho, dados.decode("utf-8", errors="replace"))))
+
+        imagens_atuais = self.listar_imagens()
+        for caminho, antiga in self.imagens.items():
+            atual = imagens_atuais.get(caminho)
+            if atual != antiga and not (atual is not None and imagem_intacta(caminho)):
+                alteracoes.append((self.imagem_alterada, (caminho,)))
+        self.adicionar([caminho for caminho in imagens_atuais if caminho not in self.imagens])
+        self.imagens = imagens_atuais
+        return alteracoes
+
+
+def diferencas(minhas, externas):
+    """Trechos (i1, i2, j1, j2) em que os parágrafos de `minhas` diferem dos de `externas`"""
+    inicio = 0
+    limite = min(len(minhas), len(externas))
+    while inicio < limite and minhas[inicio] == externas[inicio]:
+        inicio += 1
+    fim = 0
+    while fim < limite - inicio and minhas[-1 - fim] == externas[-1 - fim]:
+        fim += 1
+
+    comparador = difflib.SequenceMatcher(None, minhas[inicio:len(minhas) - fim],
+                                         externas[inicio:len(externas) - fim], autojunk=False)
+    regioes = []
+    for operacao, i1, i2, j1, j2 in comparador.get_opcodes():
+        if operacao == "equal":
+            continue
+        i1, i2, j1, j2 = i1 + inicio, i2 + inicio, j1 + inicio, j2 + inicio
+        # Trechos encostados viram um só: entre dois trechos sempre fica ao menos um parágrafo igual
+        if regioes and regioes[-1][1] == i1 and regioes[-1][3] == j1:
+            regioes[-1] = (regioes[-1][0], i2, regioes[-1][2], j2)
+        else:
+            regioes.append((i1, i2, j1, j2))
+    return regioes
+
+
+def fim_do_paragrafo(bloco):
+    return bloco.position() + bloco.length() - 1
+
+
+def copiar_texto(cursor, externo, primeiro, fim):
+    """Insere o texto dos parágrafos [primeiro, fim) do externo, trecho a trecho com o formato.
+
+    Um QTextDocumentFragment que começa num item de lista traz um separador
+    a mais; assim os parágrafos inseridos são exatamente os pedidos.
+    """
+    for numero in range(primeiro, fim):
+        if numero > primeiro:
+            cursor.insertBlock()
+        iterador = externo.findBlockByNumber(numero).begin()
+        while not iterador.atEnd():
+            fragmento = iterador.fragment()
+            if fragmento.isValid():
+                cursor.insertText(fragmento.text(), fragmento.charFormat())
+            iterador += 1
+
+
+def formato_completo(bloco):
+    lista = bloco.textList()
+    return (QTextBlockFormat(bloco.blockFormat()), bloco.charFormat(),
+            lista.format() if lista is not None else None,
+            lista.objectIndex() if lista is not None else -1)
+
+
+def restaurar_formato(documento, bloco, salvo):
+    """Devolve a um parágrafo o formato guardado, voltando à mesma lista se ela ainda existe"""
+    formato, formato_caractere, formato_lista, indice = salvo
+    lista = documento.object(indice) if indice >= 0 else None
+    # A lista some com o último item removido (e o invólucro Python pode sobrar)
+    if not isinstance(lista, QTextList) or not shiboken6.isValid(lista) or lista.count() == 0:
+        lista = None
+    aplicar_formato(bloco, formato, formato_caractere, formato_lista, lista)
+
+
+def definir_lista(bloco, lista):
+    """Põe o parágrafo na lista (ou em nenhuma) sem mudar o recuo, como faria o QTextList.remove"""
+    formato = bloco.blockFormat()
+    formato.setObjectIndex(lista.objectIndex() if lista is not None else -1)
+    QTextCursor(bloco).setBlockFormat(formato)
+
+
+def aplicar_formato(bloco, formato, formato_caractere, formato_lista, lista=None):
+    """Formato de um parágrafo vindo de outro documento: a lista é a dada ou uma nova"""
+    formato = QTextBlockFormat(formato)
+    # Numa só troca: tirar o parágrafo da lista antes apagaria a lista que ficasse vazia
+    formato.setObjectIndex(lista.objectIndex() if lista is not None else -1)
+    cursor = QTextCursor(bloco)
+    cursor.setBlockFormat(formato)
+    cursor.setBlockCharFormat(formato_caractere)
+    if lista is None and formato_lista is not None:
+        cursor.createList(formato_lista)
+
+
+def conciliar_listas(documento, externo, pares):
+    """Junta nas mesmas listas os parágrafos que estão juntos no externo.
+
+    `pares` são (parágrafo daqui, parágrafo de fora) que se correspondem. As
+    listas do Qt nem precisam ser contínuas, então a correspondência é feita
+    lista a lista, e não só nas bordas dos trechos trocados.
+    """
+    correspondentes = {}
+    usadas = set()
+    for local, de_fora in pares:
+        bloco = documento.findBlockByNumber(local)
+        lista_origem = externo.findBlockByNumber(de_fora).textList()
+        atual = bloco.textList()
+        if lista_origem is None:
+            if atual is not None:
+                definir_lista(bloco, None)
+            continue
+        lista = correspondentes.get(lista_origem.objectIndex())
+        if lista is None:
+            if atual is not None and atual.objectIndex() not in usadas:
+                lista = atual
+                if lista.format() != lista_origem.format():
+                    lista.setFormat(lista_origem.format())
+            else:
+                aplicar_formato(bloco, bloco.blockFormat(), bloco.charFormat(), lista_origem.format())
+                lista = bloco.textList()
+            correspondentes[lista_origem.objectIndex()] = lista
+            usadas.add(lista.objectIndex())
+        if atual is None or atual.objectIndex() != lista.objectIndex():
+            definir_lista(bloco, lista)
+
+
+def substituir(documento, externo, i1, i2, j1, j2):
+    """Troca os parágrafos [i1, i2) do documento pelos [j1, j2) do externo"""
+    antigos, novos = i2 - i1, j2 - j1
+    total = documento.blockCount()
+    cursor = QTextCursor(documento)
+    if antigos and novos:
+        # Só o texto: o separador depois do trecho, e o parágrafo seguinte, ficam intactos
+        cursor.setPosition(documento.findBlockByNumber(i1).position())
+        cursor.setPosition(fim_do_paragrafo(documento.findBlockByNumber(i2 - 1)), QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        copiar_texto(cursor, externo, j1, j2)
+    elif novos and i1 < total:
+        seguinte = formato_completo(documento.findBlockByNumber(i1))
+        cursor.setPosition(documento.findBlockByNumber(i1).position())
+        copiar_texto(cursor, externo, j1, j2)
+        cursor.insertBlock()
+        restaurar_formato(documento, documento.findBlockByNumber(i1 + novos), seguinte)
+    elif novos:
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertBlock()
+        copiar_texto(cursor, externo, j1, j2)
+    elif i2 < total:
+        seguinte = formato_completo(documento.findBlockByNumber(i2))
+        cursor.setPosition(documento.findBlockByNumber(i1).position())
+        cursor.setPosition(documento.findBlockByNumber(i2).position(), QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        restaurar_formato(documento, documento.findBlockByNumber(i1), seguinte)
+    else:
+        cursor.setPosition(fim_do_paragrafo(documento.findBlockByNumber(i1 - 1)))
+        cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+
+    # As listas ficam para conciliar_listas, que olha o documento inteiro
+    for deslocamento in range(novos):
+        origem = externo.findBlockByNumber(j1 + deslocamento)
+        aplicar_formato(documento.findBlockByNumber(i1 + deslocamento),
+                        origem.blockFormat(), origem.charFormat(), None)
+
+
+def aplicar_regioes(documento, externo, regioes, escolhidas=None):
+    """Reaplica no documento os trechos escolhidos (todos, por padrão), num único passo de desfazer"""
+    if escolhidas is None:
+        escolhidas = regioes
+    total = documento.blockCount()
+
+    # Parágrafos que se correspondem depois da troca: os iguais e os dos trechos aplicados
+    pares = []
+    local = de_fora = deslocamento = 0
+    for regiao in sorted(regioes):
+        i1, i2, j1, j2 = regiao
+        pares.extend((local + k + deslocamento, de_fora + k) for k in range(i1 - local))
+        if regiao in escolhidas:
+            pares.extend((i1 + k + deslocamento, j1 + k) for k in range(j2 - j1))
+            deslocamento += (j2 - j1) - (i2 - i1)
+        local, de_fora = i2, j2
+    pares.extend((local + k + deslocamento, de_fora + k) for k in range(total - local))
+
+    cursor = QTextCursor(documento)
+    cursor.beginEditBlock()
+    try:
+        # De trás para frente, os números dos parágrafos dos trechos anteriores continuam valendo
+        for i1, i2, j1, j2 in sorted(escolhidas, reverse=True):
+            substituir(documento, externo, i1, i2, j1, j2)
+        conciliar_listas(documento, externo, pares)
+    finally:
+        cursor.endEditBlock()
+
+
+def previa(documento, primeiro, fim):
+    partes = []
+    bloco = documento.findBlockByNumber(primeiro)
+    while bloco.isValid() and bloco.blockNumber() < fim and sum(map(len, partes)) < TAMANHO_PREVIA:
+        partes.append(bloco.text().strip())
+        bloco = bloco.next()
+    texto = " ¶ ".join(parte for parte in partes if parte) or "(vazio)"
+    return texto if len(texto) <= TAMANHO_PREVIA else texto[:TAMANHO_PREVIA - 1] + "…"
+
+
+class DialogoAlteracaoExterna(QDialog):
+    """Oferece recarregar um capítulo alterado fora do editor, ou aplicar só alguns trechos.
+
+    Os dois lados são comparados parágrafo a parágrafo; recarregar troca só
+    os parágrafos diferentes, sem um setHtml do capítulo inteiro. Com a base
+    (o que o editor leu ou gravou por último), os trechos que só mudaram aqui
+    vêm desmarcados, para não desfazer o trabalho ainda não salvo.
+    """
+
+    def __init__(self, titulo, documento, html_externo, html_base="", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Capítulo alterado fora do editor")
+        self.documento = documento
+        self.html_externo = html_externo
+        self.resultado = None
+
+        self.externo = imagens.DocumentoLivro(documento.diretorio, documento.cache, self)
+        serializacao.carregar_html(self.externo, html_externo)
+        self.externas = None
+        self.regioes = None
+        if not serializacao.tem_quadros(documento) and not serializacao.tem_quadros(self.externo):
+            self.externas = serializacao.assinaturas(self.externo)
+            minhas = serializacao.assinaturas(documento)
+            self.regioes = diferencas(minhas, self.externas)
+            daqui = self.trechos_daqui(minhas, html_base) if documento.isModified() else set()
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"O capítulo \"{titulo}\" foi alterado no disco por outro programa."))
+
+        self.lista = QListWidget()
+        if self.regioes is not None:
+            for numero, (i1, i2, j1, j2) in enumerate(self.regioes):
+                texto = f"§{i1 + 1}: {previa(documento, i1, i2)}  →  {previa(self.externo, j1, j2)}"
+                item = QListWidgetItem(texto)
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(Qt.Unchecked if numero in daqui else Qt.Checked)
+                if numero in daqui:
+                    item.setToolTip("Só mudou neste editor")
+                self.lista.addItem(item)
+            layout.addWidget(QLabel("Trechos diferentes (desmarcados: mudaram só aqui):"))
+            layout.addWidget(self.lista)
+
+        botoes = QHBoxLayout()
+        recarregar = QPushButton("Recarregar do disco")
+        recarregar.clicked.connect(lambda: self.concluir("recarregar"))
+        aplicar = QPushButton("Aplicar os marcados")
+        aplicar.setEnabled(bool(self.regioes))
+        aplicar.clicked.connect(lambda: self.concluir("aplicar"))
+        manter = QPushButton("Manter minha versão")
+        manter.clicked.connect(lambda: self.concluir("manter"))
+        botoes.addWidget(recarregar)
+        botoes.addWidget(aplicar)
+        botoes.addWidget(manter)
+        layout.addLayout(botoes)
+
+    def trechos_daqui(self, minhas, html_base):
+        """Trechos em que só o editor mudou: o texto de fora ainda é o da base"""
+        if not html_base:
+            return set()
+        base = imagens.DocumentoLivro(self.documento.diretorio, self.documento.cache, self)
+        serializacao.carregar_html(base, html_base)
+        linhas_base = set(serializacao.assinaturas(base))
+        base.deleteLater()
+        return {numero for numero, (i1, i2, j1, j2) in enumerate(self.regioes)
+                if all(linha in linhas_base for linha in self.externas[j1:j2])
+                and not all(linha in linhas_base for linha in minhas[i1:i2])}
+
+    def concluir(self, resultado):
+        self.resultado = resultado
+        if resultado == "recarregar":
+            self.recarregar()
+        elif resultado == "aplicar":
+            marcadas = [regiao for numero, regiao in enumerate(self.regioes)
+                        if self.lista.item(numero).checkState() == Qt.Checked]
+            aplicar_regioes(self.documento, self.externo, self.regioes, marcadas)
+        self.accept()
+
+    def recarregar(self):
+        if self.regioes is not None:
+            aplicar_regioes(self.documento, self.externo, self.regioes)
+            if serializacao.assinaturas(self.documento) == self.externas:
+                return
+        # Tabelas, ou um trecho que a cópia parágrafo a parágrafo não reproduziu igual
+        serializacao.carregar_html(self.documento, self.html_externo)
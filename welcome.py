@@ -1,10 +1,26 @@
 import os
 import sys
-import json
-from PySide6.QtWidgets import QApplication, QWidget, QFileDialog, QListWidget, QListWidgetItem, QListView
-from PySide6.QtUiTools import QUiLoader
-from PySide6.QtCore import QFile
-import newBook
+import threading
+from PySide6.QtWidgets import QApplication, QWidget, QFileDialog, QListWidget, QListWidgetItem, QListView, QLineEdit
+from PySide6.QtCore import QSize, QTimer, Qt
+from PySide6.QtGui import QStandardItemModel, QStandardItem, QIcon, QPixmap
+import formularios
+import biblioteca
+import miniaturas
+import instrumentacao
+import varredura
+
+# editor, newBook e busca são importados só quando usados: a tela inicial aparece antes
+
+# Espera entre a última tecla digitada na busca e a consulta ao índice
+ATRASO_BUSCA_MS = 150
+
+# Onde cada item da grade guarda o caminho da capa que está mostrando
+PAPEL_CAPA = Qt.UserRole + 1
+
+def sincronizar_indice(caminhos):
+    import busca
+    busca.sincronizar_biblioteca(caminhos)
 
 class WelcomeWindow:
     def __init__(self):
@@ -12,11 +28,7 @@ class WelcomeWindow:
         self.carregar_livros_recentes()
 
     def load_ui(self):
-        loader = QUiLoader()
-        ui_file = QFile("welcome.ui")
-        ui_file.open(QFile.ReadOnly)
-        self.ui = loader.load(ui_file)
-        ui_file.close()
+        self.ui = formularios.carregar_formulario("welcome")
 
         self.ui.resize(1280, 720)
 
@@ -31,74 +43,209 @@ class WelcomeWindow:
         self.lista_livros = self.ui.findChild(QListView, "listaLivros")
 
         if self.lista_livros:
-            from PySide6.QtCore import QStringListModel, Qt, QModelIndex
-            self.modelo_livros = QStringListModel()
+            self.modelo_livros = QStandardItemModel()
             self.lista_livros.setModel(self.modelo_livros)
             self.lista_livros.clicked.connect(self.abrir_livro_recente)
 
-            self.caminhos_html = []
+            # Grade de capas
+            tamanho = miniaturas.TAMANHO_MINIATURA
+            self.lista_livros.setViewMode(QListView.IconMode)
+            self.lista_livros.setIconSize(tamanho)
+            self.lista_livros.setGridSize(QSize(tamanho.width() + 40, tamanho.height() + 50))
+            self.lista_livros.setResizeMode(QListView.Adjust)
+            self.lista_livros.setMovement(QListView.Static)
+            self.lista_livros.setUniformItemSizes(True)
+            self.lista_livros.setWordWrap(True)
+
+            self.icone_padrao = QIcon.fromTheme("x-office-document")
+            self.miniaturas = miniaturas.CarregadorMiniaturas()
+            self.miniaturas.pronta.connect(self.aplicar_miniatura)
+            self.itens_por_capa = {}
+            self.itens_por_caminho = {}
+
+            # Livros apagados, movidos ou criados fora do editor chegam aos poucos, da varredura
+            self.varredura = varredura.VarreduraBiblioteca(self.ui)
+            self.varredura.livro_encontrado.connect(self.adicionar_livro)
+            self.varredura.livro_alterado.connect(self.atualizar_livro)
+            self.varredura.livro_ausente.connect(self.marcar_ausente)
+            self.varredura.livro_removido.connect(self.remover_livro)
+            self.varredura.concluida.connect(self.indexar_livros)
+
+        botao_pastas = self.ui.findChild(QWidget, "btnPastas")
+        if botao_pastas:
+            botao_pastas.clicked.connect(self.configurar_pastas)
+
+        # Busca em todos os livros
+        self.campo_busca = self.ui.findChild(QLineEdit, "campoBusca")
+        self.lista_resultados = self.ui.findChild(QListWidget, "listaResultados")
+        if self.campo_busca and self.lista_resultados:
+            self.temporizador_busca = QTimer(self.ui)
+            self.temporizador_busca.setSingleShot(True)
+            self.temporizador_busca.setInterval(ATRASO_BUSCA_MS)
+            self.temporizador_busca.timeout.connect(self.buscar)
+            self.campo_busca.textChanged.connect(self.temporizador_busca.start)
+            self.lista_resultados.itemClicked.connect(self.abrir_resultado)
 
         self.ui.show()
 
+    @instrumentacao.medido("carregar_livros_recentes")
     def carregar_livros_recentes(self):
-        """Carrega os livros recentes do arquivo JSON central para exibição na tela inicial"""
+        """Carrega os livros recentes da biblioteca central para exibição na tela inicial"""
         if not self.lista_livros:
             return
 
-        print("Carregando livros recentes...")
-
         # Limpar listas
-        self.caminhos_html = []
-        nomes_livros = []
-
-        # Carregar livros do JSON central
-        home_dir = os.path.expanduser("~")
-        central_dir = os.path.join(home_dir, "EditorA5")
-        json_path = os.path.join(central_dir, "livros_recentes.json")
-
-        if os.path.exists(json_path):
-            try:
-                with open(json_path, "r", encoding="utf-8") as f:
-                    livros = json.load(f)
+        self.itens_por_caminho = {}
+        self.itens_por_capa = {}
+        self.varredura.cancelar()
+        self.miniaturas.cancelar()
+        self.modelo_livros.clear()
+
+        try:
+            with biblioteca.Biblioteca() as livros:
+                recentes = livros.listar()
+
+            # Processar cada livro; as capas chegam depois, geradas em segundo plano
+            for livro in recentes:
+                self.adicionar_livro(livro)
+                if livro["ausente"]:
+                    self.marcar_ausente(livro["caminho"])
+
+        except Exception as e:
+            print(f"Erro ao carregar livros recentes: {e}")
+
+        self.varredura.iniciar()
+
+    def adicionar_livro(self, livro):
+        # Uma varredura cancelada ainda pode ter sinais na fila
+        if livro["caminho"] in self.itens_por_caminho:
+            self.atualizar_livro(livro)
+            return
+        item = QStandardItem(self.icone_padrao, livro["nome"])
+        item.setEditable(False)
+        item.setToolTip(livro["caminho"])
+        item.setData(livro["caminho"], Qt.UserRole)
+        self.modelo_livros.appendRow(item)
+        self.itens_por_caminho[livro["caminho"]] = item
+        self.definir_capa(item, livro.get("capa"))
+
+    def definir_capa(self, item, capa):
+        anterior = item.data(PAPEL_CAPA)
+        if anterior == capa:
+            return
+        if anterior:
+            self.itens_por_capa[anterior].remove(item)
+            item.setIcon(self.icone_padrao)
+        item.setData(capa, PAPEL_CAPA)
+        if capa:
+            self.itens_por_capa.setdefault(capa, []).append(item)
+            self.miniaturas.solicitar(capa)
+
+    def atualizar_livro(self, livro):
+        """O livro foi renomeado, trocou de capa ou voltou a ser encontrado"""
+        item = self.itens_por_caminho.get(livro["caminho"])
+        if item is None:
+            self.adicionar_livro(livro)
+            return
+        item.setText(livro["nome"])
+        item.setToolTip(livro["caminho"])
+        item.setEnabled(True)
+        self.definir_capa(item, livro["capa"])
+
+    def marcar_ausente(self, caminho):
+        """Livro num disco ou pasta sincronizada que não está disponível agora"""
+        item = self.itens_por_caminho.get(caminho)
+        if item is not None:
+            item.setEnabled(False)
+            item.setToolTip(f"Não encontrado: {caminho}")
+
+    def remover_livro(self, caminho):
+        item = self.itens_por_caminho.pop(caminho, None)
+        if item is None:
+            return
+        self.definir_capa(item, None)
+        self.modelo_livros.removeRow(item.row())
+
+    def indexar_livros(self):
+        # Só os capítulos alterados fora do editor são reindexados
+        caminhos = [caminho for caminho, item in self.itens_por_caminho.items() if item.isEnabled()]
+        threading.Thread(target=sincronizar_indice, args=(caminhos,),
+                         name="indice-busca", daemon=True).start()
+
+    def configurar_pastas(self):
+        dialogo = varredura.DialogoPastas(self.ui)
+        dialogo.exec()
+        if dialogo.alterado:
+            self.carregar_livros_recentes()
+
+    def buscar(self):
+        """Consulta o índice e mostra os trechos encontrados no lugar da grade de capas"""
+        consulta = self.campo_busca.text().strip()
+        self.lista_resultados.clear()
+        self.lista_resultados.setVisible(bool(consulta))
+        if self.lista_livros:
+            self.lista_livros.setVisible(not consulta)
+        if not consulta:
+            return
 
-                # Processar cada livro
-                for livro in livros:
-                    nomes_livros.append(livro["nome"])
-                    self.caminhos_html.append(livro["html"])
+        import busca
+        try:
+            with busca.IndiceBusca() as indice:
+                resultados = indice.buscar(consulta)
+        except Exception as e:
+            print(f"Erro ao buscar: {e}")
+            return
 
-                # Atualizar o modelo com os nomes dos livros
-                self.modelo_livros.setStringList(nomes_livros)
+        for resultado in resultados:
+            item = QListWidgetItem(f"{resultado['nome_livro']} › {resultado['titulo']}\n{resultado['trecho']}")
+            item.setData(Qt.UserRole, (resultado["livro"], resultado["capitulo"], resultado["trecho"]))
+            self.lista_resultados.addItem(item)
+        if not resultados:
+            self.lista_resultados.addItem("Nenhum resultado encontrado.")
 
-            except Exception as e:
-                print(f"Erro ao carregar livros recentes: {e}")
+    def aplicar_miniatura(self, caminho, imagem):
+        icone = QIcon(QPixmap.fromImage(imagem))
+        for item in self.itens_por_capa.get(caminho, []):
+            item.setIcon(icone)
 
     def novo_livro(self):
         """Abre o diálogo para criar um novo livro"""
-        dialog = newBook.openBook()
-        if hasattr(dialog, 'html_path') and dialog.html_path:
-            self.ui.close()
+        import newBook
+        newBook.openBook()
 
     def abrir_livro(self):
         """Abre um livro existente através de diálogo de seleção de arquivo"""
         path, _ = QFileDialog.getOpenFileName(
-            self.ui, "Abrir Livro", "", "Arquivos HTML (*.html)"
+            self.ui, "Abrir Livro", "", "Livros (livro.json *.html)"
         )
         if path:
             from editor import abrir_editor
-            self.editor_window = abrir_editor(path)
-            self.ui.close()
+            abrir_editor(path)
+
+    def abrir_resultado(self, item):
+        """Abre o livro no capítulo e na posição do trecho encontrado"""
+        destino = item.data(Qt.UserRole)
+        if not destino or not os.path.exists(destino[0]):
+            return
+        from editor import abrir_editor
+        editor_window = abrir_editor(destino[0])
+        if editor_window:
+            editor_window.ir_para_trecho(destino[1], self.campo_busca.text(), destino[2])
 
     def abrir_livro_recente(self, index):
         """Abre um livro recente da lista"""
-        if 0 <= index.row() < len(self.caminhos_html):
-            html_path = self.caminhos_html[index.row()]
-            if html_path and os.path.exists(html_path):
-                # Importar aqui para evitar importação circular
-                from editor import abrir_editor
-                self.editor_window = abrir_editor(html_path)
-                self.ui.close()
+        html_path = index.data(Qt.UserRole)
+        if not html_path:
+            return
+        if not os.path.exists(html_path):
+            self.marcar_ausente(html_path)
+            return
+        # Importar aqui para evitar importação circular
+        from editor import abrir_editor
+        abrir_editor(html_path)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    window = WelcomeWindow()
+    import janelas
+    janelas.gerenciador().mostrar_inicio()
     sys.exit(app.exec())